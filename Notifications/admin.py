@@ -127,6 +127,8 @@ class NotificationEventAdmin(admin.ModelAdmin):
         "post_time",
         "created_at",
         "content_hash",
+        "large_icon_ref",
+        "picture_ref",
         "user_count",
         "interaction_count"
     )
@@ -146,7 +148,7 @@ class NotificationEventAdmin(admin.ModelAdmin):
             )
         }),
         ("Images", {
-            "fields": ("large_icon_base64", "picture_base64"),
+            "fields": ("large_icon_base64", "picture_base64", "large_icon_ref", "picture_ref"),
             "classes": ("collapse",)
         }),
         ("Conversation Metadata", {
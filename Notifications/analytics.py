@@ -1,67 +1,170 @@
-from django.utils import timezone
+"""
+Per-type notification analytics of the past 7 days.
+
+`calculate_analytics` computes one type. The analytics endpoint serves
+`analytics_snapshot` instead: every type of the user in one computation,
+cached under the user's ChangeSequence value. Every ingest and interaction
+moves that value, so a write is never served stale analytics, and the
+snapshot expires after ANALYTICS_SNAPSHOT_TIMEOUT as the window slides. A
+cold snapshot is computed once: concurrent requests for it (the app loads
+every category tab at once) wait for the first one's result.
+"""
+import time
 from datetime import timedelta
-from collections import defaultdict
-from django.db.models import F, ExpressionWrapper, DurationField, Avg
 
-from .models import UserNotificationState
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
+from .models import ChangeSequence, HourlyAggregate, UserNotificationState, hour_of
 
-def calculate_analytics(user, notif_type):
+# How often a request waiting on another one's snapshot checks the cache
+SNAPSHOT_POLL_SECONDS = 0.05
 
+
+def _hourly_buckets(user, notif_type=None):
+    """
+    {type: [(hour, count, ignored, response seconds, responses), ...]} of
+    the past 7 days, for one type or all of them. Whole hours come from the
+    HourlyAggregate rollup; only the partial hour the window starts in is
+    counted from the states themselves. Two queries.
+    """
     now = timezone.now()
     start_of_week = now - timedelta(days=7)
+    first_hour = hour_of(start_of_week)
+    if first_hour < start_of_week:
+        first_hour += timedelta(hours=1)
+
+    buckets = {}
+
+    rows = HourlyAggregate.objects.filter(user=user, hour__gte=first_hour)
+    if notif_type is not None:
+        rows = rows.filter(type=notif_type)
+    for r in rows.values("type", "hour").annotate(
+        posts=Sum("posts"),
+        reads=Sum("reads"),
+        response_seconds=Sum("response_seconds"),
+        responses=Sum("responses"),
+    ).order_by():
+        buckets.setdefault(r["type"], []).append(
+            (r["hour"], r["posts"], r["posts"] - r["reads"], r["response_seconds"], r["responses"])
+        )
 
-    qs = UserNotificationState.objects.filter(
-        user=user,
-        notification_event__type=notif_type,
-        notification_event__post_time__gte=start_of_week
-    ).select_related("notification_event")
+    if first_hour > start_of_week:
+        edge = UserNotificationState.objects.filter(
+            user=user,
+            post_time__gte=start_of_week,
+            post_time__lt=first_hour,
+        )
+        if notif_type is not None:
+            edge = edge.filter(type=notif_type)
+        for r in edge.values(bucket_type=Coalesce("type", Value(""))).annotate(
+            count=Count("id"),
+            ignored=Count("id", filter=Q(is_read=False)),
+            response_time=Sum(
+                ExpressionWrapper(F("opened_at") - F("post_time"), output_field=DurationField()),
+            ),
+            responses=Count("opened_at"),
+        ).order_by():
+            buckets.setdefault(r["bucket_type"], []).append((
+                start_of_week,
+                r["count"],
+                r["ignored"],
+                r["response_time"].total_seconds() if r["response_time"] else 0.0,
+                r["responses"],
+            ))
+
+    return buckets
 
-    # ========================
-    # This week count
-    # ========================
-    this_week_count = qs.count()
 
-    # ========================
-    # Ignore rate
-    # ========================
-    ignored = qs.filter(is_read=False).count()
-    ignore_rate = (ignored / this_week_count) if this_week_count > 0 else 0.0
+def calculate_analytics(user, notif_type):
+    """The past 7 days of `notif_type` notifications."""
+    return summarize(_hourly_buckets(user, notif_type).get(notif_type, []))
+
+
+def calculate_all_analytics(user):
+    """{type: analytics} for every type posted in the past 7 days."""
+    return {
+        notif_type: summarize(buckets)
+        for notif_type, buckets in sorted(_hourly_buckets(user).items())
+        if any(count for _, count, _, _, _ in buckets)
+    }
+
+
+def analytics_snapshot(user):
+    """
+    calculate_all_analytics() of `user`, from the cache when their data
+    hasn't changed since it was computed.
+    """
+    timeout = settings.ANALYTICS_SNAPSHOT_TIMEOUT
+    if not timeout:
+        return calculate_all_analytics(user)
+
+    version = ChangeSequence.objects.value_for(user.id)
+    key = f"analytics:{user.id}:{version}"
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    # Single flight: one request computes, the others wait for its result
+    lock = f"{key}:lock"
+    lock_timeout = settings.ANALYTICS_SNAPSHOT_LOCK_SECONDS
+    deadline = time.monotonic() + lock_timeout
+    while not cache.add(lock, 1, lock_timeout):
+        time.sleep(SNAPSHOT_POLL_SECONDS)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+        if time.monotonic() >= deadline:
+            # The computing request is stuck or gone; don't wait on it
+            return calculate_all_analytics(user)
+
+    try:
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = calculate_all_analytics(user)
+            cache.set(key, snapshot, timeout)
+    finally:
+        cache.delete(lock)
+    return snapshot
+
+
+def type_analytics(user, notif_type):
+    """One type's analytics out of the user's snapshot."""
+    return analytics_snapshot(user).get(notif_type) or summarize([])
+
+
+def summarize(buckets):
+    """Builds the analytics of one type from its hourly buckets."""
 
     # ========================
-    # Weekly activity (Mon-Sun)
+    # This week count and ignore rate
     # ========================
-    weekday_counts = defaultdict(int)
+    this_week_count = sum(b[1] for b in buckets)
+    ignored = sum(b[2] for b in buckets)
+    ignore_rate = (ignored / this_week_count) if this_week_count > 0 else 0.0
 
     # ========================
-    # Hourly distribution (NEW)
+    # Weekly activity (Mon-Sun) and hourly distribution
     # 0-3,3-6,...21-24
     # ========================
+    weekly_activity = [0] * 7
     hourly_bins = [0] * 8
 
-    for obj in qs:
-        post_time = obj.notification_event.post_time
-
-        weekday_counts[post_time.weekday()] += 1
-
-        hour = post_time.hour
-        bucket = hour // 3
-        hourly_bins[bucket] += 1
-
-    weekly_activity = [weekday_counts[i] for i in range(7)]
+    for hour, count, _, _, _ in buckets:
+        weekly_activity[hour.weekday()] += count
+        hourly_bins[hour.hour // 3] += count
 
     # ========================
-    # Avg response time (REAL)
+    # Avg response time
     # ========================
-    response_qs = qs.filter(opened_at__isnull=False).annotate(
-        response_time=ExpressionWrapper(
-            F("opened_at") - F("notification_event__post_time"),
-            output_field=DurationField()
-        )
+    responses = sum(b[4] for b in buckets)
+    avg_duration = (
+        timedelta(seconds=sum(b[3] for b in buckets) / responses) if responses else None
     )
 
-    avg_duration = response_qs.aggregate(avg=Avg("response_time"))["avg"]
-
     if avg_duration:
         total_seconds = int(avg_duration.total_seconds())
         hours = total_seconds // 3600
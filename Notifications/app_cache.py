@@ -0,0 +1,101 @@
+"""
+Per-process App resolution cache.
+
+A user's set of apps almost never changes, so ingest and interaction paths
+resolve (user_id, package_name) -> (app_id, app_label) from a bounded LRU
+instead of hitting the App table on every request. Label changes are written
+through by the ingestion module and entries are dropped when an App is
+deleted (see signals.py).
+
+Other processes learn about those changes through a per-user generation
+number in the shared Django cache: invalidating bumps it, and entries
+cached under an older generation are misses. Entries also expire after
+APP_CACHE_TTL seconds, which bounds how stale they can get when the
+Django cache isn't shared between processes (LocMemCache).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _generation_key(user_id):
+    return f"app_cache:generation:{user_id}"
+
+
+class AppCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, package_name):
+        """Returns (app_id, app_label) or None."""
+        key = (user_id, package_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+        app_id, app_label, expires_at, generation = entry
+
+        fresh = expires_at > time.monotonic() and generation == cache.get(_generation_key(user_id), 0)
+        with self._lock:
+            if not fresh:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self.misses += 1
+                self.stale += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return app_id, app_label
+
+    def set(self, user_id, package_name, app_id, app_label):
+        key = (user_id, package_name)
+        entry = (app_id, app_label, time.monotonic() + self.ttl, cache.get(_generation_key(user_id), 0))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id, package_name):
+        """Drops the entry here and, via the generation, in every other process."""
+        with self._lock:
+            self._entries.pop((user_id, package_name), None)
+        key = _generation_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not set yet. One evicted and restarted at 1 can match old
+            # entries again; the TTL still drops those
+            if not cache.add(key, 1, None):
+                cache.incr(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.stale = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+app_cache = AppCache(settings.APP_CACHE_MAX_ENTRIES, settings.APP_CACHE_TTL)
@@ -7,4 +7,5 @@ class NotificationsConfig(AppConfig):
     path = os.path.dirname(os.path.abspath(__file__))
     
     def ready(self):
-        import Notifications.signals
\ No newline at end of file
+        import Notifications.signals
+        import Notifications.stream  # connects the stream publisher
\ No newline at end of file
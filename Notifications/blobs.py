@@ -0,0 +1,84 @@
+"""
+Content-addressed blob store for notification images.
+
+Ingest decodes the base64 icon/picture payloads and stores the bytes on disk
+under their SHA-256, so an app icon that arrives with every notification is
+stored once. NotificationEvent keeps only the digest (`*_ref`); the images
+are served by the `notification_blob` endpoint with the digest as a
+long-lived ETag.
+"""
+import base64
+import binascii
+import hashlib
+import os
+
+from django.conf import settings
+
+
+# (base64 column, reference column) pairs on NotificationEvent
+IMAGE_FIELDS = (
+    ("large_icon_base64", "large_icon_ref"),
+    ("picture_base64", "picture_ref"),
+)
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def blob_path(digest):
+    return os.path.join(settings.BLOB_STORE_ROOT, digest[:2], digest[2:4], digest)
+
+
+def store_blob(data):
+    """Stores `data` if it isn't stored yet and returns its SHA-256 digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return digest
+
+
+def decode_image(value):
+    """
+    Returns the bytes of a base64 (optionally data: URI) image, or None if
+    `value` isn't base64 - clients may also send plain URLs.
+    """
+    if not value:
+        return None
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    try:
+        data = base64.b64decode("".join(value.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return data or None
+
+
+def content_type(data):
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def externalize_images(fields):
+    """
+    Moves decodable base64 images in an event-field dict into the blob
+    store, replacing them with references. Undecodable values stay inline.
+    """
+    for inline_field, ref_field in IMAGE_FIELDS:
+        data = decode_image(fields.get(inline_field))
+        if data is not None:
+            fields[ref_field] = store_blob(data)
+            fields[inline_field] = None
+    return fields
@@ -0,0 +1,120 @@
+"""
+Incremental change feed for client sync.
+
+Each user has a ChangeSequence. A transaction that writes the user's
+UserNotificationStates takes the next value and stamps it on every row it
+writes (`change_seq`); a delete leaves a NotificationTombstone carrying its
+own value. The feed returns everything past a client's token ordered by
+(change_seq, id), so a resuming client reads only what changed since its
+last sync.
+
+Tombstones are pruned after CHANGE_FEED_TOMBSTONE_DAYS. Pruning raises the
+user's horizon, and tokens older than it can no longer learn about every
+delete - those clients have to resync from scratch.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import (
+    ChangeSequence,
+    HourlyAggregate,
+    NotificationTombstone,
+    ResponseSketch,
+    UnreadCounter,
+    UserNotificationState,
+    activity_counts,
+    hour_of,
+)
+
+
+def delete_states(user_id, qs):
+    """
+    Deletes the user's states in `qs`, leaving tombstones for the change
+    feed and taking them off the unread counters, hourly aggregates and
+    reaction time sketches.
+    Returns the number of states deleted.
+    """
+    with transaction.atomic():
+        rows = list(
+            qs.filter(user_id=user_id).values_list(
+                "id", "notification_event_id", "is_read", "app_id", "type",
+                "opened_at", "dismissed_at", "post_time",
+            )
+        )
+        if not rows:
+            return 0
+        change_seq = ChangeSequence.objects.advance(user_id)
+        UserNotificationState.objects.filter(id__in=[row[0] for row in rows]).delete()
+        NotificationTombstone.objects.bulk_create([
+            NotificationTombstone(
+                user_id=user_id,
+                state_id=pk,
+                notification_event_id=event_id,
+                change_seq=change_seq,
+            )
+            for pk, event_id, *_ in rows
+        ])
+
+        unread = Counter(
+            (user_id, app_id, notif_type or "")
+            for _, _, is_read, app_id, notif_type, *_ in rows
+            if not is_read and app_id
+        )
+        UnreadCounter.objects.apply({key: -n for key, n in unread.items()})
+
+        hourly = {}
+        responses = []
+        for _, _, is_read, app_id, notif_type, opened_at, dismissed_at, post_time in rows:
+            if not app_id or post_time is None:
+                continue
+            key = (user_id, app_id, notif_type or "", hour_of(post_time))
+            counts = (1, *activity_counts(is_read, opened_at, dismissed_at, post_time))
+            current = hourly.get(key, (0, 0, 0, 0, 0.0, 0))
+            hourly[key] = tuple(a - b for a, b in zip(current, counts))
+            if counts[5]:
+                responses.append((user_id, app_id, key[3].date(), counts[4], -1))
+        HourlyAggregate.objects.apply(hourly)
+        ResponseSketch.objects.apply(responses)
+    return len(rows)
+
+
+def horizon(user_id):
+    return (
+        ChangeSequence.objects.filter(user_id=user_id).values_list("horizon", flat=True).first()
+        or 0
+    )
+
+
+def tombstones_after(user_id, change_seq, pk, limit):
+    """[((change_seq, state_id), tombstone row), ...] past (change_seq, pk)."""
+    rows = NotificationTombstone.objects.filter(
+        Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, state_id__gt=pk),
+        user_id=user_id,
+    ).order_by("change_seq", "state_id").values_list("change_seq", "state_id", "notification_event_id")[:limit]
+    return [
+        ((seq, state_id), {"id": state_id, "notification_event_id": event_id})
+        for seq, state_id, event_id in rows
+    ]
+
+
+def prune_tombstones(days=None):
+    """
+    Deletes tombstones older than `days` (CHANGE_FEED_TOMBSTONE_DAYS) and
+    raises each affected user's horizon. Returns the number deleted.
+    """
+    if days is None:
+        days = settings.CHANGE_FEED_TOMBSTONE_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = NotificationTombstone.objects.filter(deleted_at__lt=cutoff)
+
+    with transaction.atomic():
+        horizons = expired.values("user_id").annotate(seq=Max("change_seq")).values_list("user_id", "seq")
+        for user_id, seq in horizons:
+            ChangeSequence.objects.filter(user_id=user_id, horizon__lt=seq).update(horizon=seq)
+        deleted, _ = expired.delete()
+    return deleted
@@ -0,0 +1,360 @@
+"""
+Journaled DailyAggregate counters.
+
+Every ingested notification and every click bumps a DailyAggregate row, and
+all of a user's traffic lands on the same few (user, app, day) rows. With
+AGGREGATE_BUFFER_ENABLED ingest doesn't update those rows: it inserts its
+deltas into the DailyAggregateDelta journal, in the same transaction as the
+events they count. Plain inserts don't wait on each other's row locks, and
+a delta commits, or rolls back, exactly with its events, so a worker killed
+at any point loses nothing.
+
+AggregateBuffer folds the journal into DailyAggregate as multi-row upserts -
+once a process has journaled AGGREGATE_BUFFER_MAX_KEYS rows, every
+AGGREGATE_BUFFER_FLUSH_INTERVAL seconds (from a background thread, except on
+SQLite where the next add() flushes once the interval has passed), and at
+exit of a process that journaled anything. A flush deletes the journal rows it applies in the
+transaction that applies them, so each delta is counted once; journal rows
+left by a failed flush, or by a process that died, are picked up by the
+next flush of any process. The stats endpoints add the requesting user's
+journal rows to the DailyAggregate rows they read (journal_totals), so they
+never lag behind a flush.
+
+Rows that drifted (bulk operations, admin deletes) are recomputed from the
+events by `manage.py rebuild_aggregates`.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import App, DailyAggregate, DailyAggregateDelta, InteractionEvent, NotificationEvent
+
+logger = logging.getLogger(__name__)
+
+
+def upsert_daily_aggregates(deltas, replace=False, now=None):
+    """
+    Adds counter deltas to DailyAggregate in one INSERT ... ON CONFLICT
+    statement and recomputes open_rate in SQL. With `replace` the values
+    overwrite the stored counters instead (rebuilds).
+
+    `deltas` maps (user_id, app_id, day) -> (posts, clicks, swipes).
+    """
+    if not deltas:
+        return
+
+    ops = connection.ops
+    table = ops.quote_name(DailyAggregate._meta.db_table)
+    now = ops.adapt_datetimefield_value(now or timezone.now())
+
+    rows = []
+    params = []
+    for (user_id, app_id, day), (posts, clicks, swipes) in deltas.items():
+        rows.append("(%s, %s, %s, %s, %s, %s, %s, %s)")
+        params.extend([
+            user_id,
+            app_id,
+            ops.adapt_datefield_value(day),
+            posts,
+            clicks,
+            swipes,
+            clicks / posts if posts > 0 else None,
+            now,
+        ])
+
+    if replace:
+        if connection.vendor == "mysql":
+            conflict = (
+                "ON DUPLICATE KEY UPDATE "
+                "posts = VALUES(posts), "
+                "clicks = VALUES(clicks), "
+                "swipes = VALUES(swipes), "
+                "open_rate = VALUES(open_rate), "
+                "last_updated = VALUES(last_updated)"
+            )
+        else:
+            conflict = (
+                "ON CONFLICT (user_id, app_id, day) DO UPDATE SET "
+                "posts = EXCLUDED.posts, "
+                "clicks = EXCLUDED.clicks, "
+                "swipes = EXCLUDED.swipes, "
+                "open_rate = EXCLUDED.open_rate, "
+                "last_updated = EXCLUDED.last_updated"
+            )
+    elif connection.vendor == "mysql":
+        # MySQL evaluates assignments left to right, so open_rate already
+        # sees the incremented counters.
+        conflict = (
+            "ON DUPLICATE KEY UPDATE "
+            "posts = posts + VALUES(posts), "
+            "clicks = clicks + VALUES(clicks), "
+            "swipes = swipes + VALUES(swipes), "
+            "open_rate = CASE WHEN posts > 0 THEN 1.0 * clicks / posts ELSE NULL END, "
+            "last_updated = VALUES(last_updated)"
+        )
+    else:
+        conflict = (
+            "ON CONFLICT (user_id, app_id, day) DO UPDATE SET "
+            f"posts = {table}.posts + EXCLUDED.posts, "
+            f"clicks = {table}.clicks + EXCLUDED.clicks, "
+            f"swipes = {table}.swipes + EXCLUDED.swipes, "
+            f"open_rate = CASE WHEN {table}.posts + EXCLUDED.posts > 0 "
+            f"THEN 1.0 * ({table}.clicks + EXCLUDED.clicks) / ({table}.posts + EXCLUDED.posts) "
+            "ELSE NULL END, "
+            "last_updated = EXCLUDED.last_updated"
+        )
+
+    sql = (
+        f"INSERT INTO {table} "
+        "(user_id, app_id, day, posts, clicks, swipes, open_rate, last_updated) "
+        f"VALUES {', '.join(rows)} {conflict}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+class AggregateBuffer:
+    """Folds the DailyAggregateDelta journal into DailyAggregate."""
+
+    class _Contended(Exception):
+        """Another process applied some of the claimed journal rows first."""
+
+    def __init__(self, max_keys, flush_interval):
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+        self._journaled = 0  # rows this process journaled since its last flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer_pid = None
+        self._exit_flush = False
+
+    def add(self, rows):
+        """Notes `rows` newly committed journal rows; flushes when due."""
+        with self._lock:
+            self._journaled += rows
+            if not self._exit_flush:
+                # Only processes that journal flush at exit, not every
+                # management command that happens to import this module
+                atexit.register(self._flush_at_exit)
+                self._exit_flush = True
+            due = (
+                self._journaled >= self.max_keys
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+            if self._timer_pid != os.getpid() and connection.vendor != "sqlite":
+                # Threads don't survive a fork; each worker starts its own.
+                # SQLite fails concurrent writers with "database is locked"
+                # instead of waiting, so there flushes only run inline.
+                self._start_timer()
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Applies the whole journal; returns the number of rows upserted."""
+        with self._flush_lock:
+            with self._lock:
+                self._journaled = 0
+                self._last_flush = time.monotonic()
+
+            upserted = 0
+            while True:
+                try:
+                    with transaction.atomic():
+                        claimed, applied = self._apply_batch()
+                except self._Contended:
+                    return upserted  # the rest is being flushed elsewhere
+                except Exception:
+                    logger.exception("Failed to flush the aggregate journal; leaving it for the next flush")
+                    return upserted
+                upserted += applied
+                if claimed < self.max_keys:
+                    return upserted
+
+    def _flush_at_exit(self):
+        # Only if there is something left: a process that flushed last may
+        # already have dropped its database (test runs, bench_ingest)
+        if self._journaled:
+            self.flush()
+
+    def _apply_batch(self):
+        """Moves up to max_keys journal rows into DailyAggregate; returns (claimed, upserted)."""
+        journal = DailyAggregateDelta.objects.order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            # Concurrent flushers take disjoint rows
+            journal = journal.select_for_update(skip_locked=True)
+        rows = list(
+            journal.values_list("id", "user_id", "app_id", "day", "posts", "clicks", "swipes")[:self.max_keys]
+        )
+        if not rows:
+            return 0, 0
+
+        deleted, _ = DailyAggregateDelta.objects.filter(id__in=[row[0] for row in rows]).delete()
+        if deleted != len(rows):
+            # Without row locks (SQLite) another flush can win the race
+            raise self._Contended
+
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for _, user_id, app_id, day, posts, clicks, swipes in rows:
+            delta = deltas[(user_id, app_id, day)]
+            delta[0] += posts
+            delta[1] += clicks
+            delta[2] += swipes
+        deltas = {key: tuple(delta) for key, delta in deltas.items()}
+
+        try:
+            with transaction.atomic():
+                upsert_daily_aggregates(deltas)
+        except IntegrityError:
+            # An app deleted since; its aggregates went with it.
+            deltas = self._drop_deleted_apps(deltas)
+            upsert_daily_aggregates(deltas)
+        return len(rows), len(deltas)
+
+    def _drop_deleted_apps(self, deltas):
+        live = set(
+            App.objects.filter(id__in={app_id for _, app_id, _ in deltas})
+            .values_list("id", flat=True)
+        )
+        return {key: delta for key, delta in deltas.items() if key[1] in live}
+
+    def _start_timer(self):
+        self._timer_pid = os.getpid()
+        threading.Thread(
+            target=self._run_timer, name="aggregate-buffer-flush", daemon=True
+        ).start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                # This thread owns its own connection; don't hold it open
+                # between flushes.
+                connection.close()
+
+
+aggregate_buffer = AggregateBuffer(
+    settings.AGGREGATE_BUFFER_MAX_KEYS,
+    settings.AGGREGATE_BUFFER_FLUSH_INTERVAL,
+)
+
+
+def record_aggregates(deltas):
+    """
+    Applies DailyAggregate deltas: journaled in the surrounding transaction
+    and folded in by aggregate_buffer once it commits, or upserted inline
+    when buffering is disabled.
+    """
+    if not deltas:
+        return
+    if settings.AGGREGATE_BUFFER_ENABLED:
+        DailyAggregateDelta.objects.bulk_create([
+            DailyAggregateDelta(
+                user_id=user_id,
+                app_id=app_id,
+                day=day,
+                posts=posts,
+                clicks=clicks,
+                swipes=swipes,
+            )
+            for (user_id, app_id, day), (posts, clicks, swipes) in deltas.items()
+        ])
+        transaction.on_commit(lambda: aggregate_buffer.add(len(deltas)))
+    else:
+        upsert_daily_aggregates(deltas)
+
+
+def journal_totals(user_id, since, until=None):
+    """
+    The user's journaled, not yet flushed, deltas per app for the days
+    `since` to `until` (inclusive; open-ended without one), as rows of
+    app_id, app__package_name, app__app_label, posts, clicks and swipes.
+    """
+    qs = DailyAggregateDelta.objects.filter(user_id=user_id, day__gte=since)
+    if until is not None:
+        qs = qs.filter(day__lte=until)
+    return (
+        qs.values("app_id", "app__package_name", "app__app_label")
+        .annotate(posts=Sum("posts"), clicks=Sum("clicks"), swipes=Sum("swipes"))
+        .order_by()
+    )
+
+
+def rebuild_daily_aggregates(user_ids, since, until, batch_size=500):
+    """
+    Recomputes the DailyAggregate rows of `user_ids` for the days `since`
+    to `until` (inclusive) from NotificationEvent (posts) and
+    InteractionEvent (clicks, swipes), the same way ingest counts them.
+    Rows are overwritten, and rows left without any event are deleted, so
+    running it again changes nothing. Returns the number of rows written.
+
+    Journaled deltas of those days are discarded along with the old rows,
+    as the events already count them. A delta journaled while the events
+    are being read can be counted twice or not at all, so recent days are
+    only exact when rebuilt after traffic for them has settled.
+    """
+    start = datetime.combine(since, dt_time.min, tzinfo=dt_timezone.utc)
+    end = datetime.combine(until + timedelta(days=1), dt_time.min, tzinfo=dt_timezone.utc)
+
+    counts = defaultdict(lambda: [0, 0, 0])
+    posts = (
+        NotificationEvent.objects.filter(
+            app__user_id__in=user_ids,
+            post_time__gte=start,
+            post_time__lt=end,
+        )
+        .values_list("app__user_id", "app_id", TruncDate("post_time"))
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    for user_id, app_id, day, n in posts:
+        counts[(user_id, app_id, day)][0] += n
+
+    interactions = (
+        InteractionEvent.objects.filter(
+            user_id__in=user_ids,
+            interaction_type__in=[InteractionEvent.CLICK, InteractionEvent.SWIPE],
+            timestamp__gte=start,
+            timestamp__lt=end,
+        )
+        .values_list("user_id", "notification_event__app_id", TruncDate("timestamp"), "interaction_type")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    for user_id, app_id, day, interaction_type, n in interactions:
+        counts[(user_id, app_id, day)][1 if interaction_type == InteractionEvent.CLICK else 2] += n
+
+    now = timezone.now()
+    keys = list(counts)
+    with transaction.atomic():
+        DailyAggregateDelta.objects.filter(
+            user_id__in=user_ids,
+            day__gte=since,
+            day__lte=until,
+        ).delete()
+        for i in range(0, len(keys), batch_size):
+            upsert_daily_aggregates(
+                {key: tuple(counts[key]) for key in keys[i:i + batch_size]},
+                replace=True,
+                now=now,
+            )
+        # Every row computed above was just stamped with `now`
+        DailyAggregate.objects.filter(
+            user_id__in=user_ids,
+            day__gte=since,
+            day__lte=until,
+            last_updated__lt=now,
+        ).delete()
+    return len(keys)
@@ -0,0 +1,191 @@
+"""
+Serializer-free rendering of notification lists.
+
+The feed and bookmarks spend most of their time in DRF's field-by-field
+serialization of nested ModelSerializers. With FAST_LIST_RENDERING they
+build the same rows straight from values() dicts instead.
+UserNotificationStateSerializer and UserNotificationStateCompactSerializer
+stay the reference, and the rows must render to the same JSON byte for byte
+(FastListRenderingTestCase checks that; `manage.py bench_list_rendering`
+times both paths).
+Every value is already a JSON native type, so the renderer's encoder never
+falls back to default().
+"""
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from .models import NotificationMessage
+from .serializers import (
+    UserNotificationStateCompactSerializer,
+    UserNotificationStateSerializer,
+    blob_url,
+)
+
+# Formats exactly like the serializers' DateTimeFields (timezone, "Z")
+format_datetime = serializers.DateTimeField().to_representation
+
+STATE_COLUMNS = (
+    "id",
+    "user_id",
+    "notification_event_id",
+    "post_time",
+    "is_read",
+    "opened_at",
+    "dismissed_at",
+    "dismissed_by",
+    "snoozed_until",
+    "ml_score",
+    "last_updated",
+    "created_at",
+    "notification_event__post_time",
+    "notification_event__notif_key",
+    "notification_event__title",
+    "notification_event__text",
+    "notification_event__app_id",
+    "notification_event__app__package_name",
+    "notification_event__app__app_label",
+)
+
+# Only read when the nested `notification` is rendered
+EVENT_COLUMNS = (
+    "notification_event__channel_id",
+    "notification_event__big_text",
+    "notification_event__sub_text",
+    "notification_event__summary_text",
+    "notification_event__info_text",
+    "notification_event__text_lines",
+    "notification_event__large_icon_base64",
+    "notification_event__picture_base64",
+    "notification_event__large_icon_ref",
+    "notification_event__picture_ref",
+    "notification_event__conversation_title",
+    "notification_event__people",
+    "notification_event__content_hash",
+    "notification_event__created_at",
+    "notification_event__type",
+)
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _reaction_seconds(r):
+    if not r["opened_at"]:
+        return None
+    rt = r["opened_at"] - (r["post_time"] or r["notification_event__post_time"])
+    return rt.total_seconds() if rt else None
+
+
+def _messages(event_ids):
+    messages = defaultdict(list)
+    rows = NotificationMessage.objects.filter(
+        notification_event_id__in=event_ids,
+    ).order_by("id").values_list("notification_event_id", "id", "sender", "message_text", "message_time")
+    for event_id, pk, sender, message_text, message_time in rows:
+        messages[event_id].append({
+            "id": pk,
+            "sender": sender,
+            "message_text": message_text,
+            "message_time": format_datetime(message_time),
+        })
+    return messages
+
+
+def _notification(r, messages):
+    return {
+        "id": r["notification_event_id"],
+        "app_id": r["notification_event__app_id"],
+        "package_name": r["notification_event__app__package_name"],
+        "app_label": r["notification_event__app__app_label"],
+        "notif_key": r["notification_event__notif_key"],
+        "channel_id": r["notification_event__channel_id"],
+        "post_time": format_datetime(r["notification_event__post_time"]),
+        "title": r["notification_event__title"],
+        "text": r["notification_event__text"],
+        "big_text": r["notification_event__big_text"],
+        "sub_text": r["notification_event__sub_text"],
+        "summary_text": r["notification_event__summary_text"],
+        "info_text": r["notification_event__info_text"],
+        "text_lines": r["notification_event__text_lines"],
+        "large_icon_base64": r["notification_event__large_icon_base64"],
+        "picture_base64": r["notification_event__picture_base64"],
+        "large_icon_url": blob_url(r["notification_event__large_icon_ref"]),
+        "picture_url": blob_url(r["notification_event__picture_ref"]),
+        "conversation_title": r["notification_event__conversation_title"],
+        "people": r["notification_event__people"],
+        "content_hash": r["notification_event__content_hash"],
+        "created_at": format_datetime(r["notification_event__created_at"]),
+        "messages": messages.get(r["notification_event_id"], []),
+        "type": r["notification_event__type"],
+    }
+
+
+def _full_row(r, messages):
+    return {
+        "id": r["id"],
+        "user": r["user_id"],
+        "notification": _notification(r, messages) if messages is not None else None,
+        "is_read": r["is_read"],
+        "opened_at": format_datetime(r["opened_at"]),
+        "dismissed_at": format_datetime(r["dismissed_at"]),
+        "snoozed_until": format_datetime(r["snoozed_until"]),
+        "ml_score": _float(r["ml_score"]),
+        "reaction_time": _reaction_seconds(r),
+        "last_updated": format_datetime(r["last_updated"]),
+        "created_at": format_datetime(r["created_at"]),
+        "package_name": r["notification_event__app__package_name"],
+        "app_label": r["notification_event__app__app_label"],
+        "title": r["notification_event__title"],
+        "text": r["notification_event__text"],
+        "post_time": format_datetime(r["notification_event__post_time"]),
+    }
+
+
+def _compact_row(r, messages):
+    return {
+        "id": r["id"],
+        "notification_event_id": r["notification_event_id"],
+        "package_name": r["notification_event__app__package_name"],
+        "app_label": r["notification_event__app__app_label"],
+        "notif_key": r["notification_event__notif_key"],
+        "title": r["notification_event__title"],
+        "text": r["notification_event__text"],
+        "post_time": format_datetime(r["notification_event__post_time"]),
+        "is_read": r["is_read"],
+        "opened_at": format_datetime(r["opened_at"]),
+        "dismissed_at": format_datetime(r["dismissed_at"]),
+        "dismissed_by": r["dismissed_by"],
+        "ml_score": _float(r["ml_score"]),
+        "reaction_time_seconds": _reaction_seconds(r),
+    }
+
+
+ROW_BUILDERS = {
+    UserNotificationStateSerializer: _full_row,
+    UserNotificationStateCompactSerializer: _compact_row,
+}
+
+
+def state_rows(qs, serializer_class, context, key=("post_time", "notification_event_id")):
+    """
+    Renders a (sliced) UserNotificationState queryset like `serializer_class`
+    would with `context`. Returns [(key values, row), ...] so the caller can
+    still build cursors; `key` names state columns.
+    """
+    build = ROW_BUILDERS[serializer_class]
+    fields = context.get("fields")
+    nested = build is _full_row and (not fields or "notification" in fields)
+
+    columns = dict.fromkeys((*STATE_COLUMNS, *key, *(EVENT_COLUMNS if nested else ())))
+    records = list(qs.values(*columns))
+    messages = _messages([r["notification_event_id"] for r in records]) if nested else None
+
+    rows = []
+    for r in records:
+        row = build(r, messages)
+        if fields:
+            row = {k: v for k, v in row.items() if k in fields}
+        rows.append((tuple(r[k] for k in key), row))
+    return rows
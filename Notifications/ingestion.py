@@ -0,0 +1,554 @@
+"""
+Notification ingestion pipeline.
+
+Both ingest endpoints go through here instead of the post_save cascade:
+events are inserted with bulk_create() (which doesn't fire signals) and the
+side effects - App.last_seen, UserNotificationState, DailyAggregate,
+UnreadCounter, HourlyAggregate - are applied explicitly, the daily counters
+through Notifications.counters. States
+written by a call are stamped with one ChangeSequence value for the change
+feed.
+
+The batch paths resolve apps once per package and do everything with bulk
+statements, so their query count does not grow with the number of
+notifications or interactions. The single-item endpoints share the same code.
+"""
+import hashlib
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .app_cache import app_cache
+from .blobs import externalize_images
+from .counters import record_aggregates
+from .key_filter import key_filters
+from .models import (
+    App,
+    ChangeSequence,
+    HourlyAggregate,
+    NotificationEvent,
+    UserNotificationState,
+    InteractionEvent,
+    UnreadCounter,
+)
+from .search import index_events
+
+
+# Android NotificationListenerService removal reason for a click
+REASON_CLICK = 1
+
+
+# -------------------------
+# Payload helpers
+# -------------------------
+
+def compute_hash(v):
+    parts = [
+        v.get("title", ""),
+        v.get("text", ""),
+        v.get("big_text", ""),
+        v.get("sub_text", ""),
+        v.get("summary_text", ""),
+    ]
+    s = "|".join(str(p) for p in parts)
+    return hashlib.sha256(s.encode()).hexdigest()
+
+
+def event_fields(v):
+    """
+    Maps a validated IngestNotificationSerializer payload to event columns.
+    Base64 images are moved to the blob store and replaced by references.
+    """
+    return externalize_images({
+        "post_time": v.get("posted_at", timezone.now()),
+        "title": v.get("title", ""),
+        "text": v.get("text", ""),
+        "big_text": v.get("big_text", ""),
+        "sub_text": v.get("sub_text", ""),
+        "summary_text": v.get("summary_text", ""),
+        "info_text": v.get("info_text", ""),
+        "text_lines": v.get("text_lines", ""),
+        "channel_id": v.get("channel_id", ""),
+        "type": v.get("type", ""),
+        "conversation_title": v.get("conversation_title", ""),
+        "people": v.get("people"),
+        "large_icon_base64": v.get("large_icon_base64"),
+        "picture_base64": v.get("picture_base64"),
+        "content_hash": compute_hash(v),
+    })
+
+
+# -------------------------
+# Apps
+# -------------------------
+
+def resolve_apps(user, labels):
+    """
+    Returns {package_name: App} for every package in `labels`
+    ({package_name: app_label}), creating missing apps and updating
+    changed labels with a constant number of queries.
+
+    Apps found in app_cache are returned as unsaved-looking App instances
+    carrying only id, user, package_name and app_label - no query at all
+    when every package is cached and no label changed.
+    """
+    apps = {}
+    missing = {}
+    for package_name, label in labels.items():
+        cached = app_cache.get(user.id, package_name)
+        if cached is None:
+            missing[package_name] = label
+            continue
+        app_id, app_label = cached
+        apps[package_name] = App(
+            id=app_id,
+            user=user,
+            package_name=package_name,
+            app_label=app_label,
+        )
+
+    if missing:
+        found = {
+            a.package_name: a
+            for a in App.objects.filter(user=user, package_name__in=list(missing))
+        }
+        created = [p for p in missing if p not in found]
+        if created:
+            App.objects.bulk_create(
+                [App(user=user, package_name=p, app_label=missing[p] or p) for p in created],
+                ignore_conflicts=True,
+            )
+            found.update({
+                a.package_name: a
+                for a in App.objects.filter(user=user, package_name__in=created)
+            })
+        apps.update(found)
+
+    relabelled = []
+    for package_name, label in labels.items():
+        app = apps[package_name]
+        if label and app.app_label != label:
+            app.app_label = label
+            relabelled.append(app)
+    if relabelled:
+        App.objects.bulk_update(relabelled, ["app_label"])
+        ChangeSequence.objects.advance(user.id)
+
+    # Only cache what is guaranteed to be committed (new apps and labels
+    # could still be rolled back with the surrounding transaction)
+    def fill_cache():
+        for app in relabelled:
+            app_cache.invalidate(user.id, app.package_name)
+        for package_name in set(missing) | {a.package_name for a in relabelled}:
+            app = apps[package_name]
+            app_cache.set(user.id, package_name, app.id, app.app_label)
+    if missing or relabelled:
+        transaction.on_commit(fill_cache)
+
+    return apps
+
+
+def resolve_app(user, package_name, app_label=""):
+    """Single-package version of resolve_apps()."""
+    return resolve_apps(user, {package_name: app_label})[package_name]
+
+
+def touch_apps(app_ids, now=None):
+    """Bumps App.last_seen for apps that just posted notifications."""
+    if app_ids:
+        App.objects.filter(id__in=list(app_ids)).update(last_seen=now or timezone.now())
+
+
+def apply_post_side_effects(user_id, events, now=None):
+    """
+    Counter, last_seen and search index updates for freshly inserted
+    events (with their pks). Pre-existing (deduped) events must not be
+    passed in.
+    """
+    events = list(events)
+    posts = Counter((user_id, e.app_id, e.post_time.date()) for e in events)
+    record_aggregates({key: (n, 0, 0) for key, n in posts.items()})
+    touch_apps({e.app_id for e in events}, now)
+    index_events(user_id, events)
+
+
+# -------------------------
+# Single ingest
+# -------------------------
+
+def _insert_event(event):
+    """
+    INSERTs `event` without firing post_save. Returns False if a concurrent
+    request already inserted the same (app, notif_key).
+    """
+    try:
+        with transaction.atomic():
+            NotificationEvent.objects.bulk_create([event])
+    except IntegrityError:
+        return False
+    if event.pk is None:
+        # Backends that can't return ids from bulk inserts (MySQL)
+        event.pk = NotificationEvent.objects.values_list("pk", flat=True).get(
+            app_id=event.app_id,
+            notif_key=event.notif_key,
+        )
+    return True
+
+
+def record_notification(user, v):
+    """
+    Ingests one validated IngestNotificationSerializer payload.
+
+    Returns {"created": bool, "state_id": int}. Retrying the same
+    (app, notif_key) - including concurrently - returns the existing state.
+    """
+    with transaction.atomic():
+        app = resolve_app(user, v["package_name"], v.get("app_label", ""))
+
+        notif_key = v.get("notif_key")
+        if not notif_key:
+            # Generate unique key if not provided
+            notif_key = f"auto_{app.id}_{timezone.now().timestamp()}"
+
+        # Brand new keys (the common case) go straight to INSERT
+        event = None
+        if key_filters.might_exist(user.id, app.id, notif_key):
+            event = NotificationEvent.objects.filter(app=app, notif_key=notif_key).first()
+        created = False
+
+        if event is None:
+            event = NotificationEvent(app=app, notif_key=notif_key, **event_fields(v))
+            created = _insert_event(event)
+            if not created:
+                event = NotificationEvent.objects.get(app=app, notif_key=notif_key)
+
+        if created:
+            # Nobody else can hold a state for an event we just inserted
+            state_id = UserNotificationState.objects.create(
+                user=user,
+                notification_event=event,
+                app_id=event.app_id,
+                post_time=event.post_time,
+                type=event.type,
+            ).id
+            apply_post_side_effects(user.id, [event])
+            transaction.on_commit(
+                lambda: key_filters.add(user.id, [(app.id, notif_key)])
+            )
+        else:
+            state_id = UserNotificationState.objects.get_or_create(
+                user=user,
+                notification_event=event,
+            )[0].id
+
+    return {"created": created, "state_id": state_id}
+
+
+# -------------------------
+# Batch ingest
+# -------------------------
+
+def record_notifications(user, payloads):
+    """
+    Ingests a list of validated IngestNotificationSerializer payloads.
+
+    Returns one {"created": bool, "state_id": int} dict per payload, in
+    order. Payloads repeating an existing (app, notif_key) are deduped
+    exactly like the single ingest endpoint.
+    """
+    if not payloads:
+        return []
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        labels = {}
+        for v in payloads:
+            label = v.get("app_label", "")
+            if label or v["package_name"] not in labels:
+                labels[v["package_name"]] = label
+        apps = resolve_apps(user, labels)
+
+        # Resolve keys (auto keys get the item index so a burst can't collide)
+        keys = []
+        for i, v in enumerate(payloads):
+            app = apps[v["package_name"]]
+            notif_key = v.get("notif_key") or f"auto_{app.id}_{now.timestamp()}_{i}"
+            keys.append((app.id, notif_key))
+
+        app_ids = {app_id for app_id, _ in keys}
+        notif_keys = {notif_key for _, notif_key in keys}
+
+        def event_ids(notif_keys):
+            return {
+                (app_id, notif_key): (pk, post_time, notif_type)
+                for pk, app_id, notif_key, post_time, notif_type in NotificationEvent.objects.filter(
+                    app_id__in=app_ids,
+                    notif_key__in=list(notif_keys),
+                ).values_list("id", "app_id", "notif_key", "post_time", "type")
+            }
+
+        events = event_ids(notif_keys)
+
+        new_events = {}
+        for (app_id, notif_key), v in zip(keys, payloads):
+            if (app_id, notif_key) in events or (app_id, notif_key) in new_events:
+                continue
+            new_events[(app_id, notif_key)] = NotificationEvent(
+                app_id=app_id,
+                notif_key=notif_key,
+                **event_fields(v),
+            )
+
+        if new_events:
+            inserting = {notif_key for _, notif_key in new_events}
+            try:
+                with transaction.atomic():
+                    NotificationEvent.objects.bulk_create(new_events.values())
+            except IntegrityError:
+                # A concurrent request (a retry of this batch, say) inserted
+                # some of these keys first. Only events this call inserted
+                # count as created and get the side effects.
+                new_events = {key: event for key, event in new_events.items() if _insert_event(event)}
+            events.update(event_ids(inserting))
+            for key, event in new_events.items():
+                event.pk = events[key][0]
+
+        # States: create any that are missing, then read back their ids.
+        # An existing event can be missing its state too (deleted by the
+        # user), so "missing" is read, under the user's ChangeSequence lock
+        # that every state writer takes, rather than assumed from new_events.
+        change_seq = ChangeSequence.objects.advance(user.id)
+        state_ids = dict(
+            UserNotificationState.objects.filter(
+                user=user,
+                notification_event_id__in=[pk for pk, _, _ in events.values()],
+            ).values_list("notification_event_id", "id")
+        )
+        missing = [
+            UserNotificationState(
+                user=user,
+                notification_event_id=pk,
+                app_id=key[0],
+                post_time=post_time,
+                type=notif_type,
+                change_seq=change_seq,
+            )
+            for key, (pk, post_time, notif_type) in events.items()
+            if pk not in state_ids
+        ]
+        if missing:
+            UnreadCounter.objects.record(missing)
+            HourlyAggregate.objects.record(missing)
+            UserNotificationState.objects.bulk_create(missing, ignore_conflicts=True)
+            state_ids.update(
+                UserNotificationState.objects.filter(
+                    user=user,
+                    notification_event_id__in=[s.notification_event_id for s in missing],
+                ).values_list("notification_event_id", "id")
+            )
+
+        # Counters and last_seen only move for events this batch created
+        apply_post_side_effects(user.id, new_events.values(), now)
+        transaction.on_commit(lambda: key_filters.add(user.id, new_events))
+
+    results = []
+    seen = set()
+    for key in keys:
+        created = key in new_events and key not in seen
+        seen.add(key)
+        results.append({
+            "created": created,
+            "state_id": state_ids.get(events[key][0]),
+        })
+    return results
+
+
+# -------------------------
+# Interactions
+# -------------------------
+
+DISMISS = "DISMISS"
+
+
+def _interaction_type(v):
+    if v.get("raw_reason") == REASON_CLICK:
+        return InteractionEvent.CLICK
+    if v.get("dismissed_by"):
+        return DISMISS
+    return None
+
+
+def _apply_interaction(state, interaction_type, v, now):
+    """
+    Applies an interaction to `state` in memory.
+    Returns True if the state changed.
+    """
+    timestamp = v["removed_at"]
+    dismissed_by = v.get("dismissed_by")
+    changed = False
+
+    if interaction_type == InteractionEvent.CLICK:
+        if not state.opened_at:
+            state.opened_at = timestamp
+            state.is_read = True
+            changed = True
+
+    elif interaction_type == DISMISS:
+        if not state.dismissed_at or dismissed_by == "user":
+            state.dismissed_at = timestamp
+            state.dismissed_by = dismissed_by
+            changed = True
+
+            # user dismiss = mark read
+            if dismissed_by == "user" and not state.is_read:
+                state.opened_at = timestamp
+                state.is_read = True
+
+    if changed:
+        state.last_updated = now
+    return changed
+
+
+def record_interactions(user, payloads, dedupe=False):
+    """
+    Applies a list of validated IngestInteractionSerializer payloads.
+
+    Every (package_name, notif_key) pair is resolved with one IN query, the
+    state transitions are applied in memory and written back with a single
+    bulk_update, and the InteractionEvents with a single bulk_create.
+
+    Returns one dict per payload, in order: {"ok": True, "logged": type}
+    or {"ok": False, "error": ...}. With `dedupe`, interactions already
+    logged for the same notification, type and timestamp, before or earlier
+    in `payloads`, are skipped (spool replay); without it every payload is
+    logged.
+    """
+    if not payloads:
+        return []
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        labels = {}
+        for v in payloads:
+            label = v.get("app_label", "")
+            if label or v["package_name"] not in labels:
+                labels[v["package_name"]] = label
+        apps = resolve_apps(user, labels)
+
+        keyed = [v for v in payloads if v.get("notif_key")]
+        events = {
+            (app_id, notif_key): (pk, post_time, notif_type)
+            for pk, app_id, notif_key, post_time, notif_type in NotificationEvent.objects.filter(
+                app_id__in={a.id for a in apps.values()},
+                notif_key__in={v["notif_key"] for v in keyed},
+            ).values_list("id", "app_id", "notif_key", "post_time", "type")
+        } if keyed else {}
+
+        event_ids = [pk for pk, _, _ in events.values()]
+        states = {
+            s.notification_event_id: s
+            for s in UserNotificationState.objects.filter(
+                user=user,
+                notification_event_id__in=event_ids,
+            )
+        }
+
+        logged = set()
+        if dedupe and event_ids:
+            logged = set(
+                InteractionEvent.objects.filter(
+                    user=user,
+                    notification_event_id__in=event_ids,
+                ).values_list("notification_event_id", "interaction_type", "timestamp")
+            )
+
+        results = []
+        interactions = []
+        changed = {}
+        created_states = {}
+        clicks = Counter()
+
+        for v in payloads:
+            if not v.get("notif_key"):
+                results.append({"ok": False, "error": "notif_key is required for interaction tracking"})
+                continue
+
+            app = apps[v["package_name"]]
+            event = events.get((app.id, v["notif_key"]))
+            if event is None:
+                results.append({"ok": False, "error": "Notification not found"})
+                continue
+
+            event_id, post_time, notif_type = event
+            interaction_type = _interaction_type(v)
+            timestamp = v["removed_at"]
+            results.append({"ok": True, "logged": interaction_type})
+
+            if interaction_type and (event_id, interaction_type, timestamp) in logged:
+                continue
+
+            state = states.get(event_id)
+            if state is None:
+                state = UserNotificationState(
+                    user=user,
+                    notification_event_id=event_id,
+                    app_id=app.id,
+                    post_time=post_time,
+                    type=notif_type,
+                )
+                states[event_id] = created_states[event_id] = state
+
+            if _apply_interaction(state, interaction_type, v, now) and state.pk:
+                changed[state.pk] = state
+
+            if interaction_type is None:
+                continue
+
+            if dedupe:
+                # Repeats within the replayed payloads are skipped too
+                logged.add((event_id, interaction_type, timestamp))
+            interactions.append(InteractionEvent(
+                user=user,
+                notification_event_id=event_id,
+                interaction_type=interaction_type,
+                timestamp=timestamp,
+                raw_reason=v.get("raw_reason"),
+                metadata={"dismissed_by": v.get("dismissed_by")} if interaction_type == DISMISS else None,
+            ))
+            if interaction_type == InteractionEvent.CLICK:
+                clicks[(user.id, app.id, timestamp.date())] += 1
+
+        if created_states or changed or interactions:
+            change_seq = ChangeSequence.objects.advance(user.id)
+            for state in (*created_states.values(), *changed.values()):
+                state.change_seq = change_seq
+            UnreadCounter.objects.record([*created_states.values(), *changed.values()])
+            HourlyAggregate.objects.record([*created_states.values(), *changed.values()])
+        if created_states:
+            UserNotificationState.objects.bulk_create(created_states.values(), ignore_conflicts=True)
+        if changed:
+            UserNotificationState.objects.bulk_update(
+                changed.values(),
+                ["opened_at", "is_read", "dismissed_at", "dismissed_by", "last_updated", "change_seq"],
+            )
+        if interactions:
+            InteractionEvent.objects.bulk_create(interactions)
+        record_aggregates({key: (0, n, 0) for key, n in clicks.items()})
+
+    return results
+
+
+def record_interaction(user, v, dedupe=False):
+    """
+    Single-payload version of record_interactions() for a payload carrying
+    a notif_key. Returns the logged interaction type ("CLICK", "DISMISS")
+    or None; raises NotificationEvent.DoesNotExist if the notification was
+    never ingested.
+    """
+    result = record_interactions(user, [v], dedupe=dedupe)[0]
+    if not result["ok"]:
+        raise NotificationEvent.DoesNotExist(result["error"])
+    return result["logged"]
@@ -0,0 +1,244 @@
+"""
+Per-user Bloom filters over the (app, notif_key) index.
+
+Almost every ingested notif_key is brand new, so record_notification asks
+the filter first and skips the existence SELECT when the key definitely
+isn't there. A "maybe" answer falls back to the real lookup.
+
+The filters live in process memory and only learn about inserts made by this
+process, so a key inserted elsewhere can be reported as absent. That is safe:
+the INSERT then hits the unique constraint and ingestion falls back to the
+existing row. `manage.py rebuild_notif_key_filters` rebuilds snapshots from
+the database, which workers load instead of seeding from the database
+themselves.
+
+A user without a usable snapshot (none yet, or saturated) has their filter
+built by a background thread of the worker, never inside the ingest
+request: seeding scans the user's whole history. Until it is ready, every
+key takes the plain existence SELECT. The finished filter is saved as the
+user's snapshot, so other workers pick it up from there.
+"""
+import hashlib
+import logging
+import math
+import os
+import queue
+import struct
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import App, NotificationEvent
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    HEADER = struct.Struct("<4sIQQQ")
+    MAGIC = b"NBBF"
+
+    def __init__(self, capacity, fp_rate=0.01, num_bits=None, num_hashes=None, bits=None, count=0):
+        self.capacity = max(int(capacity), 1)
+        self.num_bits = num_bits or max(
+            int(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)), 64
+        )
+        self.num_hashes = num_hashes or max(
+            int(round(self.num_bits / self.capacity * math.log(2))), 1
+        )
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def saturated(self):
+        """Past capacity the false-positive rate climbs; time to rebuild bigger."""
+        return self.count > self.capacity
+
+    def to_bytes(self):
+        header = self.HEADER.pack(
+            self.MAGIC, self.num_hashes, self.num_bits, self.capacity, self.count
+        )
+        return header + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, num_hashes, num_bits, capacity, count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError("Not a notif_key filter snapshot")
+        bits = bytearray(data[cls.HEADER.size:])
+        return cls(capacity, num_bits=num_bits, num_hashes=num_hashes, bits=bits, count=count)
+
+
+def filter_item(app_id, notif_key):
+    return f"{app_id}:{notif_key}"
+
+
+def build_filter(user_id):
+    """Seeds a filter from the user's (app, notif_key) index entries."""
+    keys = NotificationEvent.objects.filter(
+        app_id__in=App.objects.filter(user_id=user_id).values("id"),
+    ).values_list("app_id", "notif_key")
+
+    items = [filter_item(app_id, notif_key) for app_id, notif_key in keys.iterator(chunk_size=5000)]
+    bloom = BloomFilter(
+        max(len(items) * 2, 1024),
+        settings.NOTIF_KEY_FILTER_FP_RATE,
+    )
+    for item in items:
+        bloom.add(item)
+    return bloom
+
+
+def snapshot_path(user_id):
+    return os.path.join(settings.NOTIF_KEY_FILTER_DIR, f"{user_id}.bloom")
+
+
+def save_snapshot(user_id, bloom):
+    os.makedirs(settings.NOTIF_KEY_FILTER_DIR, exist_ok=True)
+    path = snapshot_path(user_id)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(bloom.to_bytes())
+    os.replace(tmp, path)
+
+
+def load_snapshot(user_id):
+    try:
+        with open(snapshot_path(user_id), "rb") as f:
+            return BloomFilter.from_bytes(f.read())
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+class KeyFilterRegistry:
+    """
+    Bounded LRU of per-user filters, loaded lazily on first use from the
+    snapshot, or built in the background when there is none.
+    """
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._filters = OrderedDict()
+        self._lock = threading.Lock()
+        # user_id -> items inserted while their filter is being built
+        self._building = {}
+        self._queue = None
+        self._builder_pid = None
+
+    def _get(self, user_id):
+        """The user's filter, or None while it isn't ready."""
+        with self._lock:
+            bloom = self._filters.get(user_id)
+            if bloom is not None:
+                self._filters.move_to_end(user_id)
+                return bloom
+            if user_id in self._building and self._builder_pid == os.getpid():
+                return None
+
+        bloom = load_snapshot(user_id)
+        if bloom is None or bloom.saturated:
+            self._schedule_build(user_id)
+            return None
+
+        with self._lock:
+            self._store(user_id, bloom)
+        return bloom
+
+    def _store(self, user_id, bloom):
+        # Called with self._lock held
+        self._filters[user_id] = bloom
+        self._filters.move_to_end(user_id)
+        while len(self._filters) > self.max_users:
+            self._filters.popitem(last=False)
+
+    def _schedule_build(self, user_id):
+        with self._lock:
+            if self._builder_pid != os.getpid():
+                # Threads don't survive a fork; neither do the parent's builds
+                self._builder_pid = os.getpid()
+                self._building = {}
+                self._queue = queue.SimpleQueue()
+                threading.Thread(
+                    target=self._run_builder, name="notif-key-filter-build", daemon=True
+                ).start()
+            if user_id in self._building:
+                return
+            self._building[user_id] = []
+            self._queue.put(user_id)
+
+    def _run_builder(self):
+        builds = self._queue
+        while True:
+            user_id = builds.get()
+            try:
+                bloom = build_filter(user_id)
+            except Exception:
+                logger.exception("Failed to build the notif_key filter of user %s", user_id)
+                with self._lock:
+                    self._building.pop(user_id, None)
+                continue
+            finally:
+                # This thread owns its own connection; don't hold it open
+                connection.close()
+
+            # Keys inserted since the scan started were queued by add();
+            # the ones arriving while the snapshot is written too.
+            with self._lock:
+                pending = self._building.get(user_id, [])
+                applied = len(pending)
+                for item in pending[:applied]:
+                    bloom.add(item)
+            try:
+                save_snapshot(user_id, bloom)
+            except OSError:
+                logger.exception("Failed to save the notif_key filter of user %s", user_id)
+            with self._lock:
+                for item in self._building.pop(user_id, [])[applied:]:
+                    bloom.add(item)
+                if not bloom.saturated:
+                    self._store(user_id, bloom)
+
+    def might_exist(self, user_id, app_id, notif_key):
+        if not settings.NOTIF_KEY_FILTER_ENABLED:
+            return True
+        bloom = self._get(user_id)
+        if bloom is None:
+            return True  # not ready: look it up
+        return filter_item(app_id, notif_key) in bloom
+
+    def add(self, user_id, keys):
+        """Records inserted (app_id, notif_key) pairs in a loaded or building filter."""
+        items = [filter_item(app_id, notif_key) for app_id, notif_key in keys]
+        with self._lock:
+            bloom = self._filters.get(user_id)
+            if bloom is None:
+                pending = self._building.get(user_id)
+                if pending is not None:
+                    pending.extend(items)
+                return  # otherwise loaded or built when first needed
+        for item in items:
+            bloom.add(item)
+        if bloom.saturated:
+            self.discard(user_id)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._filters.pop(user_id, None)
+
+
+key_filters = KeyFilterRegistry(settings.NOTIF_KEY_FILTER_MAX_USERS)
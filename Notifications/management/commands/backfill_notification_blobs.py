@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from Notifications.blobs import IMAGE_FIELDS, externalize_images
+from Notifications.models import NotificationEvent
+
+
+class Command(BaseCommand):
+    help = "Move inline base64 notification images into the blob store, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        fields = [f for pair in IMAGE_FIELDS for f in pair]
+        pending = Q(large_icon_base64__isnull=False) | Q(picture_base64__isnull=False)
+
+        last_id = 0
+        scanned = moved = 0
+        while True:
+            chunk = list(
+                NotificationEvent.objects.filter(pending, id__gt=last_id)
+                .order_by("id")
+                .only("id", *fields)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            changed = []
+            for event in chunk:
+                values = {f: getattr(event, f) for f in fields}
+                externalize_images(values)
+                if values != {f: getattr(event, f) for f in fields}:
+                    for f, value in values.items():
+                        setattr(event, f, value)
+                    changed.append(event)
+
+            if changed:
+                NotificationEvent.objects.bulk_update(changed, fields)
+
+            scanned += len(chunk)
+            moved += len(changed)
+            self.stdout.write(f"scanned {scanned}, moved {moved} (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {moved} of {scanned} events moved to the blob store."))
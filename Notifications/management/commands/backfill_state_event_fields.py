@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Notifications.models import UserNotificationState
+
+
+class Command(BaseCommand):
+    help = "Copy post_time, app and type from each NotificationEvent onto its states, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+
+        last_id = 0
+        filled = 0
+        while True:
+            chunk = list(
+                UserNotificationState.objects.filter(post_time__isnull=True, id__gt=last_id)
+                .order_by("id")
+                .values_list(
+                    "id",
+                    "notification_event__app_id",
+                    "notification_event__post_time",
+                    "notification_event__type",
+                )[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+
+            states = [
+                UserNotificationState(id=pk, app_id=app_id, post_time=post_time, type=notif_type)
+                for pk, app_id, post_time, notif_type in chunk
+            ]
+            with transaction.atomic():
+                UserNotificationState.objects.bulk_update(states, ["app", "post_time", "type"])
+
+            filled += len(states)
+            self.stdout.write(f"filled {filled} (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {filled} states backfilled."))
@@ -0,0 +1,276 @@
+"""
+Ingest load benchmark and traffic replayer.
+
+Generates synthetic Android traffic - bursty posts from many apps per user,
+clicks and dismissals that follow their notifications, and feed reads - or
+replays a recorded JSONL file of the same operations, through the Django
+test client against a throwaway local SQLite database. Reports throughput,
+p50/p95/p99 latency and queries per request for each endpoint.
+
+    python manage.py bench_ingest --settings=NotifybearServer.settings_bench \
+        --users 20 --minutes 120 --output var/bench/baseline.json
+
+A traffic file holds one operation per line:
+
+    {"at": 12.5, "user": 3, "endpoint": "ingest_notification", "body": {...}}
+    {"at": 14.0, "user": 3, "endpoint": "get_user_notifications", "query": {"limit": 20}}
+"""
+import base64
+import json
+import os
+import platform
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Notifications.app_cache import app_cache
+from Notifications.counters import aggregate_buffer
+
+User = get_user_model()
+
+ENDPOINTS = {
+    "ingest_notification": "post",
+    "ingest_interaction": "post",
+    "get_user_notifications": "get",
+}
+
+# A 1x1 PNG; apps resend the same icon with every notification
+ICON = base64.b64encode(
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06"
+    b"\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01"
+    b"\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82"
+).decode()
+
+EPOCH = datetime(2026, 1, 5, 8, 0, tzinfo=dt_timezone.utc)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def generate_traffic(users, apps_per_user, minutes, seed):
+    """
+    Returns operations ordered by device time (`at`, seconds from start).
+
+    Each user has `apps_per_user` apps with Zipf-like popularity. Posts come
+    in bursts (a chat thread, a batch of emails); most notifications are
+    later clicked or dismissed, and the user opens the feed now and then.
+    """
+    rng = random.Random(seed)
+    ops = []
+    horizon = minutes * 60
+
+    for user in range(users):
+        packages = [f"com.bench.app{i}" for i in range(apps_per_user)]
+        weights = [1 / (rank + 1) for rank in range(apps_per_user)]
+        seq = 0
+
+        t = rng.expovariate(1 / 90)
+        while t < horizon:
+            package = rng.choices(packages, weights)[0]
+            burst = min(1 + int(rng.expovariate(1 / 2)), 12)
+            for i in range(burst):
+                at = t + i * rng.uniform(0.2, 3)
+                seq += 1
+                key = f"0|{package}|{seq}|null|10{user}"
+                posted_at = EPOCH + timedelta(seconds=at)
+                body = {
+                    "package_name": package,
+                    "app_label": package.rsplit(".", 1)[-1].title(),
+                    "notif_key": key,
+                    "posted_at": posted_at.isoformat(),
+                    "title": f"Message {seq}",
+                    "text": " ".join(rng.choices(["hey", "are", "you", "coming", "tonight", "ok", "see", "soon"], k=8)),
+                    "channel_id": "messages",
+                    "type": rng.choice(["message", "message", "email", "social", "general"]),
+                }
+                if rng.random() < 0.5:
+                    body["large_icon_base64"] = ICON
+                ops.append({"at": at, "user": user, "endpoint": "ingest_notification", "body": body})
+
+                outcome = rng.random()
+                if outcome < 0.75:
+                    removed = at + rng.expovariate(1 / 300)
+                    interaction = {
+                        "package_name": package,
+                        "notif_key": key,
+                        "removed_at": (EPOCH + timedelta(seconds=removed)).isoformat(),
+                    }
+                    if outcome < 0.3:
+                        interaction["raw_reason"] = 1
+                    else:
+                        interaction["dismissed_by"] = "user" if outcome < 0.65 else "app"
+                    ops.append({"at": removed, "user": user, "endpoint": "ingest_interaction", "body": interaction})
+
+            t += rng.expovariate(1 / 90)
+
+        t = rng.expovariate(1 / 600)
+        while t < horizon:
+            ops.append({"at": t, "user": user, "endpoint": "get_user_notifications", "query": {"limit": 20}})
+            t += rng.expovariate(1 / 600)
+
+    ops.sort(key=lambda op: op["at"])
+    return ops
+
+
+class Command(BaseCommand):
+    help = "Benchmark the ingest and feed endpoints with synthetic or recorded traffic."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--apps", type=int, default=25, help="Apps per user.")
+        parser.add_argument("--minutes", type=int, default=60, help="Device time to simulate.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--replay", help="Replay operations from this JSONL file.")
+        parser.add_argument("--record", help="Write the generated operations to this JSONL file.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError(
+                "bench_ingest creates and drops its own database; run it with "
+                "--settings=NotifybearServer.settings_bench"
+            )
+
+        if options["replay"]:
+            with open(options["replay"]) as f:
+                ops = [json.loads(line) for line in f if line.strip()]
+            source = options["replay"]
+        else:
+            ops = generate_traffic(options["users"], options["apps"], options["minutes"], options["seed"])
+            source = "synthetic"
+        if options["record"]:
+            with open(options["record"], "w") as f:
+                for op in ops:
+                    f.write(json.dumps(op) + "\n")
+
+        unknown = {op["endpoint"] for op in ops} - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoint(s) in traffic: {', '.join(sorted(unknown))}")
+
+        test_name = connection.settings_dict["TEST"].get("NAME")
+        if test_name:
+            os.makedirs(os.path.dirname(test_name), exist_ok=True)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(ops)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        results["source"] = source
+        if not options["replay"]:
+            results["options"] = {k: options[k] for k in ("users", "apps", "minutes", "seed")}
+        self.report(results)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def run(self, ops):
+        clients = {}
+        for user_key in sorted({op["user"] for op in ops}, key=str):
+            user = User.objects.create_user(
+                username=f"bench_{user_key}",
+                email=f"bench_{user_key}@example.com",
+                password=None,
+            )
+            client = APIClient(SERVER_NAME="localhost")
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+            clients[user_key] = client
+
+        urls = {name: reverse(name) for name in ENDPOINTS}
+        latencies = defaultdict(list)
+        queries = defaultdict(list)
+        errors = defaultdict(int)
+
+        app_cache.clear()
+        started_at = datetime.now(dt_timezone.utc)
+        started = time.perf_counter()
+        for op in ops:
+            name = op["endpoint"]
+            client = clients[op["user"]]
+            with CaptureQueriesContext(connection) as captured:
+                t0 = time.perf_counter()
+                if ENDPOINTS[name] == "post":
+                    response = client.post(urls[name], op["body"], format="json", secure=True)
+                else:
+                    response = client.get(urls[name], op.get("query"), secure=True)
+                elapsed = time.perf_counter() - t0
+            latencies[name].append(elapsed)
+            queries[name].append(len(captured.captured_queries))
+            if response.status_code >= 400:
+                errors[name] += 1
+        # Buffered counters are part of the cost of ingest
+        aggregate_buffer.flush()
+        wall = time.perf_counter() - started
+
+        endpoints = {}
+        for name in ENDPOINTS:
+            samples = sorted(latencies[name])
+            if not samples:
+                continue
+            counts = queries[name]
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": errors[name],
+                "throughput_rps": round(len(samples) / sum(samples), 1),
+                "latency_ms": {
+                    "mean": round(sum(samples) / len(samples) * 1000, 3),
+                    "p50": round(percentile(samples, 50) * 1000, 3),
+                    "p95": round(percentile(samples, 95) * 1000, 3),
+                    "p99": round(percentile(samples, 99) * 1000, 3),
+                },
+                "queries": {
+                    "mean": round(sum(counts) / len(counts), 2),
+                    "max": max(counts),
+                },
+            }
+
+        return {
+            "started_at": started_at.isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "requests": len(ops),
+            "wall_seconds": round(wall, 3),
+            "throughput_rps": round(len(ops) / wall, 1) if wall else None,
+            "endpoints": endpoints,
+            "app_cache": app_cache.stats(),
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"{results['requests']} requests in {results['wall_seconds']}s "
+            f"({results['throughput_rps']} req/s, {results['source']})"
+        )
+        self.stdout.write(
+            f"{'endpoint':<26}{'reqs':>7}{'err':>5}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        for name, r in results["endpoints"].items():
+            lat = r["latency_ms"]
+            self.stdout.write(
+                f"{name:<26}{r['requests']:>7}{r['errors']:>5}{r['throughput_rps']:>9}"
+                f"{lat['p50']:>9}{lat['p95']:>9}{lat['p99']:>9}{r['queries']['mean']:>9}"
+            )
+        cache_stats = results.get("app_cache")
+        if cache_stats:
+            self.stdout.write(
+                f"app cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                f"({cache_stats['stale']} stale), {cache_stats['entries']}/{cache_stats['max_entries']} entries"
+            )
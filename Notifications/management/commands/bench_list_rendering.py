@@ -0,0 +1,148 @@
+"""
+Times the serializer and values() (fast path) rendering of the feed and
+bookmarks on a throwaway SQLite database and reports the time, queries and
+response size of each. That both render the same bytes is checked by
+FastListRenderingTestCase in Notifications/tests.py.
+
+    python manage.py bench_list_rendering --settings=NotifybearServer.settings_bench
+"""
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Notifications.counters import aggregate_buffer
+from Notifications.ingestion import record_notifications
+from Notifications.models import NotificationEvent, NotificationMessage, UserNotificationState
+
+User = get_user_model()
+
+CASES = (
+    ("get_user_notifications", {"limit": 100}),
+    ("get_user_notifications", {"limit": 100, "view": "compact"}),
+    ("get_user_notifications", {"limit": 100, "fields": "id,title,post_time,reaction_time"}),
+    ("get_user_notifications", {"limit": 100, "cursor": ""}),
+    ("bookmarked_notifications", {}),
+    ("bookmarked_notifications", {"view": "compact"}),
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark serializer vs. values() rendering of notification lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--notifications", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError(
+                "bench_list_rendering creates and drops its own database; run it with "
+                "--settings=NotifybearServer.settings_bench"
+            )
+
+        test_name = connection.settings_dict["TEST"].get("NAME")
+        if test_name:
+            os.makedirs(os.path.dirname(test_name), exist_ok=True)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            client = self.seed(options["notifications"])
+            results = [self.compare(client, name, params, options["repeat"]) for name, params in CASES]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{'case':<85}{'serializer ms':>15}{'fast ms':>10}{'speedup':>9}{'queries':>9}"
+        )
+        for r in results:
+            self.stdout.write(
+                f"{r['case']:<85}{r['serializer']['ms']:>15}{r['fast']['ms']:>10}"
+                f"{r['speedup']:>9}{r['serializer']['queries']:>4}/{r['fast']['queries']:<4}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def seed(self, count):
+        user = User.objects.create_user(username="bench", email="bench@example.com", password=None)
+        now = timezone.now()
+        record_notifications(user, [
+            {
+                "package_name": f"com.bench.app{i % 20}",
+                "app_label": f"App {i % 20}",
+                "notif_key": f"k{i}",
+                "posted_at": now - timedelta(minutes=i),
+                "title": f"Title {i} — été",
+                "text": "Line one\nline two   separator",
+                "type": "message" if i % 3 else "email",
+                "people": '["alice", "bob"]' if i % 5 == 0 else None,
+            }
+            for i in range(count)
+        ])
+        aggregate_buffer.flush()
+
+        states = UserNotificationState.objects.filter(user=user).order_by("id")
+        for i, state in enumerate(states):
+            if i % 3 == 0:
+                state.opened_at = state.post_time + timedelta(seconds=30 + i)
+                state.is_read = True
+            state.ml_score = i / 7 if i % 2 else None
+            state.is_bookmarked = i % 4 == 0
+        UserNotificationState.objects.bulk_update(states, ["opened_at", "is_read", "ml_score", "is_bookmarked"])
+
+        NotificationMessage.objects.bulk_create([
+            NotificationMessage(notification_event_id=pk, sender="alice", message_text="hi", message_time=now)
+            for pk in NotificationEvent.objects.filter(app__user=user).values_list("id", flat=True)[::5]
+        ])
+
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(user)
+        return client
+
+    def measure(self, client, url, params, repeat):
+        client.get(url, params, secure=True)  # warm up
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url, params, secure=True)
+        queries = len(captured.captured_queries)  # the next request resets the log
+        started = time.perf_counter()
+        for _ in range(repeat):
+            client.get(url, params, secure=True)
+        elapsed = (time.perf_counter() - started) / repeat
+        return {
+            "ms": round(elapsed * 1000, 2),
+            "queries": queries,
+            "bytes": len(response.content),
+        }
+
+    def compare(self, client, name, params, repeat):
+        url = reverse(name)
+        # Repeat hits would otherwise come from the versioned response cache
+        with override_settings(FAST_LIST_RENDERING=False, VERSIONED_RESPONSE_CACHE_TIMEOUT=0):
+            slow = self.measure(client, url, params, repeat)
+        with override_settings(FAST_LIST_RENDERING=True, VERSIONED_RESPONSE_CACHE_TIMEOUT=0):
+            fast = self.measure(client, url, params, repeat)
+        return {
+            "case": f"{name} {params}",
+            "serializer": slow,
+            "fast": fast,
+            "speedup": round(slow["ms"] / fast["ms"], 2) if fast["ms"] else None,
+        }
@@ -0,0 +1,131 @@
+import logging
+import time
+from itertools import groupby
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Notifications.ingestion import record_interactions, record_notifications
+from Notifications.serializers import IngestInteractionSerializer, IngestNotificationSerializer
+from Notifications.spool import IngestSpool, ingest_spool
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Drain the local ingest spool into the database in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--lease", type=int, default=60, help="Claim lease in seconds.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Poll interval when idle.")
+        parser.add_argument(
+            "--retry-delay",
+            type=float,
+            default=60.0,
+            help="Seconds before retrying an interaction whose notification isn't in yet.",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once the spool is empty.")
+        parser.add_argument("--stats", action="store_true", help="Print depth and lag, then exit.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(self.format_stats(ingest_spool.stats()))
+            return
+
+        while True:
+            entries = ingest_spool.claim(options["batch_size"], options["lease"])
+            if not entries:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            close_old_connections()
+            drained = self.drain(entries, options["retry_delay"])
+            self.stdout.write(
+                f"drained {drained}/{len(entries)}, {self.format_stats(ingest_spool.stats())}"
+            )
+
+    def format_stats(self, stats):
+        return (
+            f"depth {stats['depth']}, lag {stats['lag_seconds']}s, "
+            f"dead {stats['dead']}"
+        )
+
+    def drain(self, entries, retry_delay=60.0):
+        users = User.objects.in_bulk({user_id for _, _, user_id, _ in entries})
+        drained = 0
+
+        # Consecutive entries of the same kind and user are applied together,
+        # which keeps each user's notifications ahead of their interactions.
+        for (kind, user_id), group in groupby(entries, key=lambda e: (e[1], e[2])):
+            group = list(group)
+            ids = [pk for pk, _, _, _ in group]
+            user = users.get(user_id)
+
+            if user is None:
+                ingest_spool.ack(ids)  # account deleted since
+                continue
+
+            try:
+                if kind == IngestSpool.NOTIFICATION:
+                    self.drain_notifications(user, group)
+                    unresolved = []
+                else:
+                    unresolved = self.drain_interactions(user, group)
+            except Exception:
+                logger.exception("Failed to drain %d %s entries for user %s", len(ids), kind, user_id)
+                ingest_spool.release(ids)
+                continue
+
+            if unresolved:
+                # Their notification may still be on its way; keep them
+                ingest_spool.defer(unresolved, retry_delay)
+                unresolved = set(unresolved)
+                ids = [pk for pk in ids if pk not in unresolved]
+            ingest_spool.ack(ids)
+            drained += len(ids)
+
+        return drained
+
+    def drain_notifications(self, user, group):
+        payloads = []
+        for pk, _, _, payload in group:
+            s = IngestNotificationSerializer(data=payload)
+            if not s.is_valid():
+                logger.warning("Dropping invalid spooled notification %s: %s", pk, s.errors)
+                continue
+            v = s.validated_data
+            if not v.get("notif_key"):
+                # Deterministic so a replay dedupes instead of duplicating
+                v["notif_key"] = f"auto_spool_{pk}"
+            payloads.append(v)
+
+        record_notifications(user, payloads)
+
+    def drain_interactions(self, user, group):
+        """Applies the group; returns the ids of entries whose notification isn't known yet."""
+        pks = []
+        payloads = []
+        for pk, _, _, payload in group:
+            s = IngestInteractionSerializer(data=payload)
+            if not s.is_valid():
+                logger.warning("Dropping invalid spooled interaction %s: %s", pk, s.errors)
+                continue
+            if not s.validated_data.get("notif_key"):
+                logger.warning("Dropping spooled interaction %s without a notif_key", pk)
+                continue
+            pks.append(pk)
+            payloads.append(s.validated_data)
+
+        results = record_interactions(user, payloads, dedupe=True)
+        unresolved = [pk for pk, r in zip(pks, results) if not r["ok"]]
+        if unresolved:
+            logger.warning(
+                "Deferring %d spooled interaction(s) for unknown notifications", len(unresolved)
+            )
+        return unresolved
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Notifications.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete old change feed tombstones; clients syncing from before them must resync."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Defaults to CHANGE_FEED_TOMBSTONE_DAYS.")
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options["days"])
+        self.stdout.write(f"Pruned {deleted} tombstone(s)")
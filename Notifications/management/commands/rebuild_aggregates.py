@@ -0,0 +1,121 @@
+"""
+Recomputes DailyAggregate from NotificationEvent and InteractionEvent.
+
+    python manage.py rebuild_aggregates [--user ID ...] [--since YYYY-MM-DD] [--until YYYY-MM-DD]
+                                        [--chunk-size 200] [--workers N]
+
+Users are rebuilt in chunks, each chunk with a few grouped queries and
+batched upserts in one transaction (Notifications.counters
+.rebuild_daily_aggregates), spread over a pool of worker processes. Rows are
+overwritten rather than added to, so an interrupted run can simply be
+started again. By default every day up to yesterday is rebuilt: today's
+counts are still moving through the DailyAggregateDelta journal.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Min
+from django.utils import timezone
+
+from Notifications.counters import rebuild_daily_aggregates
+from Notifications.models import App, DailyAggregate, InteractionEvent, NotificationEvent
+
+
+def _init_worker():
+    # Forked workers must not share the parent's connections; spawned
+    # ones start without Django set up.
+    django.setup()
+    connections.close_all()
+
+
+def _rebuild_chunk(user_ids, since, until):
+    try:
+        return len(user_ids), rebuild_daily_aggregates(user_ids, since, until)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyAggregate rows from the events, in parallel chunks of users."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="Only these user ids.")
+        parser.add_argument("--since", type=date.fromisoformat, help="First day (default: the earliest event).")
+        parser.add_argument("--until", type=date.fromisoformat, help="Last day, inclusive (default: yesterday).")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Users per chunk.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Worker processes (default: one per CPU; always 1 on SQLite).",
+        )
+
+    def handle(self, *args, **options):
+        until = options["until"] or timezone.now().date() - timedelta(days=1)
+        since = options["since"] or self.first_day()
+        if since is None:
+            self.stdout.write("Nothing to rebuild.")
+            return
+        if since > until:
+            raise CommandError(f"--since {since} is after --until {until}")
+
+        user_ids = options["user"] or sorted(
+            set(App.objects.values_list("user_id", flat=True).distinct())
+            | set(DailyAggregate.objects.values_list("user_id", flat=True).distinct())
+        )
+        size = options["chunk_size"]
+        chunks = [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+
+        workers = options["workers"]
+        if connection.vendor == "sqlite":
+            # SQLite fails concurrent writers instead of waiting
+            workers = 1
+
+        self.stdout.write(
+            f"Rebuilding {since} .. {until} for {len(user_ids)} users in {len(chunks)} chunks"
+        )
+        started = time.monotonic()
+        users = rows = 0
+
+        def progress(chunk_users, chunk_rows):
+            nonlocal users, rows
+            users += chunk_users
+            rows += chunk_rows
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"users {users}/{len(user_ids)}, rows {rows}, {elapsed:.1f}s, "
+                f"{users / elapsed:.1f} users/s, {rows / elapsed:.1f} rows/s"
+            )
+
+        if workers == 1:
+            for chunk in chunks:
+                progress(len(chunk), rebuild_daily_aggregates(chunk, since, until))
+        else:
+            connections.close_all()  # don't hand open connections to forked workers
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [pool.submit(_rebuild_chunk, chunk, since, until) for chunk in chunks]
+                for future in as_completed(futures):
+                    progress(*future.result())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {rows} rows for {users} users in {time.monotonic() - started:.1f}s."
+        ))
+
+    def first_day(self):
+        """The earliest day with an aggregate or an event, or None."""
+        days = [
+            DailyAggregate.objects.aggregate(first=Min("day"))["first"],
+            *(
+                first.date()
+                for first in (
+                    NotificationEvent.objects.aggregate(first=Min("post_time"))["first"],
+                    InteractionEvent.objects.aggregate(first=Min("timestamp"))["first"],
+                )
+                if first is not None
+            ),
+        ]
+        days = [day for day in days if day is not None]
+        return min(days) if days else None
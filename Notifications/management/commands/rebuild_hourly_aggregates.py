@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from Notifications.models import HourlyAggregate, UserNotificationState
+from Notifications.rollups import rebuild_hourly_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute the HourlyAggregate rollup from UserNotificationState, one user at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="Only these user ids.")
+
+    def handle(self, *args, **options):
+        user_ids = options["user"]
+        if not user_ids:
+            user_ids = sorted(
+                set(UserNotificationState.objects.values_list("user_id", flat=True).distinct())
+                | set(HourlyAggregate.objects.values_list("user_id", flat=True).distinct())
+            )
+
+        buckets = 0
+        for done, user_id in enumerate(user_ids, 1):
+            buckets += rebuild_hourly_aggregates(user_id)
+            self.stdout.write(f"rebuilt {done}/{len(user_ids)} users (last {user_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {buckets} buckets for {len(user_ids)} users."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from Notifications.key_filter import build_filter, save_snapshot
+from Notifications.models import App
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-user notif_key Bloom filter snapshots from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Only rebuild for this user id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["users"] or (
+            App.objects.values_list("user_id", flat=True).distinct().order_by("user_id")
+        )
+
+        rebuilt = 0
+        for user_id in user_ids:
+            bloom = build_filter(user_id)
+            save_snapshot(user_id, bloom)
+            rebuilt += 1
+            self.stdout.write(f"user {user_id}: {bloom.count} keys, {len(bloom.bits)} bytes")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} filter(s)."))
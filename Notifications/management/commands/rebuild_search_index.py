@@ -0,0 +1,41 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Notifications.models import NotificationEvent
+from Notifications.search import clear_index, index_events
+
+
+class Command(BaseCommand):
+    help = "Rebuild the notification full-text search index from NotificationEvent, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--keep", action="store_true", help="Don't clear the index first.")
+
+    def handle(self, *args, **options):
+        if not options["keep"]:
+            clear_index()
+
+        last_id = 0
+        indexed = 0
+        while True:
+            chunk = list(
+                NotificationEvent.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "app__user_id", "title", "text", "big_text", "conversation_title")
+                .select_related("app")[:options["chunk_size"]]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            with transaction.atomic():
+                for user_id, events in groupby(sorted(chunk, key=lambda e: e.app.user_id), key=lambda e: e.app.user_id):
+                    index_events(user_id, list(events))
+
+            indexed += len(chunk)
+            self.stdout.write(f"indexed {indexed} (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {indexed} events indexed."))
@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Notifications.models import UnreadCounter, UserNotificationState
+from Notifications.unread import reconcile_unread_counters
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Recount unread notifications and fix drifted unread counters; reports the drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="Only these user ids.")
+        parser.add_argument("--interval", type=float, help="Repeat every N seconds instead of exiting.")
+
+    def handle(self, *args, **options):
+        while True:
+            self.reconcile(options["user"])
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+            close_old_connections()
+
+    def reconcile(self, user_ids):
+        if not user_ids:
+            user_ids = sorted(
+                set(UserNotificationState.objects.values_list("user_id", flat=True).distinct())
+                | set(UnreadCounter.objects.values_list("user_id", flat=True).distinct())
+            )
+
+        users = drifted_users = buckets = drift = 0
+        for user_id in user_ids:
+            drifted, user_drift = reconcile_unread_counters(user_id)
+            users += 1
+            if drifted:
+                drifted_users += 1
+                buckets += drifted
+                drift += user_drift
+
+        summary = (
+            f"users {users}, drifted users {drifted_users}, "
+            f"drifted buckets {buckets}, drift {drift}"
+        )
+        if drift:
+            logger.warning("Unread counter drift: %s", summary)
+        self.stdout.write(summary)
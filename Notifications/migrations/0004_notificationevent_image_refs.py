@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notifications', '0003_usernotificationstate_dismissed_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationevent',
+            name='large_icon_ref',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationevent',
+            name='picture_ref',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
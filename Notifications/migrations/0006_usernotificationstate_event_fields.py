@@ -0,0 +1,81 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:42
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+CHUNK_SIZE = 2000
+
+
+def backfill(apps, schema_editor):
+    """
+    Copies post_time, app and type from each NotificationEvent onto the
+    existing states. The feed seeks on UserNotificationState.post_time, and
+    a NULL one can't be put in a cursor; the counters seeded by later
+    migrations read app and type.
+    """
+    UserNotificationState = apps.get_model("Notifications", "UserNotificationState")
+
+    last_id = 0
+    while True:
+        chunk = list(
+            UserNotificationState.objects.filter(post_time__isnull=True, id__gt=last_id)
+            .order_by("id")
+            .values_list(
+                "id",
+                "notification_event__app_id",
+                "notification_event__post_time",
+                "notification_event__type",
+            )[:CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+
+        with transaction.atomic():
+            UserNotificationState.objects.bulk_update(
+                [
+                    UserNotificationState(id=pk, app_id=app_id, post_time=post_time, type=notif_type)
+                    for pk, app_id, post_time, notif_type in chunk
+                ],
+                ["app", "post_time", "type"],
+            )
+
+
+class Migration(migrations.Migration):
+    # One transaction per backfill chunk rather than one over the whole table
+    atomic = False
+
+    dependencies = [
+        ('Notifications', '0004_notificationevent_image_refs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usernotificationstate',
+            name='app',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notification_states', to='Notifications.app'),
+        ),
+        migrations.AddField(
+            model_name='usernotificationstate',
+            name='post_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='usernotificationstate',
+            name='type',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='usernotificationstate',
+            index=models.Index(fields=['user', 'post_time', 'notification_event'], name='Notificatio_user_id_aebd34_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotificationstate',
+            index=models.Index(fields=['user', 'type', 'post_time'], name='Notificatio_user_id_cff2d0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotificationstate',
+            index=models.Index(fields=['user', 'app', 'post_time'], name='Notificatio_user_id_7f5ebb_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notifications', '0006_usernotificationstate_event_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usernotificationstate',
+            name='Notificatio_user_id_a86e29_idx',
+        ),
+        migrations.AddIndex(
+            model_name='usernotificationstate',
+            index=models.Index(fields=['user', 'is_read', 'ml_score', 'id'], name='Notificatio_user_id_041d90_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Accounts', '0002_userprofile_address'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Notifications', '0007_usernotificationstate_score_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='change_sequence', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField(default=0)),
+                ('horizon', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Change Sequence',
+                'verbose_name_plural': 'Change Sequences',
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state_id', models.BigIntegerField()),
+                ('notification_event_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Notification Tombstone',
+                'verbose_name_plural': 'Notification Tombstones',
+            },
+        ),
+        migrations.AddField(
+            model_name='usernotificationstate',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='usernotificationstate',
+            index=models.Index(fields=['user', 'change_seq', 'id'], name='Notificatio_user_id_86f920_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationtombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notificationtombstone',
+            index=models.Index(fields=['user', 'change_seq', 'state_id'], name='Notificatio_user_id_f7d842_idx'),
+        ),
+    ]
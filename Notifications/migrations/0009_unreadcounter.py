@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def seed(apps, schema_editor):
+    """Counts the existing unread states per (user, app, type)."""
+    UnreadCounter = apps.get_model("Notifications", "UnreadCounter")
+    UserNotificationState = apps.get_model("Notifications", "UserNotificationState")
+
+    rows = (
+        UserNotificationState.objects.filter(is_read=False, app__isnull=False)
+        .values("user_id", "app_id", notif_type=Coalesce("type", Value("")))
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    UnreadCounter.objects.bulk_create(
+        (
+            UnreadCounter(user_id=r["user_id"], app_id=r["app_id"], type=r["notif_type"], count=r["count"])
+            for r in rows.iterator()
+        ),
+        batch_size=500,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Notifications', '0008_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(blank=True, default='', max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to='Notifications.app')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Unread Counter',
+                'verbose_name_plural': 'Unread Counters',
+                'unique_together': {('user', 'app', 'type')},
+            },
+        ),
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+"""
+The full-text search index (see Notifications.search), filled with the
+existing events. The DDL is spelled out here rather than imported, so the
+migration stays as it is whatever becomes of the search module.
+"""
+from django.db import migrations
+
+TABLE = "Notifications_search"
+
+
+def create(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    NotificationEvent = apps.get_model("Notifications", "NotificationEvent")
+    App = apps.get_model("Notifications", "App")
+    events = schema_editor.quote_name(NotificationEvent._meta.db_table)
+    app_table = schema_editor.quote_name(App._meta.db_table)
+    source = f"FROM {events} e JOIN {app_table} a ON a.id = e.app_id"
+
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE "{TABLE}" USING fts5('
+            "owner, title, text, big_text, conversation_title, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO "{TABLE}" (rowid, owner, title, text, big_text, conversation_title) '
+            "SELECT e.id, 'u' || a.user_id, COALESCE(e.title, ''), COALESCE(e.text, ''), "
+            f"COALESCE(e.big_text, ''), COALESCE(e.conversation_title, '') {source}"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f'CREATE TABLE "{TABLE}" ('
+            f'event_id bigint PRIMARY KEY REFERENCES {events} (id) '
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f'INSERT INTO "{TABLE}" (event_id, document) SELECT e.id, '
+            "setweight(to_tsvector('simple', 'u' || a.user_id), 'D') || "
+            "setweight(to_tsvector('simple', COALESCE(e.title, '')), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(e.text, '')), 'B') || "
+            "setweight(to_tsvector('simple', COALESCE(e.big_text, '')), 'C') || "
+            f"setweight(to_tsvector('simple', COALESCE(e.conversation_title, '')), 'B') {source}"
+        )
+        # Built after the bulk load rather than maintained through it
+        schema_editor.execute(f'CREATE INDEX "{TABLE}_document" ON "{TABLE}" USING GIN (document)')
+    elif vendor == "mysql":
+        schema_editor.execute(
+            f"CREATE TABLE `{TABLE}` ("
+            "event_id bigint PRIMARY KEY, user_id bigint NOT NULL, "
+            "title varchar(500) NOT NULL, text longtext NOT NULL, big_text longtext NOT NULL, "
+            "conversation_title varchar(500) NOT NULL, "
+            "INDEX search_user (user_id), "
+            "FULLTEXT INDEX search_text (title, text, big_text, conversation_title), "
+            f"FOREIGN KEY (event_id) REFERENCES {events} (id) ON DELETE CASCADE"
+            ") ENGINE=InnoDB"
+        )
+        schema_editor.execute(
+            f"INSERT INTO `{TABLE}` (event_id, user_id, title, text, big_text, conversation_title) "
+            "SELECT e.id, a.user_id, COALESCE(e.title, ''), COALESCE(e.text, ''), "
+            f"COALESCE(e.big_text, ''), COALESCE(e.conversation_title, '') {source}"
+        )
+
+
+def drop(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {schema_editor.quote_name(TABLE)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Notifications', '0009_unreadcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
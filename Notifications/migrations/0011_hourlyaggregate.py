@@ -0,0 +1,106 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:07
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
+import django.db.models.deletion
+
+
+def seed(apps, schema_editor):
+    """
+    Fills the buckets from the existing states, one user at a time, the
+    way Notifications.rollups.rebuild_hourly_aggregates recomputes them.
+    """
+    UserNotificationState = apps.get_model("Notifications", "UserNotificationState")
+    HourlyAggregate = apps.get_model("Notifications", "HourlyAggregate")
+
+    states = UserNotificationState.objects.filter(app__isnull=False, post_time__isnull=False)
+    user_ids = states.values_list("user_id", flat=True).distinct().order_by()
+    for user_id in list(user_ids):
+        rows = (
+            states.filter(user_id=user_id)
+            .values("app_id", notif_type=Coalesce("type", Value("")), bucket=TruncHour("post_time"))
+            .annotate(
+                posts=Count("id"),
+                reads=Count("id", filter=Q(is_read=True)),
+                opens=Count("opened_at"),
+                dismissals=Count("dismissed_at"),
+                response_time=Sum(
+                    ExpressionWrapper(F("opened_at") - F("post_time"), output_field=DurationField()),
+                ),
+            )
+            .order_by()
+        )
+
+        buckets = {}
+        for r in rows:
+            key = (r["app_id"], r["notif_type"], r["bucket"])  # NULL and "" share a bucket
+            response_time = r["response_time"] or timedelta(0)
+            counts = (
+                r["posts"],
+                r["reads"],
+                r["opens"],
+                r["dismissals"],
+                response_time.total_seconds(),
+                r["opens"],
+            )
+            current = buckets.get(key)
+            buckets[key] = counts if current is None else tuple(a + b for a, b in zip(current, counts))
+
+        HourlyAggregate.objects.bulk_create(
+            [
+                HourlyAggregate(
+                    user_id=user_id,
+                    app_id=app_id,
+                    type=notif_type,
+                    hour=hour,
+                    posts=posts,
+                    reads=reads,
+                    opens=opens,
+                    dismissals=dismissals,
+                    response_seconds=response_seconds,
+                    responses=responses,
+                )
+                for (app_id, notif_type, hour), (posts, reads, opens, dismissals, response_seconds, responses)
+                in buckets.items()
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Notifications', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(blank=True, default='', max_length=50)),
+                ('hour', models.DateTimeField()),
+                ('posts', models.IntegerField(default=0)),
+                ('reads', models.IntegerField(default=0)),
+                ('opens', models.IntegerField(default=0)),
+                ('dismissals', models.IntegerField(default=0)),
+                ('response_seconds', models.FloatField(default=0)),
+                ('responses', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_aggregates', to='Notifications.app')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_aggregates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Hourly Aggregate',
+                'verbose_name_plural': 'Hourly Aggregates',
+                'indexes': [models.Index(fields=['user', 'hour'], name='Notificatio_user_id_7ec296_idx'), models.Index(fields=['user', 'type', 'hour'], name='Notificatio_user_id_68fb1e_idx')],
+                'unique_together': {('user', 'app', 'type', 'hour')},
+            },
+        ),
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:14
+
+from datetime import timezone
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The stored format is the sketch module's own; it has no model imports
+from Notifications.sketches import DDSketch
+
+
+def seed(apps, schema_editor):
+    """
+    Builds the daily reaction time sketches from the opened states, one
+    user at a time, like Notifications.rollups.rebuild_hourly_aggregates.
+    """
+    UserNotificationState = apps.get_model("Notifications", "UserNotificationState")
+    ResponseSketch = apps.get_model("Notifications", "ResponseSketch")
+
+    opened = UserNotificationState.objects.filter(
+        app__isnull=False,
+        post_time__isnull=False,
+        opened_at__isnull=False,
+    )
+    user_ids = opened.values_list("user_id", flat=True).distinct().order_by()
+    for user_id in list(user_ids):
+        sketches = {}
+        rows = opened.filter(user_id=user_id).values_list("app_id", "post_time", "opened_at")
+        for app_id, post_time, opened_at in rows.iterator():
+            key = (app_id, post_time.astimezone(timezone.utc).date())
+            sketches.setdefault(key, DDSketch()).add((opened_at - post_time).total_seconds())
+
+        ResponseSketch.objects.bulk_create(
+            [
+                ResponseSketch(
+                    user_id=user_id,
+                    app_id=app_id,
+                    day=day,
+                    count=sketch.count,
+                    sketch=sketch.to_bytes(),
+                )
+                for (app_id, day), sketch in sketches.items()
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Notifications', '0011_hourlyaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('sketch', models.BinaryField()),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='response_sketches', to='Notifications.app')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='response_sketches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Response Sketch',
+                'verbose_name_plural': 'Response Sketches',
+                'indexes': [models.Index(fields=['user', 'day'], name='Notificatio_user_id_c92146_idx')],
+                'unique_together': {('user', 'app', 'day')},
+            },
+        ),
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Notifications', '0012_responsesketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAggregateDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('posts', models.IntegerField(default=0)),
+                ('clicks', models.IntegerField(default=0)),
+                ('swipes', models.IntegerField(default=0)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_aggregate_deltas', to='Notifications.app')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_aggregate_deltas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Aggregate Delta',
+                'verbose_name_plural': 'Daily Aggregate Deltas',
+                'indexes': [models.Index(fields=['user', 'day'], name='Notificatio_user_id_ebeda8_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,17 @@
-from django.db import models
+from datetime import timezone as dt_timezone
+
+from django.db import connection, models, transaction
 from django.conf import settings
+from django.dispatch import Signal
 from django.utils import timezone
 
+from .sketches import DDSketch
+
+
+# Sent with `user_id` and `change_seq` once a transaction that took a
+# ChangeSequence value has committed (see Notifications.stream)
+changes_committed = Signal()
+
 
 class App(models.Model):
     """
@@ -39,6 +49,19 @@ class App(models.Model):
         return f"{self.app_label or self.package_name}"
 
 
+class NotificationEventQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Rejects bulk updates of the immutable NotificationEvent fields."""
+        for name in kwargs:
+            field = self.model._meta.get_field(name)
+            if field.name in self.model.IMMUTABLE_FIELDS:
+                raise ValueError(
+                    f"NotificationEvent is immutable. "
+                    f"Cannot modify field '{field.name}' after creation."
+                )
+        return super().update(**kwargs)
+
+
 class NotificationEvent(models.Model):
     """
     IMMUTABLE notification event - represents "what happened".
@@ -78,6 +101,10 @@ class NotificationEvent(models.Model):
     # Image references (store URLs or base64, not recommended for large data)
     large_icon_base64 = models.TextField(null=True, blank=True)
     picture_base64 = models.TextField(null=True, blank=True)
+
+    # SHA-256 of images moved to the blob store (see Notifications.blobs)
+    large_icon_ref = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    picture_ref = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     
     # Conversation metadata (for messaging apps)
     conversation_title = models.CharField(max_length=500, null=True, blank=True)
@@ -98,6 +125,14 @@ class NotificationEvent(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Fields that may never change once the row exists
+    IMMUTABLE_FIELDS = (
+        "app", "notif_key", "post_time", "title", "text",
+        "big_text", "sub_text", "channel_id",
+    )
+
+    objects = NotificationEventQuerySet.as_manager()
+
     class Meta:
         unique_together = ("app", "notif_key")
         indexes = [
@@ -116,6 +151,32 @@ class NotificationEvent(models.Model):
         """Convenience property to access user through app."""
         return self.app.user
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_immutable_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.snapshot_immutable_fields()
+
+    def snapshot_immutable_fields(self):
+        """
+        Remembers the loaded (or just saved) values of the immutable fields,
+        so the pre_save guard can compare against them without a query.
+        Deferred fields are left out.
+        """
+        self._immutable_snapshot = {
+            attname: self.__dict__[attname]
+            for attname in self.immutable_attnames()
+            if attname in self.__dict__
+        }
+
+    @classmethod
+    def immutable_attnames(cls):
+        return [cls._meta.get_field(name).attname for name in cls.IMMUTABLE_FIELDS]
+
 
 class NotificationMessage(models.Model):
     """
@@ -146,6 +207,266 @@ class NotificationMessage(models.Model):
         preview = (self.message_text or "")[:30]
         return f"{self.sender}: {preview}"
 
+class ChangeSequenceManager(models.Manager):
+    def advance(self, user_id):
+        """
+        Takes the user's next change number. Must run inside the transaction
+        that writes the change: the upsert locks the counter row until
+        commit, so a user's numbers become visible in order.
+        changes_committed is sent once it commits.
+        """
+        value = self._advance(user_id)
+        transaction.on_commit(
+            lambda: changes_committed.send(sender=self.model, user_id=user_id, change_seq=value)
+        )
+        return value
+
+    def _advance(self, user_id):
+        ops = connection.ops
+        table = ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute(
+                    f"INSERT INTO {table} (user_id, value, horizon) VALUES (%s, 1, 0) "
+                    "ON DUPLICATE KEY UPDATE value = value + 1",
+                    [user_id],
+                )
+            else:
+                returning = " RETURNING value" if connection.features.can_return_columns_from_insert else ""
+                cursor.execute(
+                    f"INSERT INTO {table} (user_id, value, horizon) VALUES (%s, 1, 0) "
+                    f"ON CONFLICT (user_id) DO UPDATE SET value = {table}.value + 1{returning}",
+                    [user_id],
+                )
+                if returning:
+                    return cursor.fetchone()[0]
+        return self.filter(user_id=user_id).values_list("value", flat=True).get()
+
+    def value_for(self, user_id):
+        """The user's current value (0 before their first change)."""
+        return self.filter(user_id=user_id).values_list("value", flat=True).first() or 0
+
+
+class ChangeSequence(models.Model):
+    """
+    Per-user monotonic change counter.
+
+    Every transaction that changes a user's notification states takes the
+    next value and stamps it on the rows it writes (change_seq), which is
+    what the incremental change feed seeks on. The value doubles as the
+    user's data version behind the read endpoints' ETags, so other writes
+    visible to those endpoints (app labels) advance it too.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="change_sequence"
+    )
+    value = models.BigIntegerField(default=0)
+
+    # Tombstones up to this value have been pruned; older tokens must resync
+    horizon = models.BigIntegerField(default=0)
+
+    objects = ChangeSequenceManager()
+
+    class Meta:
+        verbose_name = "Change Sequence"
+        verbose_name_plural = "Change Sequences"
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.value}"
+
+
+class UnreadCounterManager(models.Manager):
+    def record(self, states):
+        """
+        Applies the unread changes of `states` about to be saved (new ones,
+        or loaded ones whose is_read changed). Call before saving, inside
+        the writing transaction.
+        """
+        deltas = {}
+        for state in states:
+            delta = state.unread_delta()
+            if delta and state.app_id:
+                key = (state.user_id, state.app_id, state.type or "")
+                deltas[key] = deltas.get(key, 0) + delta
+        self.apply(deltas)
+
+    def apply(self, deltas):
+        """Adds {(user_id, app_id, type): delta} to the counters in one upsert."""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        rows = []
+        params = []
+        for (user_id, app_id, notif_type), delta in deltas.items():
+            rows.append("(%s, %s, %s, %s)")
+            params.extend([user_id, app_id, notif_type, delta])
+
+        if connection.vendor == "mysql":
+            conflict = "ON DUPLICATE KEY UPDATE count = count + VALUES(count)"
+        else:
+            conflict = (
+                "ON CONFLICT (user_id, app_id, type) DO UPDATE SET "
+                f"count = {table}.count + EXCLUDED.count"
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, app_id, type, count) "
+                f"VALUES {', '.join(rows)} {conflict}",
+                params,
+            )
+
+
+# State columns the HourlyAggregate counters are derived from
+ACTIVITY_FIELDS = ("is_read", "opened_at", "dismissed_at")
+
+
+def activity_counts(is_read, opened_at, dismissed_at, post_time):
+    """A state's (reads, opens, dismissals, response_seconds, responses)."""
+    responded = opened_at is not None and post_time is not None
+    return (
+        int(bool(is_read)),
+        int(opened_at is not None),
+        int(dismissed_at is not None),
+        (opened_at - post_time).total_seconds() if responded else 0.0,
+        int(responded),
+    )
+
+
+def hour_of(value):
+    """The UTC hour `value` falls in, as stored in HourlyAggregate.hour."""
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class HourlyAggregateManager(models.Manager):
+    def record(self, states):
+        """
+        Applies the activity changes of `states` about to be saved to their
+        (app, type, post hour) buckets, and their reaction times to the
+        ResponseSketch of their post day. Call before saving, inside the
+        writing transaction.
+        """
+        deltas = {}
+        responses = []
+        for state in states:
+            if not state.app_id or state.post_time is None:
+                continue
+            before, after = state.activity_change()
+            if after is None:
+                continue
+            delta = (1, *after) if before is None else (0, *(a - b for a, b in zip(after, before)))
+            if not any(delta):
+                continue
+            key = (state.user_id, state.app_id, state.type or "", hour_of(state.post_time))
+            current = deltas.get(key)
+            deltas[key] = delta if current is None else tuple(a + b for a, b in zip(current, delta))
+
+            day = key[3].date()
+            if before is not None and before[4]:
+                responses.append((state.user_id, state.app_id, day, before[3], -1))
+            if after[4]:
+                responses.append((state.user_id, state.app_id, day, after[3], 1))
+        self.apply(deltas)
+        ResponseSketch.objects.apply(responses)
+
+    def apply(self, deltas):
+        """
+        Adds {(user_id, app_id, type, hour): (posts, reads, opens,
+        dismissals, response_seconds, responses)} to the buckets in one
+        upsert.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+
+        ops = connection.ops
+        table = ops.quote_name(self.model._meta.db_table)
+        now = ops.adapt_datetimefield_value(timezone.now())
+        counters = ("posts", "reads", "opens", "dismissals", "response_seconds", "responses")
+
+        rows = []
+        params = []
+        for (user_id, app_id, notif_type, hour), delta in deltas.items():
+            rows.append("(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+            params.extend([user_id, app_id, notif_type, ops.adapt_datetimefield_value(hour), *delta, now])
+
+        if connection.vendor == "mysql":
+            conflict = "ON DUPLICATE KEY UPDATE " + ", ".join(
+                [f"{c} = {c} + VALUES({c})" for c in counters]
+                + ["last_updated = VALUES(last_updated)"]
+            )
+        else:
+            conflict = "ON CONFLICT (user_id, app_id, type, hour) DO UPDATE SET " + ", ".join(
+                [f"{c} = {table}.{c} + EXCLUDED.{c}" for c in counters]
+                + ["last_updated = EXCLUDED.last_updated"]
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, app_id, type, hour, {', '.join(counters)}, last_updated) "
+                f"VALUES {', '.join(rows)} {conflict}",
+                params,
+            )
+
+
+class ResponseSketchManager(models.Manager):
+    def apply(self, responses):
+        """
+        Adds (+1) or takes out (-1) reaction times:
+        [(user_id, app_id, day, seconds, +1 or -1), ...]. Read-modify-write,
+        so it must run under the users' ChangeSequence lock, like every
+        state write does.
+        """
+        if not responses:
+            return
+
+        changes = {}
+        for user_id, app_id, day, seconds, sign in responses:
+            changes.setdefault((user_id, app_id, day), []).append((seconds, sign))
+
+        stored = {
+            (r.user_id, r.app_id, r.day): r
+            for r in self.filter(
+                user_id__in={k[0] for k in changes},
+                app_id__in={k[1] for k in changes},
+                day__in={k[2] for k in changes},
+            )
+            if (r.user_id, r.app_id, r.day) in changes
+        }
+
+        created, updated, emptied = [], [], []
+        for key, values in changes.items():
+            row = stored.get(key)
+            sketch = DDSketch.from_bytes(row.sketch) if row else DDSketch()
+            for seconds, sign in values:
+                if sign > 0:
+                    sketch.add(seconds)
+                else:
+                    sketch.remove(seconds)
+            count = sketch.count
+            if row is None:
+                if count:
+                    created.append(self.model(
+                        user_id=key[0], app_id=key[1], day=key[2], count=count, sketch=sketch.to_bytes(),
+                    ))
+            elif count:
+                row.count = count
+                row.sketch = sketch.to_bytes()
+                updated.append(row)
+            else:
+                emptied.append(row.pk)
+
+        if created:
+            self.bulk_create(created)
+        if updated:
+            self.bulk_update(updated, ["count", "sketch"])
+        if emptied:
+            self.filter(pk__in=emptied).delete()
+
+
 class DismissedBy(models.TextChoices):
     USER = "user", "User"
     NOTIFYBEAR = "notifybear", "NotifyBear"
@@ -171,6 +492,18 @@ class UserNotificationState(models.Model):
         related_name="user_states",
         default=None
     )
+
+    # Copied from the (immutable) event at creation so feeds and analytics
+    # can filter and sort without joining NotificationEvent
+    app = models.ForeignKey(
+        App,
+        on_delete=models.CASCADE,
+        related_name="notification_states",
+        null=True,
+        blank=True
+    )
+    post_time = models.DateTimeField(null=True, blank=True)
+    type = models.CharField(max_length=50, null=True, blank=True)
     
     # User interaction timestamps (mutable)
     opened_at = models.DateTimeField(null=True, blank=True, db_index=True)
@@ -204,12 +537,19 @@ class UserNotificationState(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # ChangeSequence value of the last write (0: before the change feed)
+    change_seq = models.BigIntegerField(default=0)
+
     class Meta:
         unique_together = ("user", "notification_event")
         indexes = [
-            models.Index(fields=["user", "is_read", "ml_score"]),
+            models.Index(fields=["user", "is_read", "ml_score", "id"]),
             models.Index(fields=["user", "opened_at"]),
             models.Index(fields=["notification_event", "user"]),
+            models.Index(fields=["user", "post_time", "notification_event"]),
+            models.Index(fields=["user", "type", "post_time"]),
+            models.Index(fields=["user", "app", "post_time"]),
+            models.Index(fields=["user", "change_seq", "id"]),
         ]
         verbose_name = "User Notification State"
         verbose_name_plural = "User Notification States"
@@ -219,11 +559,80 @@ class UserNotificationState(models.Model):
         status = "read" if self.is_read else "unread"
         return f"{user_label} | {self.notification_event.app.package_name} | {status}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_read = instance.__dict__.get("is_read")
+        instance._loaded_activity = instance._activity()
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.post_time is None and self.notification_event_id:
+            self.copy_event_fields(self.notification_event)
+        update_fields = kwargs.get("update_fields")
+        if update_fields:
+            kwargs["update_fields"] = {*update_fields, "change_seq"}
+        # Same transaction as the write (no savepoint needed)
+        with transaction.atomic(savepoint=False):
+            self.change_seq = ChangeSequence.objects.advance(self.user_id)
+            if update_fields is None or "is_read" in update_fields:
+                UnreadCounter.objects.record([self])
+            if update_fields is None or not set(ACTIVITY_FIELDS).isdisjoint(update_fields):
+                HourlyAggregate.objects.record([self])
+            super().save(*args, **kwargs)
+        self._loaded_is_read = self.is_read
+        self._loaded_activity = self._activity()
+
+    def unread_delta(self):
+        """
+        How saving this state changes the unread count: +1 if it becomes
+        (or is created) unread, -1 if it becomes read, else 0.
+        """
+        if self._state.adding:
+            return 0 if self.is_read else 1
+        loaded = getattr(self, "_loaded_is_read", None)
+        if loaded is None:
+            if "is_read" not in self.__dict__:
+                return 0
+            # is_read was deferred at load time and has been assigned since
+            loaded = UserNotificationState.objects.filter(pk=self.pk).values_list("is_read", flat=True).first()
+            if loaded is None:
+                return 0
+        return int(loaded) - int(self.is_read)
+
+    def _activity(self):
+        """The loaded ACTIVITY_FIELDS values, or None if any is deferred."""
+        if any(name not in self.__dict__ for name in ACTIVITY_FIELDS):
+            return None
+        return tuple(self.__dict__[name] for name in ACTIVITY_FIELDS)
+
+    def activity_change(self):
+        """
+        activity_counts() of this state as stored and as about to be saved;
+        the stored ones are None for a new state.
+        """
+        if self._state.adding:
+            return None, activity_counts(self.is_read, self.opened_at, self.dismissed_at, self.post_time)
+        loaded = getattr(self, "_loaded_activity", None)
+        if loaded is None:
+            # Some fields were deferred at load time
+            loaded = UserNotificationState.objects.filter(pk=self.pk).values_list(*ACTIVITY_FIELDS).first()
+            if loaded is None:
+                return None, None
+        current = [self.__dict__.get(name, value) for name, value in zip(ACTIVITY_FIELDS, loaded)]
+        return activity_counts(*loaded, self.post_time), activity_counts(*current, self.post_time)
+
+    def copy_event_fields(self, event):
+        """Copies the denormalized event attributes onto this state."""
+        self.app_id = event.app_id
+        self.post_time = event.post_time
+        self.type = event.type
+
     @property
     def reaction_time(self):
         """Time from notification post to user opening it."""
         if self.opened_at:
-            return self.opened_at - self.notification_event.post_time
+            return self.opened_at - (self.post_time or self.notification_event.post_time)
         return None
     
     def mark_opened(self, timestamp=None):
@@ -242,6 +651,151 @@ class UserNotificationState(models.Model):
         return self.dismissed_by == DismissedBy.NOTIFYBEAR
 
 
+class UnreadCounter(models.Model):
+    """
+    Number of a user's unread UserNotificationStates per (app, type).
+
+    Maintained in the same transaction as every is_read change (state
+    creation, opens, interactions, deletes), so unread_count reads a few
+    rows instead of counting the user's history. States deleted by cascade
+    are fixed up by `reconcile_unread_counters`.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="unread_counters"
+    )
+    app = models.ForeignKey(
+        App,
+        on_delete=models.CASCADE,
+        related_name="unread_counters"
+    )
+    type = models.CharField(max_length=50, blank=True, default="")
+    count = models.IntegerField(default=0)
+
+    objects = UnreadCounterManager()
+
+    class Meta:
+        unique_together = ("user", "app", "type")
+        verbose_name = "Unread Counter"
+        verbose_name_plural = "Unread Counters"
+
+    def __str__(self):
+        return f"{self.user_id} | {self.app_id} | {self.type or '-'} | {self.count}"
+
+
+class HourlyAggregate(models.Model):
+    """
+    Hourly rollup of a user's notifications per (app, type), bucketed by
+    the UTC hour they were posted: how many were posted, are read, were
+    opened and dismissed, and the summed post-to-open time of the opened
+    ones.
+
+    Maintained in the same transaction as every state write
+    (HourlyAggregateManager.record) and delete, so analytics and stats read
+    a few rows per hour instead of the user's history. States deleted by
+    cascade from their event are fixed up by `rebuild_hourly_aggregates`.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="hourly_aggregates"
+    )
+    app = models.ForeignKey(
+        App,
+        on_delete=models.CASCADE,
+        related_name="hourly_aggregates"
+    )
+    type = models.CharField(max_length=50, blank=True, default="")
+    hour = models.DateTimeField()
+
+    posts = models.IntegerField(default=0)
+    reads = models.IntegerField(default=0)
+    opens = models.IntegerField(default=0)
+    dismissals = models.IntegerField(default=0)
+
+    # Sum and number of (opened_at - post_time) in seconds
+    response_seconds = models.FloatField(default=0)
+    responses = models.IntegerField(default=0)
+
+    last_updated = models.DateTimeField(auto_now=True)
+
+    objects = HourlyAggregateManager()
+
+    class Meta:
+        unique_together = ("user", "app", "type", "hour")
+        indexes = [
+            models.Index(fields=["user", "hour"]),
+            models.Index(fields=["user", "type", "hour"]),
+        ]
+        verbose_name = "Hourly Aggregate"
+        verbose_name_plural = "Hourly Aggregates"
+
+    def __str__(self):
+        return f"{self.user_id} | {self.app_id} | {self.type or '-'} | {self.hour:%Y-%m-%d %H}:00"
+
+
+class ResponseSketch(models.Model):
+    """
+    DDSketch (Notifications.sketches) of the post-to-open times of a user's
+    notifications per (app, UTC post day), kept next to HourlyAggregate
+    and updated with it on every open. Percentiles over any range of days
+    merge these rows instead of reading states.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="response_sketches"
+    )
+    app = models.ForeignKey(
+        App,
+        on_delete=models.CASCADE,
+        related_name="response_sketches"
+    )
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+    sketch = models.BinaryField()
+
+    objects = ResponseSketchManager()
+
+    class Meta:
+        unique_together = ("user", "app", "day")
+        indexes = [
+            models.Index(fields=["user", "day"]),
+        ]
+        verbose_name = "Response Sketch"
+        verbose_name_plural = "Response Sketches"
+
+    def __str__(self):
+        return f"{self.user_id} | {self.app_id} | {self.day} | {self.count}"
+
+
+class NotificationTombstone(models.Model):
+    """
+    Record of a deleted UserNotificationState, so the change feed can tell
+    clients to drop it. Pruned after a while (`prune_tombstones`).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="notification_tombstones"
+    )
+    state_id = models.BigIntegerField()
+    notification_event_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "change_seq", "state_id"]),
+        ]
+        verbose_name = "Notification Tombstone"
+        verbose_name_plural = "Notification Tombstones"
+
+    def __str__(self):
+        return f"{self.user_id} | state {self.state_id} | deleted @ {self.change_seq}"
+
+
 class InteractionEvent(models.Model):
     """
     APPEND-ONLY interaction log - represents raw user actions.
@@ -313,7 +867,9 @@ class DailyAggregate(models.Model):
     """
     Precomputed daily aggregates for fast reporting.
     
-    Denormalized for performance - recalculated from InteractionEvent.
+    Denormalized for performance - counted on ingest and interaction
+    (Notifications.counters) and recalculated from NotificationEvent and
+    InteractionEvent by `manage.py rebuild_aggregates`.
     Stores daily metrics per (user, app, day).
     """
     user = models.ForeignKey(
@@ -358,4 +914,38 @@ class DailyAggregate(models.Model):
             self.open_rate = self.clicks / self.posts
         else:
             self.open_rate = None
-        self.save(update_fields=["open_rate", "last_updated"])
\ No newline at end of file
+        self.save(update_fields=["open_rate", "last_updated"])
+
+
+class DailyAggregateDelta(models.Model):
+    """
+    Journal of DailyAggregate counter deltas not yet folded into their row.
+
+    Inserted in the transaction that produced them, so a delta is exactly
+    as durable as its events, and deleted in the transaction that adds it
+    to DailyAggregate (see Notifications.counters).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="daily_aggregate_deltas"
+    )
+    app = models.ForeignKey(
+        App,
+        on_delete=models.CASCADE,
+        related_name="daily_aggregate_deltas"
+    )
+    day = models.DateField()
+    posts = models.IntegerField(default=0)
+    clicks = models.IntegerField(default=0)
+    swipes = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "day"]),
+        ]
+        verbose_name = "Daily Aggregate Delta"
+        verbose_name_plural = "Daily Aggregate Deltas"
+
+    def __str__(self):
+        return f"{self.user_id} | {self.app_id} | {self.day} | {self.posts:+}p {self.clicks:+}c {self.swipes:+}s"
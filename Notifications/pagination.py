@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination for notification lists.
+
+A cursor is an opaque, URL-safe token holding the sort key of the last row
+of a page. The next page seeks past that key instead of counting OFFSET
+rows, so every page costs the same no matter how deep it is.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns the list of values in a cursor; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def decode_time_cursor(cursor):
+    """Decodes a (post_time, id) cursor."""
+    values = decode_cursor(cursor)
+    if len(values) != 2 or not isinstance(values[0], str) or not isinstance(values[1], int):
+        raise ValueError("Invalid cursor")
+    post_time = parse_datetime(values[0])
+    if post_time is None:
+        raise ValueError("Invalid cursor")
+    return post_time, values[1]
+
+
+def decode_score_cursor(cursor):
+    """Decodes an (ml_score, id) cursor; the score is None for unscored rows."""
+    values = decode_cursor(cursor)
+    if (
+        len(values) != 2
+        or not isinstance(values[1], int)
+        or not (values[0] is None or isinstance(values[0], (int, float)))
+    ):
+        raise ValueError("Invalid cursor")
+    return values[0], values[1]
+
+
+def decode_change_token(token):
+    """Decodes a change feed (change_seq, id) token."""
+    values = decode_cursor(token)
+    if len(values) != 2 or not all(isinstance(v, int) and v >= 0 for v in values):
+        raise ValueError("Invalid cursor")
+    return values[0], values[1]
+
+
+def seek_before(field, id_field, value, pk):
+    """Rows strictly after (value, pk) in descending (field, id) order."""
+    return Q(**{f"{field}__lt": value}) | Q(**{field: value, f"{id_field}__lt": pk})
@@ -0,0 +1,154 @@
+"""
+Reads and rebuilds of the HourlyAggregate rollup and the ResponseSketch
+reaction time percentiles kept next to it.
+
+The buckets move with every state the application writes or deletes (see
+HourlyAggregateManager.record), so analytics costs one row per
+(app, type, hour) with activity instead of one per notification. States
+that disappear by cascade - an event deleted in the admin - or are written
+around the model never reach them; `rebuild_hourly_aggregates` recomputes
+a user's buckets, and their ResponseSketch rows, from UserNotificationState.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
+
+from .models import ChangeSequence, HourlyAggregate, ResponseSketch, UserNotificationState, hour_of
+from .sketches import DDSketch
+
+
+def rebuild_hourly_aggregates(user_id):
+    """
+    Recomputes the user's buckets and reaction time sketches from their
+    states and replaces the stored ones. Returns the number of buckets
+    written.
+
+    Runs under the user's ChangeSequence row lock, which every state
+    writer holds until it commits, so no write lands in between.
+    """
+    with transaction.atomic():
+        list(ChangeSequence.objects.select_for_update().filter(user_id=user_id))
+
+        rows = (
+            UserNotificationState.objects.filter(
+                user_id=user_id,
+                app__isnull=False,
+                post_time__isnull=False,
+            )
+            .values("app_id", notif_type=Coalesce("type", Value("")), bucket=TruncHour("post_time"))
+            .annotate(
+                posts=Count("id"),
+                reads=Count("id", filter=Q(is_read=True)),
+                opens=Count("opened_at"),
+                dismissals=Count("dismissed_at"),
+                response_time=Sum(
+                    ExpressionWrapper(F("opened_at") - F("post_time"), output_field=DurationField()),
+                ),
+            )
+            .order_by()
+        )
+
+        buckets = {}
+        for r in rows:
+            key = (r["app_id"], r["notif_type"], r["bucket"])  # NULL and "" share a bucket
+            response_time = r["response_time"] or timedelta(0)
+            counts = (
+                r["posts"],
+                r["reads"],
+                r["opens"],
+                r["dismissals"],
+                response_time.total_seconds(),
+                r["opens"],
+            )
+            current = buckets.get(key)
+            buckets[key] = counts if current is None else tuple(a + b for a, b in zip(current, counts))
+
+        HourlyAggregate.objects.filter(user_id=user_id).delete()
+        HourlyAggregate.objects.bulk_create(
+            [
+                HourlyAggregate(
+                    user_id=user_id,
+                    app_id=app_id,
+                    type=notif_type,
+                    hour=hour,
+                    posts=posts,
+                    reads=reads,
+                    opens=opens,
+                    dismissals=dismissals,
+                    response_seconds=response_seconds,
+                    responses=responses,
+                )
+                for (app_id, notif_type, hour), (posts, reads, opens, dismissals, response_seconds, responses)
+                in buckets.items()
+            ],
+            batch_size=500,
+        )
+
+        sketches = {}
+        opened = UserNotificationState.objects.filter(
+            user_id=user_id,
+            app__isnull=False,
+            post_time__isnull=False,
+            opened_at__isnull=False,
+        ).values_list("app_id", "post_time", "opened_at")
+        for app_id, post_time, opened_at in opened.iterator():
+            key = (app_id, hour_of(post_time).date())
+            sketches.setdefault(key, DDSketch()).add((opened_at - post_time).total_seconds())
+
+        ResponseSketch.objects.filter(user_id=user_id).delete()
+        ResponseSketch.objects.bulk_create(
+            [
+                ResponseSketch(
+                    user_id=user_id,
+                    app_id=app_id,
+                    day=day,
+                    count=sketch.count,
+                    sketch=sketch.to_bytes(),
+                )
+                for (app_id, day), sketch in sketches.items()
+            ],
+            batch_size=500,
+        )
+    return len(buckets)
+
+
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+
+
+def percentiles(sketch):
+    """{"count", "p50", "p90", "p99"} of a reaction time sketch, in seconds."""
+    result = {"count": sketch.count}
+    for name, q in PERCENTILES:
+        value = sketch.quantile(q)
+        result[name] = round(value, 1) if value is not None else None
+    return result
+
+
+def response_time_percentiles(user_id, since, until):
+    """
+    Reaction time percentiles of the notifications posted since..until
+    (inclusive UTC days), overall and per app, merged from the
+    ResponseSketch rows.
+    """
+    total = DDSketch()
+    apps = {}
+    rows = ResponseSketch.objects.filter(
+        user_id=user_id,
+        day__gte=since,
+        day__lte=until,
+    ).values_list("app_id", "app__package_name", "app__app_label", "sketch")
+    for app_id, package_name, app_label, data in rows:
+        sketch = DDSketch.from_bytes(data)
+        total.merge(sketch)
+        if app_id not in apps:
+            apps[app_id] = (package_name, app_label, DDSketch())
+        apps[app_id][2].merge(sketch)
+
+    by_app = [
+        {"app_id": app_id, "package_name": package_name, "app_label": app_label, **percentiles(sketch)}
+        for app_id, (package_name, app_label, sketch) in apps.items()
+    ]
+    by_app.sort(key=lambda r: (-r["count"], r["package_name"]))
+    return {**percentiles(total), "by_app": by_app}
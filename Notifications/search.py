@@ -0,0 +1,146 @@
+"""
+Full-text search over a user's notifications.
+
+The searchable text of every event (title, text, big_text,
+conversation_title) goes into the database's own inverted index when the
+event is ingested (`index_events`, called from the ingest side effects):
+
+- SQLite: an FTS5 table. The owner is a column of its own that the
+  search terms don't look at, so `owner:uN AND ...` is answered from the
+  index; ranked with bm25().
+- PostgreSQL: a GIN-indexed tsvector per event. The owner is a lexeme of
+  weight D and the search terms are restricted to weights A-C, so the
+  posting lists are intersected per user; ranked with ts_rank().
+- MySQL: a FULLTEXT-indexed copy of the text, filtered on user_id and
+  ranked by MATCH ... AGAINST.
+
+Terms are ANDed and the last one matches as a prefix. The table is created
+and filled by migration 0010. Deleted events leave it through the foreign
+key's cascade, or through `unindex_events` on SQLite, where the FTS5 table
+can't have one.
+"""
+import re
+
+from django.db import connection
+
+TABLE = "Notifications_search"
+MAX_TERMS = 10
+
+_TERM = re.compile(r"[^\W_]+")
+
+
+def search_terms(query):
+    return [t.lower() for t in _TERM.findall(query or "")][:MAX_TERMS]
+
+
+def _documents(owner, events):
+    return [
+        (e.pk, owner, e.title or "", e.text or "", e.big_text or "", e.conversation_title or "")
+        for e in events
+    ]
+
+
+# -------------------------
+# Indexing
+# -------------------------
+
+def index_events(user_id, events):
+    """Adds freshly inserted events (with pks) of `user_id` to the index."""
+    if not events:
+        return
+
+    vendor = connection.vendor
+    if vendor == "sqlite":
+        sql = (
+            f'INSERT OR REPLACE INTO "{TABLE}" (rowid, owner, title, text, big_text, conversation_title) '
+            "VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+        documents = _documents(f"u{user_id}", events)
+    elif vendor == "postgresql":
+        sql = (
+            f'INSERT INTO "{TABLE}" (event_id, document) VALUES (%s, '
+            "setweight(to_tsvector('simple', %s), 'D') || "
+            "setweight(to_tsvector('simple', %s), 'A') || "
+            "setweight(to_tsvector('simple', %s), 'B') || "
+            "setweight(to_tsvector('simple', %s), 'C') || "
+            "setweight(to_tsvector('simple', %s), 'B')) "
+            "ON CONFLICT (event_id) DO NOTHING"
+        )
+        documents = _documents(f"u{user_id}", events)
+    elif vendor == "mysql":
+        sql = (
+            f"INSERT IGNORE INTO `{TABLE}` (event_id, user_id, title, text, big_text, conversation_title) "
+            "VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+        documents = _documents(user_id, events)
+    else:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, documents)
+
+
+def unindex_events(event_ids):
+    """Removes deleted events from the index (SQLite; elsewhere the FK cascades)."""
+    if not event_ids or connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM "{TABLE}" WHERE rowid = %s', [(pk,) for pk in event_ids])
+
+
+def clear_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {connection.ops.quote_name(TABLE)}")
+
+
+# -------------------------
+# Querying
+# -------------------------
+
+def search_event_ids(user_id, query, limit, offset=0):
+    """
+    Returns the ids of the user's events matching `query`, best match
+    first, or [] if the query has no searchable terms.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    vendor = connection.vendor
+    if vendor == "sqlite":
+        words = " AND ".join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+        match = f'owner:"u{int(user_id)}" AND {{title text big_text conversation_title}}: ({words})'
+        # bm25 weights per column: owner, title, text, big_text, conversation_title
+        sql = (
+            f'SELECT rowid FROM "{TABLE}" WHERE "{TABLE}" MATCH %s '
+            f'ORDER BY bm25("{TABLE}", 0, 10, 4, 2, 6), rowid DESC LIMIT %s OFFSET %s'
+        )
+        params = [match, limit, offset]
+    elif vendor == "postgresql":
+        tsquery = " & ".join(
+            [f"u{int(user_id)}:D"]
+            + [f"{t}:ABC" for t in terms[:-1]]
+            + [f"{terms[-1]}:*ABC"]
+        )
+        sql = (
+            f"SELECT event_id FROM \"{TABLE}\", to_tsquery('simple', %s) query "
+            "WHERE document @@ query "
+            "ORDER BY ts_rank(document, query) DESC, event_id DESC LIMIT %s OFFSET %s"
+        )
+        params = [tsquery, limit, offset]
+    elif vendor == "mysql":
+        against = " ".join([f"+{t}" for t in terms[:-1]] + [f"+{terms[-1]}*"])
+        sql = (
+            f"SELECT event_id FROM `{TABLE}` "
+            "WHERE user_id = %s AND MATCH (title, text, big_text, conversation_title) AGAINST (%s IN BOOLEAN MODE) "
+            "ORDER BY MATCH (title, text, big_text, conversation_title) AGAINST (%s IN BOOLEAN MODE) DESC, "
+            "event_id DESC LIMIT %s OFFSET %s"
+        )
+        params = [user_id, against, against, limit, offset]
+    else:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
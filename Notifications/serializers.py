@@ -1,3 +1,4 @@
+from django.urls import reverse
 from rest_framework import serializers
 from .models import (
     NotificationEvent,
@@ -9,6 +10,13 @@ from .models import (
 )
 
 
+def blob_url(digest):
+    """Relative URL of a blob-store image, or None."""
+    if not digest:
+        return None
+    return reverse("notification_blob", args=[digest])
+
+
 # -------------------------
 # NotificationMessage Serializer
 # -------------------------
@@ -34,6 +42,8 @@ class NotificationEventSerializer(serializers.ModelSerializer):
     app_id = serializers.IntegerField(source='app.id', read_only=True)
     content_hash = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     type = serializers.CharField(read_only=True)
+    large_icon_url = serializers.SerializerMethodField()
+    picture_url = serializers.SerializerMethodField()
     
     class Meta:
         model = NotificationEvent
@@ -54,6 +64,8 @@ class NotificationEventSerializer(serializers.ModelSerializer):
             "text_lines",
             "large_icon_base64",
             "picture_base64",
+            "large_icon_url",
+            "picture_url",
             "conversation_title",
             "people",
             "content_hash",
@@ -63,12 +75,37 @@ class NotificationEventSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ("id", "created_at", "app_id", "package_name", "app_label")
 
+    def get_large_icon_url(self, obj):
+        return blob_url(obj.large_icon_ref)
+
+    def get_picture_url(self, obj):
+        return blob_url(obj.picture_ref)
+
+
+# -------------------------
+# Sparse fieldsets
+# -------------------------
+
+class SparseFieldsMixin:
+    """
+    Renders only the fields named in context["fields"] (all of them when
+    that is empty). Unknown names are ignored.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted = self.context.get("fields")
+        if wanted:
+            for name in list(fields):
+                if name not in wanted:
+                    del fields[name]
+        return fields
+
 
 # -------------------------
 # UserNotificationState Serializer (mutable user interaction)
 # -------------------------
 
-class UserNotificationStateSerializer(serializers.ModelSerializer):
+class UserNotificationStateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializes user-specific notification state (what the user did).
     Includes the full notification event data nested.
@@ -124,7 +161,7 @@ class UserNotificationStateUpdateSerializer(serializers.ModelSerializer):
 # Compact UserNotificationState Serializer (for lists)
 # -------------------------
 
-class UserNotificationStateCompactSerializer(serializers.ModelSerializer):
+class UserNotificationStateCompactSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Lightweight serializer for listing notifications.
     Doesn't nest the full notification object.
@@ -1,57 +1,71 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db.models import F
 
+from . import ingestion
+from .app_cache import app_cache
+from .counters import record_aggregates
+from .search import unindex_events
 from .models import (
     NotificationEvent,
     UserNotificationState,
     InteractionEvent,
     App,
-    DailyAggregate,
 )
 
 User = get_user_model()
 
 
 # -------------------------
-# Signal: Update App.last_seen when new NotificationEvent created
+# Signal: Side effects for NotificationEvents created outside ingestion
 # -------------------------
 
 @receiver(post_save, sender=NotificationEvent)
-def update_app_last_seen(sender, instance, created, **kwargs):
+def apply_notification_side_effects(sender, instance, created, raw=False, **kwargs):
     """
-    When a new NotificationEvent is created, update the App's last_seen timestamp.
-    This helps track which apps are actively sending notifications.
+    Gives NotificationEvents created through save() (admin, shell, scripts)
+    the same side effects as ingested ones: App.last_seen, a
+    UserNotificationState and the DailyAggregate posts counter.
+
+    The ingest endpoints insert with bulk_create() and apply these directly
+    in Notifications.ingestion, so the hot path never comes through here.
     """
-    if created:
-        instance.app.last_seen = timezone.now()
-        instance.app.save(update_fields=['last_seen'])
+    if not created or raw:
+        return
+
+    UserNotificationState.objects.get_or_create(
+        user_id=instance.app.user_id,
+        notification_event=instance,
+    )
+    ingestion.apply_post_side_effects(instance.app.user_id, [instance])
 
 
 # -------------------------
-# Signal: Auto-create UserNotificationState when NotificationEvent created
+# Signal: Drop deleted NotificationEvents from the search index
 # -------------------------
 
-@receiver(post_save, sender=NotificationEvent)
-def create_user_notification_state(sender, instance, created, **kwargs):
+@receiver(post_delete, sender=NotificationEvent)
+def unindex_notification_event(sender, instance, **kwargs):
     """
-    Automatically create a UserNotificationState for the user
-    when a new NotificationEvent is created.
-    
-    This ensures every notification has a corresponding state entry.
+    The SQLite FTS5 search table has no foreign key to cascade from, so
+    events deleted directly or along with their App or user are removed
+    from it here.
     """
-    if created:
-        user = instance.app.user
-        UserNotificationState.objects.get_or_create(
-            user=user,
-            notification_event=instance,
-            defaults={
-                'is_read': False,
-                'ml_score': None,  # Will be computed later by ML pipeline
-            }
-        )
+    unindex_events([instance.pk])
+
+
+# -------------------------
+# Signal: Drop deleted Apps from the resolution cache
+# -------------------------
+
+@receiver(post_delete, sender=App)
+def invalidate_app_cache(sender, instance, **kwargs):
+    """
+    Deleted apps must not be resolved from the per-process app cache,
+    otherwise ingest would attach new events to a missing App id.
+    """
+    app_cache.invalidate(instance.user_id, instance.package_name)
 
 
 # -------------------------
@@ -105,70 +119,22 @@ def update_daily_aggregate_on_interaction(sender, instance, created, **kwargs):
     """
     When an InteractionEvent is logged, update the corresponding DailyAggregate.
     
-    This keeps statistics up-to-date in real-time.
+    The delta is journaled and upserted like the ones of ingest, see
+    Notifications.counters.
     """
     if not created:
         return
-    
-    day = instance.timestamp.date()
-    app = instance.notification_event.app
-    user = instance.user
-    
-    # Get or create daily aggregate
-    aggregate, _ = DailyAggregate.objects.get_or_create(
-        user=user,
-        app=app,
-        day=day,
-        defaults={'posts': 0, 'clicks': 0, 'swipes': 0}
-    )
-    
-    # Increment appropriate counter
+
     if instance.interaction_type == InteractionEvent.CLICK:
-        aggregate.clicks = F('clicks') + 1
+        delta = (0, 1, 0)
     elif instance.interaction_type == InteractionEvent.SWIPE:
-        aggregate.swipes = F('swipes') + 1
-    
-    aggregate.save(update_fields=['clicks' if instance.interaction_type == InteractionEvent.CLICK else 'swipes', 'last_updated'])
-    
-    # Refresh to get actual values (F() expressions don't update in-memory)
-    aggregate.refresh_from_db()
-    
-    # Recalculate open rate
-    aggregate.calculate_open_rate()
-
-
-# -------------------------
-# Signal: Update DailyAggregate when NotificationEvent created
-# -------------------------
-
-@receiver(post_save, sender=NotificationEvent)
-def update_daily_aggregate_on_post(sender, instance, created, **kwargs):
-    """
-    When a NotificationEvent is created, increment the posts count
-    in the corresponding DailyAggregate.
-    """
-    if not created:
+        delta = (0, 0, 1)
+    else:
         return
-    
-    day = instance.post_time.date()
-    app = instance.app
-    user = instance.app.user
-    
-    # Get or create daily aggregate
-    aggregate, _ = DailyAggregate.objects.get_or_create(
-        user=user,
-        app=app,
-        day=day,
-        defaults={'posts': 0, 'clicks': 0, 'swipes': 0}
-    )
-    
-    # Increment posts
-    aggregate.posts = F('posts') + 1
-    aggregate.save(update_fields=['posts', 'last_updated'])
-    
-    # Refresh and recalculate open rate
-    aggregate.refresh_from_db()
-    aggregate.calculate_open_rate()
+
+    record_aggregates({
+        (instance.user_id, instance.notification_event.app_id, instance.timestamp.date()): delta,
+    })
 
 
 # -------------------------
@@ -181,27 +147,40 @@ def prevent_notification_event_modification(sender, instance, **kwargs):
     Prevent modification of existing NotificationEvent instances.
     
     NotificationEvents are immutable - once created, they should not be changed.
-    This enforces immutability at the signal level.
+    This enforces immutability at the signal level, against the values
+    snapshotted when the instance was loaded or saved, so no query is needed.
+    QuerySet.update() is guarded by NotificationEventQuerySet.
     """
-    if instance.pk:  # If it's an existing object (has a primary key)
-        # Get the original instance from database
-        try:
-            original = NotificationEvent.objects.get(pk=instance.pk)
-            
-            # Check if any critical fields have changed
-            immutable_fields = [
-                'app', 'notif_key', 'post_time', 'title', 'text',
-                'big_text', 'sub_text', 'channel_id'
-            ]
-            
-            for field in immutable_fields:
-                if getattr(instance, field) != getattr(original, field):
-                    raise ValueError(
-                        f"NotificationEvent is immutable. "
-                        f"Cannot modify field '{field}' after creation."
-                    )
-        except NotificationEvent.DoesNotExist:
-            pass  # New object, allow creation
+    if not instance.pk:
+        return
+
+    snapshot = getattr(instance, "_immutable_snapshot", None)
+    if snapshot is None:
+        snapshot = {}  # constructed with an explicit pk; nothing loaded
+
+    # Fields deferred at load time but assigned since aren't in the
+    # snapshot; only those need the original row.
+    unknown = [
+        attname for attname in NotificationEvent.immutable_attnames()
+        if attname in instance.__dict__ and attname not in snapshot
+    ]
+    if unknown:
+        original = (
+            NotificationEvent.objects.filter(pk=instance.pk).values(*unknown).first()
+        )
+        if original is None:
+            if not snapshot:
+                return  # New object, allow creation
+        else:
+            snapshot = {**snapshot, **original}
+
+    for name in NotificationEvent.IMMUTABLE_FIELDS:
+        attname = NotificationEvent._meta.get_field(name).attname
+        if attname in snapshot and instance.__dict__.get(attname) != snapshot[attname]:
+            raise ValueError(
+                f"NotificationEvent is immutable. "
+                f"Cannot modify field '{name}' after creation."
+            )
 
 
 # -------------------------
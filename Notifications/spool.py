@@ -0,0 +1,147 @@
+"""
+Durable local ingest spool.
+
+With INGEST_SPOOL_ENABLED the ingest endpoints validate the payload, append
+it to a local SQLite write-ahead queue and answer 202 straight away, so a
+stalled database no longer holds phones on the line (and makes them retry).
+`manage.py drain_ingest_spool` moves spooled entries into the ORM models in
+large batches.
+
+Entries are claimed under a lease and only deleted after the main database
+transaction that applied them has committed. A worker that dies mid-batch
+leaves its claims to expire and be replayed; replays are idempotent because
+notifications dedupe on (app, notif_key) and interactions on
+(notification, type, timestamp). An interaction whose notification has not
+been ingested yet is deferred and retried rather than acknowledged.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class IngestSpool:
+    NOTIFICATION = "notification"
+    INTERACTION = "interaction"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL,"
+                " user_id INTEGER NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " enqueued_at REAL NOT NULL,"
+                " claimed_until REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0"
+                ")"
+            )
+            self._local.conn = conn
+        return conn
+
+    # -------------------------
+    # Producer side
+    # -------------------------
+
+    def append(self, kind, user_id, payload):
+        self.append_many(kind, user_id, [payload])
+
+    def append_many(self, kind, user_id, payloads):
+        now = time.time()
+        rows = [
+            (kind, user_id, json.dumps(p, cls=DjangoJSONEncoder), now)
+            for p in payloads
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO entries (kind, user_id, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    # -------------------------
+    # Consumer side
+    # -------------------------
+
+    def claim(self, limit, lease_seconds=60):
+        """
+        Leases up to `limit` of the oldest unclaimed (or expired) entries.
+        Returns [(id, kind, user_id, payload_dict), ...] in enqueue order.
+        """
+        now = time.time()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, kind, user_id, payload FROM entries"
+                " WHERE (claimed_until IS NULL OR claimed_until < ?) AND attempts < ?"
+                " ORDER BY id LIMIT ?",
+                (now, settings.INGEST_SPOOL_MAX_ATTEMPTS, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE entries SET claimed_until = ? WHERE id = ?",
+                [(now + lease_seconds, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [(pk, kind, user_id, json.loads(payload)) for pk, kind, user_id, payload in rows]
+
+    def ack(self, ids):
+        """Deletes entries whose effects have been committed."""
+        with self.conn:
+            self.conn.executemany("DELETE FROM entries WHERE id = ?", [(pk,) for pk in ids])
+
+    def release(self, ids):
+        """Returns failed entries to the queue, counting the attempt."""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE entries SET claimed_until = NULL, attempts = attempts + 1 WHERE id = ?",
+                [(pk,) for pk in ids],
+            )
+
+    def defer(self, ids, delay_seconds):
+        """
+        Puts entries back to be claimed again after `delay_seconds`, counting
+        the attempt. Like failed ones, they stay in the spool as dead entries
+        once they reach INGEST_SPOOL_MAX_ATTEMPTS.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE entries SET claimed_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(time.time() + delay_seconds, pk) for pk in ids],
+            )
+
+    def stats(self):
+        """Queue depth, lag of the oldest pending entry and dead entries."""
+        depth, oldest = self.conn.execute(
+            "SELECT COUNT(*), MIN(enqueued_at) FROM entries WHERE attempts < ?",
+            (settings.INGEST_SPOOL_MAX_ATTEMPTS,),
+        ).fetchone()
+        (dead,) = self.conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE attempts >= ?",
+            (settings.INGEST_SPOOL_MAX_ATTEMPTS,),
+        ).fetchone()
+        return {
+            "depth": depth,
+            "lag_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "dead": dead,
+        }
+
+
+ingest_spool = IngestSpool(settings.INGEST_SPOOL_PATH)
@@ -0,0 +1,297 @@
+"""
+Server-sent event stream of a user's notification changes.
+
+GET /notifications/stream/ (Authorization: Bearer <access token>) keeps a
+text/event-stream open and pushes:
+
+    event: state     a new or changed state, in the compact representation
+    event: deleted   {"id", "notification_event_id"} of a deleted state
+    event: unread    {"unread_count": n}
+    event: sync      something changed that wasn't pushed; catch up with
+                     GET /notifications/changes/?since=<token>
+
+`state` and `deleted` events carry the change_seq as their SSE id, and a
+reconnect with an older Last-Event-ID starts with a `sync`. A comment line
+is sent every STREAM_HEARTBEAT_SECONDS so proxies keep idle streams open
+and dead clients are noticed.
+
+The stream is fed by `broker`, an in-process pub/sub: every transaction
+that takes a ChangeSequence value sends changes_committed, and if the user
+has connections in this process the changed rows are loaded once and fanned
+out. Writes served by other processes are picked up every
+STREAM_SYNC_INTERVAL_SECONDS by one indexed query for all connected
+users, which sends them a `sync`. No external broker is involved.
+
+Each connection is a coroutine with a bounded queue, so idle connections
+cost no threads. A connection that falls STREAM_QUEUE_SIZE events behind
+has its queue replaced by a single `sync`.
+
+Django 4.2 doesn't notice clients going away mid-stream, so the endpoint
+is a plain ASGI application that `stream_router` puts in front of Django
+(see NotifybearServer.asgi); it needs an ASGI server.
+"""
+import asyncio
+import json
+import logging
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.dispatch import receiver
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .fastpath import state_rows
+from .models import ChangeSequence, NotificationTombstone, UserNotificationState, changes_committed
+from .serializers import UserNotificationStateCompactSerializer
+from .unread import unread_total
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = "/notifications/stream/"
+
+
+def format_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+SYNC = format_event("sync", {})
+
+
+class Subscriber:
+    """One connection: a bounded queue of encoded events on its event loop."""
+
+    def __init__(self, user_id, loop, size):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def offer(self, chunks):
+        """Queues events; runs on the subscriber's loop."""
+        for chunk in chunks:
+            try:
+                self.queue.put_nowait(chunk)
+            except asyncio.QueueFull:
+                # Too far behind: drop the backlog, the client resyncs
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(SYNC)
+                return
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers = {}
+        self._versions = {}
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, version):
+        """Registers a connection of `user_id`; returns None if the user has too many."""
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(user_id, loop, settings.STREAM_QUEUE_SIZE)
+        with self._lock:
+            subscribers = self._subscribers.setdefault(user_id, set())
+            if len(subscribers) >= settings.STREAM_MAX_CONNECTIONS_PER_USER:
+                return None
+            subscribers.add(subscriber)
+            self._versions[user_id] = max(self._versions.get(user_id, 0), version)
+            if loop not in self._watchers:
+                self._watchers[loop] = loop.create_task(self._watch())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+                self._versions.pop(subscriber.user_id, None)
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscribers
+
+    def publish(self, user_id, chunks, version=None):
+        """Fans encoded events out to the user's connections; thread-safe."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            if version is not None and subscribers:
+                self._versions[user_id] = max(self._versions.get(user_id, 0), version)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, chunks)
+            except RuntimeError:
+                pass  # loop already closed (server shutting down)
+
+    async def _watch(self):
+        """Sends `sync` to users whose version moved in another process."""
+        while True:
+            await asyncio.sleep(settings.STREAM_SYNC_INTERVAL_SECONDS)
+            with self._lock:
+                known = dict(self._versions)
+            if not known:
+                continue
+            try:
+                current = await sync_to_async(self._current_versions)(list(known))
+            except Exception:
+                logger.exception("Failed to read data versions for %d streaming users", len(known))
+                continue
+            for user_id, version in current.items():
+                if version > known[user_id]:
+                    self.publish(user_id, [SYNC], version)
+
+    @staticmethod
+    def _current_versions(user_ids):
+        """
+        The newest change_seq on each user's states and tombstones (one
+        index probe each). Version moves that wrote no rows (app labels)
+        don't warrant a sync.
+        """
+        def newest(model):
+            return Subquery(
+                model.objects.filter(user_id=OuterRef("user_id"))
+                .order_by("-change_seq").values("change_seq")[:1]
+            )
+
+        rows = ChangeSequence.objects.filter(user_id__in=user_ids).annotate(
+            state_seq=newest(UserNotificationState),
+            tombstone_seq=newest(NotificationTombstone),
+        ).values_list("user_id", "state_seq", "tombstone_seq")
+        return {user_id: max(a or 0, b or 0) for user_id, a, b in rows}
+
+
+broker = Broker()
+
+
+@receiver(changes_committed)
+def publish_changes(sender, user_id, change_seq, **kwargs):
+    """Pushes the rows written at `change_seq` to the user's connections."""
+    if not broker.has_subscribers(user_id):
+        return
+
+    try:
+        qs = UserNotificationState.objects.filter(user_id=user_id, change_seq=change_seq).order_by("id")
+        chunks = [
+            format_event("state", row, change_seq)
+            for _, row in state_rows(qs, UserNotificationStateCompactSerializer, {}, key=("id",))
+        ]
+        chunks += [
+            format_event("deleted", {"id": state_id, "notification_event_id": event_id}, change_seq)
+            for state_id, event_id in NotificationTombstone.objects.filter(
+                user_id=user_id,
+                change_seq=change_seq,
+            ).order_by("state_id").values_list("state_id", "notification_event_id")
+        ]
+        chunks.append(format_event("unread", {"unread_count": unread_total(user_id)}))
+    except Exception:
+        # Never fail the request that made the change
+        logger.exception("Failed to publish change %s of user %s", change_seq, user_id)
+        chunks = [SYNC]
+
+    broker.publish(user_id, chunks, change_seq)
+
+
+# -------------------------
+# ASGI endpoint
+# -------------------------
+
+def _authenticate(authorization):
+    authentication = JWTAuthentication()
+    raw = authentication.get_raw_token(authorization.encode()) if authorization else None
+    if raw is None:
+        return None
+    try:
+        user = authentication.get_user(authentication.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return user if user.is_active else None
+
+
+def _stream_start(user_id, last_event_id):
+    version = ChangeSequence.objects.value_for(user_id)
+    chunks = [b"retry: 5000\n\n", format_event("unread", {"unread_count": unread_total(user_id)})]
+    if last_event_id is not None and last_event_id < version:
+        chunks.append(SYNC)
+    return version, chunks
+
+
+async def _respond(send, status, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+async def notification_stream(scope, receive, send):
+    if scope["method"] != "GET":
+        return await _respond(send, 405, {"detail": f'Method "{scope["method"]}" not allowed.'})
+
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+    user = await sync_to_async(_authenticate)(headers.get("authorization"))
+    if user is None:
+        return await _respond(send, 401, {"detail": "Authentication credentials were not provided or are invalid."})
+
+    last_event_id = headers.get("last-event-id") or parse_qs(scope["query_string"].decode()).get("last_event_id", [None])[0]
+    try:
+        last_event_id = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        last_event_id = None
+
+    version, opening = await sync_to_async(_stream_start)(user.id, last_event_id)
+    subscriber = broker.subscribe(user.id, version)
+    if subscriber is None:
+        return await _respond(send, 429, {"detail": "Too many open streams."})
+
+    async def wait_for_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def pump():
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        for chunk in opening:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        while True:
+            try:
+                chunk = await asyncio.wait_for(subscriber.queue.get(), settings.STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                chunk = b": ping\n\n"
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    disconnect = asyncio.ensure_future(wait_for_disconnect())
+    streaming = asyncio.ensure_future(pump())
+    try:
+        await asyncio.wait({disconnect, streaming}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        broker.unsubscribe(subscriber)
+        for task in (disconnect, streaming):
+            task.cancel()
+        if streaming.done() and not streaming.cancelled() and streaming.exception():
+            logger.warning("Notification stream of user %s ended: %r", user.id, streaming.exception())
+
+
+def stream_router(django_application):
+    """Serves STREAM_PATH itself and passes everything else to Django."""
+    async def application(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == STREAM_PATH:
+            return await notification_stream(scope, receive, send)
+        return await django_application(scope, receive, send)
+    return application
@@ -0,0 +1,753 @@
+import asyncio
+import json
+import random
+import shutil
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Avg, DurationField, ExpressionWrapper, F, Sum
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Notifications.analytics import calculate_analytics
+from Notifications.app_cache import AppCache, app_cache
+from Notifications.changes import prune_tombstones
+from Notifications.counters import aggregate_buffer
+from Notifications.ingestion import record_interactions, record_notifications
+from Notifications.models import (
+    App,
+    ChangeSequence,
+    DailyAggregate,
+    DailyAggregateDelta,
+    HourlyAggregate,
+    InteractionEvent,
+    NotificationEvent,
+    NotificationMessage,
+    UserNotificationState,
+)
+from Notifications.search import search_event_ids
+from Notifications.stream import STREAM_PATH, SYNC, Broker, format_event, stream_router
+from Notifications.throttles import NotificationIngestThrottle
+
+User = get_user_model()
+
+
+class ApiTestCase(TestCase):
+    """An authenticated client; requests go over HTTPS (SECURE_SSL_REDIRECT)."""
+
+    def setUp(self):
+        cache.clear()
+        # Filled by on-commit callbacks, which can outlive a test's rollback
+        app_cache.clear()
+        self.user = User.objects.create_user(username="ingest", email="ingest@example.com", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None, **extra):
+        return self.client.get(url, params, secure=True, **extra)
+
+    def post(self, url, data, **extra):
+        return self.client.post(url, data, format="json", secure=True, **extra)
+
+    def ingest(self, *notif_keys, **fields):
+        fields.setdefault("posted_at", "2026-10-01T09:30:00Z")
+        response = self.post(
+            "/notifications/ingest/notifications/batch/",
+            [
+                {
+                    "package_name": "com.example.chat",
+                    "app_label": "Chat",
+                    "notif_key": notif_key,
+                    "title": f"Message {notif_key}",
+                    **fields,
+                }
+                for notif_key in notif_keys
+            ],
+        )
+        self.assertIn(response.status_code, (200, 201), response.content)
+        return response.json()["results"]
+
+
+class IngestTestCase(ApiTestCase):
+    def unread(self):
+        return self.get("/notifications/unread/count/").json()["unread_count"]
+
+    def posts(self):
+        return HourlyAggregate.objects.filter(user=self.user).aggregate(posts=Sum("posts"))["posts"]
+
+    def test_batch_reingest_of_deleted_notification(self):
+        first, _ = self.ingest("a", "b")
+        self.assertTrue(first["created"])
+        self.assertEqual((self.unread(), self.posts()), (2, 2))
+
+        event_id = UserNotificationState.objects.get(pk=first["state_id"]).notification_event_id
+        response = self.post("/notifications/delete/", {"notification_id": event_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.unread(), self.posts()), (1, 1))
+
+        # The event still exists, so only its state is inserted again
+        again, _ = self.ingest("a", "b")
+        self.assertFalse(again["created"])
+        self.assertNotEqual(again["state_id"], first["state_id"])
+        self.assertEqual(NotificationEvent.objects.filter(app__user=self.user).count(), 2)
+        self.assertEqual((self.unread(), self.posts()), (2, 2))
+
+        # Nothing is missing any more, so nothing is counted
+        self.ingest("a", "b")
+        self.assertEqual((self.unread(), self.posts()), (2, 2))
+
+
+@override_settings(AGGREGATE_BUFFER_ENABLED=True)
+class StatsTestCase(ApiTestCase):
+    def test_stats_include_journaled_counts_without_writing(self):
+        now = timezone.now().isoformat()
+        self.ingest("a", "b", "c", posted_at=now)
+        self.post(
+            "/notifications/ingest/interactions/batch/",
+            [{"package_name": "com.example.chat", "notif_key": "a", "removed_at": now, "raw_reason": 1}],
+        )
+        self.assertEqual(DailyAggregate.objects.filter(user=self.user).count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            today = self.get("/notifications/stats/today/").json()
+            week = self.get("/notifications/stats/range/").json()
+        self.assertFalse([q for q in queries if not q["sql"].lstrip().upper().startswith("SELECT")])
+        self.assertEqual(
+            [(r["package_name"], r["posts"], r["clicks"], r["open_rate"]) for r in today],
+            [("com.example.chat", 3, 1, 1 / 3)],
+        )
+        self.assertEqual(
+            [(r["app__package_name"], r["posts"], r["clicks"], r["swipes"]) for r in week],
+            [("com.example.chat", 3, 1, 0)],
+        )
+
+        # Same numbers once flushed, with the stored row's id
+        aggregate_buffer.flush()
+        self.assertFalse(DailyAggregateDelta.objects.filter(user=self.user).exists())
+        cache.clear()
+        flushed = self.get("/notifications/stats/today/").json()
+        self.assertEqual(flushed[0]["posts"], 3)
+        self.assertEqual(flushed[0]["id"], DailyAggregate.objects.get(user=self.user).id)
+        self.assertEqual(self.get("/notifications/stats/range/").json(), week)
+
+
+class BatchIngestTestCase(ApiTestCase):
+    def batch(self, size):
+        """`size` items each of new keys, repeats of existing ones and a not yet known app."""
+        return (
+            [{"package_name": "com.example.chat", "notif_key": f"new{size}-{i}", "title": "New"} for i in range(size)]
+            + [{"package_name": "com.example.chat", "notif_key": f"old{i}", "title": "Old"} for i in range(size)]
+            + [
+                {"package_name": f"com.example.unknown{size}", "app_label": "Unknown", "notif_key": f"u{i}"}
+                for i in range(size)
+            ]
+        )
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.ingest(*[f"old{i}" for i in range(10)])
+        for size in (1, 10):
+            with self.subTest(size=size), self.assertNumQueries(19):
+                response = self.post("/notifications/ingest/notifications/batch/", self.batch(size))
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(
+                [r["created"] for r in response.json()["results"]],
+                [True] * size + [False] * size + [True] * size,
+            )
+
+    # The single ingest endpoint's filter builds in a thread the test transaction would block
+    @override_settings(NOTIF_KEY_FILTER_ENABLED=False)
+    @mock.patch.object(NotificationIngestThrottle, "THROTTLE_RATES", {"notif_ingest": "5/hour"})
+    def test_throttle_counts_items(self):
+        self.assertEqual(len(self.ingest("a", "b", "c")), 3)
+        response = self.post("/notifications/ingest/notifications/batch/", self.batch(1))
+        self.assertEqual(response.status_code, 429)
+
+        # The two items left still go through, one request each
+        for notif_key in ("d", "e"):
+            response = self.post(
+                "/notifications/ingest/notification/",
+                {"package_name": "com.example.chat", "notif_key": notif_key},
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.post("/notifications/ingest/notifications/batch/", []).status_code, 200)
+        response = self.post(
+            "/notifications/ingest/notification/", {"package_name": "com.example.chat", "notif_key": "f"}
+        )
+        self.assertEqual(response.status_code, 429)
+
+
+class InteractionIngestTestCase(ApiTestCase):
+    def interactions(self, *notif_keys, **fields):
+        return [
+            {"package_name": "com.example.chat", "notif_key": notif_key, "removed_at": "2026-10-01T10:00:00Z", **fields}
+            for notif_key in notif_keys
+        ]
+
+    def test_one_event_lookup_per_batch(self):
+        keys = [f"k{i}" for i in range(10)]
+        self.ingest(*keys)
+        for size in (1, 5):
+            payload = self.interactions(*keys[:size], "missing", raw_reason=1)
+            with self.subTest(size=size), CaptureQueriesContext(connection) as queries:
+                response = self.post("/notifications/ingest/interactions/batch/", payload)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual([r["ok"] for r in response.json()["results"]], [True] * size + [False])
+            lookups = [q for q in queries if 'FROM "Notifications_notificationevent"' in q["sql"]]
+            self.assertEqual(len(lookups), 1)
+            self.assertEqual(len(queries), 13)
+
+    def test_same_timestamp_repeats_are_only_dropped_with_dedupe(self):
+        self.ingest("a", "b")
+        payloads = [
+            {**v, "removed_at": datetime(2026, 10, 1, 10, tzinfo=dt_timezone.utc)}
+            for v in self.interactions("a", "a", "b", raw_reason=1)
+        ]
+        logged = InteractionEvent.objects.filter(user=self.user)
+
+        record_interactions(self.user, payloads)
+        self.assertEqual(logged.count(), 3)
+
+        logged.delete()
+        record_interactions(self.user, payloads, dedupe=True)
+        self.assertEqual(logged.count(), 2)
+        record_interactions(self.user, payloads, dedupe=True)
+        self.assertEqual(logged.count(), 2)
+
+
+class ImmutableEventTestCase(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ingest("a")
+        self.event = NotificationEvent.objects.get(notif_key="a")
+
+    def test_save_rejects_changed_fields_without_querying(self):
+        self.event.title = "Edited"
+        with self.assertNumQueries(0), self.assertRaisesMessage(ValueError, "Cannot modify field 'title'"):
+            self.event.save()
+
+        self.event.title = "Message a"
+        self.event.app_id = App.objects.create(user=self.user, package_name="com.example.other").id
+        with self.assertNumQueries(0), self.assertRaisesMessage(ValueError, "Cannot modify field 'app'"):
+            self.event.save()
+
+    def test_save_of_mutable_fields(self):
+        self.event.content_hash = "0" * 64
+        self.event.save()
+        self.assertEqual(NotificationEvent.objects.get(pk=self.event.pk).content_hash, "0" * 64)
+
+        # A field deferred at load time is checked against the row
+        event = NotificationEvent.objects.only("id").get(pk=self.event.pk)
+        event.title = "Edited"
+        with self.assertNumQueries(1), self.assertRaises(ValueError):
+            event.save()
+
+    def test_update_rejects_immutable_fields_without_querying(self):
+        events = NotificationEvent.objects.filter(pk=self.event.pk)
+        for fields in ({"title": "Edited"}, {"post_time": timezone.now()}, {"app_id": self.event.app_id}):
+            with self.subTest(fields=fields), self.assertNumQueries(0), self.assertRaises(ValueError):
+                events.update(**fields)
+
+        self.assertEqual(events.update(content_hash="1" * 64), 1)
+        self.assertEqual(NotificationEvent.objects.get(pk=self.event.pk).title, "Message a")
+
+
+class ChangeFeedTestCase(ApiTestCase):
+    def changes(self, since=None, limit=None, status_code=200):
+        params = {k: v for k, v in (("since", since), ("limit", limit)) if v is not None}
+        response = self.get("/notifications/changes/", params)
+        self.assertEqual(response.status_code, status_code, response.content)
+        return response.json()
+
+    def sync(self, since=None, limit=2):
+        """Pages through the feed; returns (changed keys, deleted state ids, token)."""
+        changed, deleted = [], []
+        while True:
+            page = self.changes(since, limit)
+            changed += [r["notif_key"] for r in page["results"]]
+            deleted += [r["id"] for r in page["deleted"]]
+            since = page["next_token"]
+            if not page["has_more"]:
+                return changed, deleted, since
+
+    def delete(self, notif_key):
+        state = UserNotificationState.objects.get(user=self.user, notification_event__notif_key=notif_key)
+        response = self.post("/notifications/delete/", {"notification_id": state.notification_event_id})
+        self.assertEqual(response.status_code, 200)
+        return state.id
+
+    def test_resume_from_token(self):
+        self.ingest("a", "b", "c")
+        changed, deleted, token = self.sync()
+        self.assertEqual((changed, deleted), (["a", "b", "c"], []))
+        self.assertEqual(self.sync(token)[:2], ([], []))
+
+        self.post(
+            "/notifications/ingest/interactions/batch/",
+            [{"package_name": "com.example.chat", "notif_key": "b", "removed_at": "2026-10-01T10:00:00Z", "raw_reason": 1}],
+        )
+        self.ingest("d")
+        changed, deleted, token = self.sync(token)
+        self.assertEqual((changed, deleted), (["b", "d"], []))
+        self.assertEqual(self.sync(token)[:2], ([], []))
+
+    def test_deletes_come_back_as_tombstones(self):
+        self.ingest("a", "b", "c")
+        _, _, token = self.sync()
+
+        deleted_ids = [self.delete("a"), self.delete("c")]
+        self.ingest("e")
+        changed, deleted, _ = self.sync(token, limit=1)
+        self.assertEqual((changed, deleted), (["e"], deleted_ids))
+
+        # A full sync only lists what is left
+        self.assertEqual(self.sync()[:2], (["b", "e"], []))
+
+    def test_tokens_behind_the_horizon_must_resync(self):
+        self.ingest("a", "b")
+        _, _, old_token = self.sync()
+        self.delete("a")
+        _, _, current_token = self.sync(old_token)
+
+        self.assertEqual(prune_tombstones(days=0), 1)
+        self.assertEqual(self.changes(old_token, status_code=410), {"error": "Token expired, resync required"})
+        self.assertEqual(self.sync(current_token)[:2], ([], []))
+        self.assertEqual(self.sync()[:2], (["b"], []))
+
+        self.changes("not-a-token", status_code=400)
+
+
+# The single ingest endpoint's filter builds in a thread the test transaction would block
+@override_settings(NOTIF_KEY_FILTER_ENABLED=False)
+class VersionedResponseTestCase(ApiTestCase):
+    FEED = "/notifications/get/"
+
+    def setUp(self):
+        super().setUp()
+        self.ingest("a", "b")
+
+    def conditional_get(self, url, etag, params=None):
+        return self.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get(self.FEED)["ETag"]
+        with self.assertNumQueries(1):  # the version
+            response = self.conditional_get(self.FEED, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.conditional_get(self.FEED, '"feed.0.0", ' + etag).status_code, 304)
+        self.assertEqual(self.conditional_get(self.FEED, '"feed.0.0"').status_code, 200)
+
+    def test_every_write_moves_the_version(self):
+        interaction = {"package_name": "com.example.chat", "notif_key": "a", "removed_at": "2026-10-01T10:00:00Z"}
+        event_id = NotificationEvent.objects.get(notif_key="b").id
+        writes = {
+            "single ingest": lambda: self.post(
+                "/notifications/ingest/notification/", {"package_name": "com.example.chat", "notif_key": "c"}
+            ),
+            "batch ingest": lambda: self.ingest("d"),
+            "app relabel": lambda: self.ingest("d", app_label="Chat 2"),
+            "interaction": lambda: self.post("/notifications/ingest/interaction/", {**interaction, "raw_reason": 1}),
+            "interaction batch": lambda: self.post(
+                "/notifications/ingest/interactions/batch/", [{**interaction, "dismissed_by": "user"}]
+            ),
+            "delete": lambda: self.post("/notifications/delete/", {"notification_id": event_id}),
+        }
+        urls = (self.FEED, "/notifications/unread/count/")
+        etags = {url: self.get(url)["ETag"] for url in urls}
+        for name, write in writes.items():
+            for url in urls:
+                self.assertEqual(self.conditional_get(url, etags[url]).status_code, 304)
+            write()
+            for url in urls:
+                with self.subTest(write=name, url=url):
+                    response = self.conditional_get(url, etags[url])
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(response["ETag"], etags[url])
+                    etags[url] = response["ETag"]
+
+    def test_variants_are_cached_apart(self):
+        variants = [None, {"view": "compact"}, {"fields": "id,is_read"}, {"view": "compact", "fields": "id,title"}]
+        first = [self.get(self.FEED, params) for params in variants]
+        self.assertEqual(len({r["ETag"] for r in first}), len(variants))
+        self.assertEqual(len({json.dumps(r.json(), sort_keys=True) for r in first}), len(variants))
+
+        for params, response in zip(variants, first):
+            with self.subTest(params=params), self.assertNumQueries(1):
+                cached = self.get(self.FEED, params)
+            self.assertEqual(cached["ETag"], response["ETag"])
+            self.assertEqual(cached.json(), response.json())
+        self.assertEqual(sorted(first[2].json()["results"][0]), ["id", "is_read"])
+
+
+# A 1x1 PNG, moved to the blob store on ingest
+ICON = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR4nGP4DwAAAQEABRjYTgAAAABJRU5ErkJggg=="
+)
+
+
+class FastListRenderingTestCase(ApiTestCase):
+    CASES = (
+        ("/notifications/get/", {}),
+        ("/notifications/get/", {"view": "compact"}),
+        ("/notifications/get/", {"fields": "id,title,post_time,reaction_time"}),
+        ("/notifications/get/", {"view": "compact", "fields": "id,package_name,opened_at"}),
+        ("/notifications/get/", {"fields": "id,notification"}),
+        ("/notifications/get/", {"cursor": "", "limit": 7}),
+        ("/notifications/bookmarked/", {}),
+        ("/notifications/bookmarked/", {"view": "compact"}),
+        ("/notifications/bookmarked/", {"fields": "id,title,notification"}),
+    )
+
+    def setUp(self):
+        super().setUp()
+        blob_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, blob_root)
+        blob_settings = override_settings(BLOB_STORE_ROOT=blob_root)
+        blob_settings.enable()
+        self.addCleanup(blob_settings.disable)
+
+        now = timezone.now()
+        record_notifications(self.user, [
+            {
+                "package_name": f"com.example.app{i % 3}",
+                "app_label": f"App {i % 3}",
+                "notif_key": f"k{i}",
+                "posted_at": now - timedelta(minutes=i),
+                "title": f"Title {i} — été",
+                "text": "Line one\nline two   separator",
+                "type": "message" if i % 3 else "email",
+                "people": '["alice", "bob"]' if i % 5 == 0 else None,
+                "large_icon_base64": ICON if i % 4 == 0 else None,
+            }
+            for i in range(20)
+        ])
+
+        states = UserNotificationState.objects.filter(user=self.user).order_by("id")
+        for i, state in enumerate(states):
+            if i % 3 == 0:
+                state.opened_at = state.post_time + timedelta(seconds=30 + i)
+                state.is_read = True
+            state.ml_score = i / 7 if i % 2 else None
+            state.is_bookmarked = i % 4 == 0
+        UserNotificationState.objects.bulk_update(states, ["opened_at", "is_read", "ml_score", "is_bookmarked"])
+
+        NotificationMessage.objects.bulk_create([
+            NotificationMessage(notification_event_id=pk, sender="alice", message_text="hi", message_time=now)
+            for pk in NotificationEvent.objects.filter(app__user=self.user).values_list("id", flat=True)[::5]
+        ])
+
+    def render(self, url, params, fast):
+        with override_settings(FAST_LIST_RENDERING=fast, VERSIONED_RESPONSE_CACHE_TIMEOUT=0):
+            response = self.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_same_bytes_as_the_serializers(self):
+        for url, params in self.CASES:
+            with self.subTest(url=url, params=params):
+                expected = self.render(url, params, fast=False)
+                self.assertEqual(self.render(url, params, fast=True), expected)
+                rows = json.loads(expected)
+                self.assertTrue(rows["results"] if isinstance(rows, dict) else rows)
+
+
+class StreamClient:
+    """Drives the ASGI application directly, like a server with one connection."""
+
+    def __init__(self, application, token=None, last_event_id=None, query_string=b""):
+        headers = []
+        if token is not None:
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        if last_event_id is not None:
+            headers.append((b"last-event-id", str(last_event_id).encode()))
+        scope = {"type": "http", "method": "GET", "path": STREAM_PATH, "query_string": query_string, "headers": headers}
+        self.received = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.task = asyncio.ensure_future(application(scope, self.received.get, self.sent.put))
+
+    async def message(self):
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+    async def body(self):
+        return (await self.message())["body"]
+
+    async def opening(self):
+        """The response start and the chunks sent before anything happens."""
+        start = await self.message()
+        chunks = [await self.body(), await self.body()]
+        return start, chunks
+
+    async def close(self):
+        await self.received.put({"type": "http.disconnect"})
+        await asyncio.wait_for(self.task, 5)
+
+
+class StreamTestCase(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.broker = Broker()
+        patcher = mock.patch("Notifications.stream.broker", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.token = RefreshToken.for_user(self.user).access_token
+
+        async def not_streamed(scope, receive, send):
+            raise AssertionError(f"{scope['path']} was passed to Django")
+        self.application = stream_router(not_streamed)
+
+    def connect(self, **kwargs):
+        return StreamClient(self.application, self.token, **kwargs)
+
+    def commit_ingest(self, *notif_keys):
+        """Ingests as a committed request does, sending changes_committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingest(*notif_keys)
+        return ChangeSequence.objects.value_for(self.user.id)
+
+    async def test_rejects_unauthenticated_requests(self):
+        client = StreamClient(self.application)
+        start = await client.message()
+        self.assertEqual(start["status"], 401)
+        await asyncio.wait_for(client.task, 5)
+
+    @override_settings(STREAM_HEARTBEAT_SECONDS=0.1)
+    async def test_pushes_committed_changes_then_heartbeats(self):
+        client = self.connect()
+        start, opening = await client.opening()
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        self.assertEqual(opening, [b"retry: 5000\n\n", b'event: unread\ndata: {"unread_count":0}\n\n'])
+
+        version = await sync_to_async(self.commit_ingest)("a", "b")
+        for notif_key in ("a", "b"):
+            event, event_id, data = (await client.body()).decode().strip().split("\n")
+            self.assertEqual((event, event_id), ("event: state", f"id: {version}"))
+            self.assertEqual(json.loads(data.removeprefix("data: "))["notif_key"], notif_key)
+        self.assertEqual(await client.body(), b'event: unread\ndata: {"unread_count":2}\n\n')
+        self.assertEqual(await client.body(), b": ping\n\n")
+
+        await client.close()
+        self.assertFalse(self.broker.has_subscribers(self.user.id))
+
+    async def test_resume_from_last_event_id(self):
+        version = await sync_to_async(self.commit_ingest)("a")
+        # Behind: catch up first (header, or query parameter for EventSource polyfills)
+        for kwargs in ({"last_event_id": 0}, {"query_string": b"last_event_id=0"}):
+            client = self.connect(**kwargs)
+            await client.opening()
+            self.assertEqual(await client.body(), SYNC)
+            await client.close()
+
+        # Up to date: nothing before the next heartbeat
+        with override_settings(STREAM_HEARTBEAT_SECONDS=0.1):
+            client = self.connect(last_event_id=version)
+            await client.opening()
+            self.assertEqual(await client.body(), b": ping\n\n")
+            await client.close()
+
+    @override_settings(STREAM_SYNC_INTERVAL_SECONDS=0.05)
+    async def test_changes_from_other_processes_send_a_sync(self):
+        client = self.connect()
+        await client.opening()
+        # Committed elsewhere: no changes_committed in this process
+        await sync_to_async(self.ingest)("a")
+        self.assertEqual(await client.body(), SYNC)
+        await client.close()
+
+    @override_settings(STREAM_MAX_CONNECTIONS_PER_USER=2)
+    async def test_connections_per_user_are_limited(self):
+        clients = [self.connect(), self.connect()]
+        for client in clients:
+            await client.opening()
+        extra = self.connect()
+        self.assertEqual((await extra.message())["status"], 429)
+        await asyncio.wait_for(extra.task, 5)
+        for client in clients:
+            await client.close()
+
+    @override_settings(STREAM_QUEUE_SIZE=3)
+    async def test_a_full_queue_collapses_into_a_sync(self):
+        subscriber = self.broker.subscribe(self.user.id, 0)
+        subscriber.offer([format_event("state", {"id": i}, i) for i in range(2)])
+        self.assertEqual(subscriber.queue.qsize(), 2)
+        subscriber.offer([format_event("state", {"id": i}, i) for i in range(2, 5)])
+        self.assertEqual([subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())], [SYNC])
+        self.broker.unsubscribe(subscriber)
+
+
+class ConcurrentIngestTestCase(ApiTestCase):
+    def test_batch_racing_a_concurrent_insert(self):
+        """Keys another request inserts first are neither created nor counted here."""
+        app = App.objects.create(user=self.user, package_name="com.example.chat", app_label="Chat")
+        bulk_create = NotificationEvent.objects.bulk_create
+
+        def concurrent_insert(objs, *args, **kwargs):
+            if not NotificationEvent.objects.filter(notif_key="b").exists():
+                bulk_create([NotificationEvent(app=app, notif_key="b", title="Message b")])
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(NotificationEvent.objects, "bulk_create", side_effect=concurrent_insert):
+            results = self.ingest("a", "b", "c")
+
+        self.assertEqual([r["created"] for r in results], [True, False, True])
+        self.assertEqual(len({r["state_id"] for r in results}), 3)
+        self.assertEqual(
+            DailyAggregateDelta.objects.filter(user=self.user).aggregate(posts=Sum("posts"))["posts"],
+            2,
+        )
+
+
+class AppCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation_reaches_other_processes(self):
+        here, there = AppCache(10, ttl=60), AppCache(10, ttl=60)
+        here.set(1, "com.example.chat", 5, "Chat")
+        there.set(1, "com.example.chat", 5, "Chat")
+        there.set(2, "com.example.chat", 6, "Chat")
+
+        here.invalidate(1, "com.example.chat")
+        self.assertIsNone(there.get(1, "com.example.chat"))
+        self.assertEqual(there.get(2, "com.example.chat"), (6, "Chat"))
+        self.assertEqual(there.stats()["stale"], 1)
+
+        there.set(1, "com.example.chat", 7, "Chat")
+        self.assertEqual(there.get(1, "com.example.chat"), (7, "Chat"))
+
+    def test_entries_expire(self):
+        lru = AppCache(10, ttl=60)
+        with mock.patch("Notifications.app_cache.time.monotonic", return_value=1000):
+            lru.set(1, "com.example.chat", 5, "Chat")
+            self.assertEqual(lru.get(1, "com.example.chat"), (5, "Chat"))
+        with mock.patch("Notifications.app_cache.time.monotonic", return_value=1061):
+            self.assertIsNone(lru.get(1, "com.example.chat"))
+        self.assertEqual(lru.stats(), {"hits": 1, "misses": 1, "stale": 1, "entries": 0, "max_entries": 10})
+
+
+class SearchTestCase(ApiTestCase):
+    def indexed(self, query):
+        """Keys of the indexed events matching `query`, below the view's state filter."""
+        event_ids = search_event_ids(self.user.id, query, 10)
+        return sorted(NotificationEvent.objects.filter(id__in=event_ids).values_list("notif_key", flat=True))
+
+    def test_deleted_events_leave_the_index(self):
+        self.ingest("a", "b", "c", text="quarterly report")
+        self.assertEqual(self.indexed("quarterly rep"), ["a", "b", "c"])
+
+        NotificationEvent.objects.filter(notif_key="a").delete()
+        self.assertEqual(self.indexed("quarterly"), ["b", "c"])
+
+        App.objects.filter(user=self.user).delete()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM "Notifications_search"')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+def legacy_analytics(user, notif_type, now):
+    """calculate_analytics as it was before the hourly rollup, for parity."""
+    qs = UserNotificationState.objects.filter(
+        user=user,
+        type=notif_type,
+        post_time__gte=now - timedelta(days=7)
+    )
+
+    this_week_count = qs.count()
+    ignored = qs.filter(is_read=False).count()
+    ignore_rate = (ignored / this_week_count) if this_week_count > 0 else 0.0
+
+    weekday_counts = defaultdict(int)
+    hourly_bins = [0] * 8
+    for post_time in qs.values_list("post_time", flat=True):
+        weekday_counts[post_time.weekday()] += 1
+        hourly_bins[post_time.hour // 3] += 1
+    weekly_activity = [weekday_counts[i] for i in range(7)]
+
+    avg_duration = qs.filter(opened_at__isnull=False).annotate(
+        response_time=ExpressionWrapper(F("opened_at") - F("post_time"), output_field=DurationField())
+    ).aggregate(avg=Avg("response_time"))["avg"]
+    if avg_duration:
+        total_seconds = int(avg_duration.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        avg_response = f"{hours}h" if hours > 0 else f"{minutes}m"
+    else:
+        avg_response = "—"
+
+    peak_day_index = weekly_activity.index(max(weekly_activity)) if this_week_count > 0 else 0
+    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    return {
+        "thisWeekCount": this_week_count,
+        "ignoreRate": round(ignore_rate, 2),
+        "avgResponse": avg_response,
+        "weeklyActivity": weekly_activity,
+        "timeDistribution": hourly_bins,
+        "insights": {
+            "ignorePercent": round(ignore_rate, 2),
+            "peakDay": days[peak_day_index],
+            "totalNotifications": this_week_count,
+        },
+    }
+
+
+class AnalyticsTestCase(TestCase):
+    # Mid-hour, so the window starts in a partial hour
+    NOW = datetime(2026, 10, 14, 15, 37, 12, tzinfo=dt_timezone.utc)
+    TYPES = ["general", "message", "promo"]
+
+    def seed(self, seed, count=150):
+        rng = random.Random(seed)
+        user = User.objects.create_user(username=f"analytics{seed}", email=f"a{seed}@example.com", password="x")
+        apps = [
+            App.objects.create(user=user, package_name=f"com.example.app{i}", app_label=f"App {i}")
+            for i in range(3)
+        ]
+        for i in range(count):
+            # A few days either side of the 7-day window, and its first hour
+            if rng.random() < 0.1:
+                post_time = self.NOW - timedelta(days=7, seconds=-rng.randint(0, 22 * 60))
+            else:
+                post_time = self.NOW - timedelta(seconds=rng.randint(0, 9 * 24 * 3600))
+            event = NotificationEvent.objects.create(
+                app=rng.choice(apps),
+                notif_key=f"n{i}",
+                type=rng.choice(self.TYPES),
+                title=f"Notification {i}",
+                post_time=post_time,
+            )
+            state = event.user_states.get(user=user)
+            roll = rng.random()
+            if roll < 0.4:
+                state.opened_at = post_time + timedelta(seconds=rng.randint(5, 6 * 3600))
+                state.is_read = True
+            elif roll < 0.6:
+                state.is_read = True
+            else:
+                continue
+            state.save()
+        return user
+
+    def test_parity_with_legacy_algorithm(self):
+        for seed in range(4):
+            with self.subTest(seed=seed):
+                user = self.seed(seed)
+                with mock.patch("django.utils.timezone.now", return_value=self.NOW):
+                    for notif_type in [*self.TYPES, "unused"]:
+                        expected = legacy_analytics(user, notif_type, self.NOW)
+                        self.assertEqual(calculate_analytics(user, notif_type), expected, notif_type)
+                        self.assertEqual(expected["thisWeekCount"] > 0, notif_type != "unused")
+
+    def test_two_queries(self):
+        user = self.seed(0)
+        with mock.patch("django.utils.timezone.now", return_value=self.NOW):
+            with self.assertNumQueries(2):
+                calculate_analytics(user, "message")
@@ -1,6 +1,11 @@
+from django.conf import settings
 from rest_framework.throttling import SimpleRateThrottle
 
 class NotificationIngestThrottle(SimpleRateThrottle):
+    """
+    Limits ingested items per user. Every item counts against the rate, so
+    a batch of N notifications costs as much as N single requests.
+    """
     scope = "notif_ingest"
 
     def get_cache_key(self, request, view):
@@ -10,3 +15,37 @@ class NotificationIngestThrottle(SimpleRateThrottle):
 
         # Fallback to IP for safety
         return f"{self.scope}:{self.get_ident(request)}"
+
+    def cost(self, request):
+        """Number of items in the request."""
+        if isinstance(request.data, list):
+            # Larger batches are rejected by the view anyway
+            return min(len(request.data), settings.NOTIFICATION_INGEST_BATCH_MAX)
+        return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.history = self.cache.get(self.key, [])
+        self.now = self.timer()
+
+        while self.history and self.history[-1] <= self.now - self.duration:
+            self.history.pop()
+
+        cost = self.cost(request)
+        if len(self.history) + cost > self.num_requests:
+            return self.throttle_failure()
+
+        # One history entry per item, like `cost` separate requests
+        self.history[:0] = [self.now] * cost
+        self.cache.set(self.key, self.history, self.duration)
+        return True
+
+
+class InteractionIngestThrottle(NotificationIngestThrottle):
+    scope = "interaction_ingest"
@@ -0,0 +1,95 @@
+"""
+Unread counts from the maintained UnreadCounter rows.
+
+The counters move with every is_read change the application makes (see
+UnreadCounterManager.record), but states that disappear by cascade - an app
+or event deleted in the admin - or are written around the model never
+reach them. `reconcile_unread_counters` recounts a user from
+UserNotificationState and rewrites any bucket that drifted; the
+`reconcile_unread_counters` command runs it periodically and reports the
+drift.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import ChangeSequence, UnreadCounter, UserNotificationState
+
+
+def unread_total(user_id):
+    return max(UnreadCounter.objects.filter(user_id=user_id).aggregate(n=Sum("count"))["n"] or 0, 0)
+
+
+def unread_by_app(user_id):
+    rows = (
+        UnreadCounter.objects.filter(user_id=user_id, count__gt=0)
+        .values("app_id", "app__package_name", "app__app_label")
+        .annotate(unread=Sum("count"))
+        .order_by("-unread", "app__package_name")
+    )
+    return [
+        {
+            "app_id": r["app_id"],
+            "package_name": r["app__package_name"],
+            "app_label": r["app__app_label"],
+            "unread": r["unread"],
+        }
+        for r in rows
+    ]
+
+
+def unread_by_type(user_id):
+    rows = (
+        UnreadCounter.objects.filter(user_id=user_id, count__gt=0)
+        .values("type")
+        .annotate(unread=Sum("count"))
+        .order_by("-unread", "type")
+    )
+    return {r["type"]: r["unread"] for r in rows}
+
+
+def reconcile_unread_counters(user_id):
+    """
+    Recounts the user's unread states per (app, type) and fixes drifted
+    counters. Returns (buckets that drifted, total absolute drift).
+
+    Runs under the user's ChangeSequence row lock, which every writer of
+    is_read holds until it commits, so no write lands between the count
+    and the fix.
+    """
+    with transaction.atomic():
+        list(ChangeSequence.objects.select_for_update().filter(user_id=user_id))
+
+        actual = {}
+        rows = UserNotificationState.objects.filter(
+            user_id=user_id,
+            is_read__in=[False],
+            app__isnull=False,
+        ).values_list("app_id", "type").annotate(n=Count("id")).order_by()
+        for app_id, notif_type, n in rows:
+            key = (app_id, notif_type or "")  # NULL and "" share a bucket
+            actual[key] = actual.get(key, 0) + n
+
+        stored = {
+            (app_id, notif_type): (pk, count)
+            for pk, app_id, notif_type, count in UnreadCounter.objects.filter(
+                user_id=user_id
+            ).values_list("id", "app_id", "type", "count")
+        }
+
+        drifted = drift = 0
+        fixes = {}
+        for key in actual.keys() | stored.keys():
+            difference = actual.get(key, 0) - stored.get(key, (None, 0))[1]
+            if difference:
+                drifted += 1
+                drift += abs(difference)
+                if key in actual:
+                    fixes[(user_id, *key)] = difference
+        UnreadCounter.objects.apply(fixes)
+
+        # Buckets of apps and types with nothing unread left
+        empty = [pk for key, (pk, _) in stored.items() if key not in actual]
+        if empty:
+            UnreadCounter.objects.filter(id__in=empty).delete()
+
+    return drifted, drift
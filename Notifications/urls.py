@@ -1,14 +1,20 @@
-from django.urls import path
+from django.urls import path, re_path
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
 
 from .views import (
     get_user_notifications,
+    priority_inbox,
+    notification_changes,
+    search_notifications,
     ingest_notification,
+    ingest_notifications_batch,
     ingest_interaction,
+    ingest_interactions_batch,
     apps_list,
     stats_today,
     stats_range,
+    response_times,
     delete_notification,
     mark_notification_opened,
     mark_notification_dismissed,
@@ -17,6 +23,7 @@ from .views import (
     NotificationAnalyticsView,
     toggle_bookmark,
     bookmarked_notifications,
+    notification_blob,
 )
 
 urlpatterns = [
@@ -28,6 +35,21 @@ urlpatterns = [
         permission_classes([IsAuthenticated])(get_user_notifications),
         name="get_user_notifications"
     ),
+    path(
+        "priority/",
+        permission_classes([IsAuthenticated])(priority_inbox),
+        name="priority_inbox"
+    ),
+    path(
+        "search/",
+        permission_classes([IsAuthenticated])(search_notifications),
+        name="search_notifications"
+    ),
+    path(
+        "changes/",
+        permission_classes([IsAuthenticated])(notification_changes),
+        name="notification_changes"
+    ),
 
     # -------------------------
     # Ingest endpoints (from Android client)
@@ -37,11 +59,21 @@ urlpatterns = [
         permission_classes([IsAuthenticated])(ingest_notification),
         name="ingest_notification"
     ),
+    path(
+        "ingest/notifications/batch/",
+        permission_classes([IsAuthenticated])(ingest_notifications_batch),
+        name="ingest_notifications_batch"
+    ),
     path(
         "ingest/interaction/",
         permission_classes([IsAuthenticated])(ingest_interaction),
         name="ingest_interaction"
     ),
+    path(
+        "ingest/interactions/batch/",
+        permission_classes([IsAuthenticated])(ingest_interactions_batch),
+        name="ingest_interactions_batch"
+    ),
 
     # -------------------------
     # Notification state management
@@ -80,6 +112,11 @@ urlpatterns = [
         permission_classes([IsAuthenticated])(stats_range),
         name="stats_range"
     ),
+    path(
+        "analytics/response-times/",
+        permission_classes([IsAuthenticated])(response_times),
+        name="response_times"
+    ),
     path(
         "unread/count/",
         permission_classes([IsAuthenticated])(unread_count),
@@ -92,5 +129,10 @@ urlpatterns = [
     ),
     path("analytics/", NotificationAnalyticsView.as_view()),
     path("bookmark/", toggle_bookmark),
-    path("bookmarked/", bookmarked_notifications),
+    path("bookmarked/", bookmarked_notifications, name="bookmarked_notifications"),
+    re_path(
+        r"^blobs/(?P<digest>[0-9a-f]{64})/$",
+        notification_blob,
+        name="notification_blob"
+    ),
 ]
\ No newline at end of file
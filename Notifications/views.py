@@ -1,15 +1,43 @@
+import logging
+
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import serializers, status
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum
-from Notifications.throttles import NotificationIngestThrottle
-from .analytics import calculate_analytics
+from datetime import date, timedelta
+from django.db.models import Prefetch, Q, Sum
+from django.http import HttpResponse, HttpResponseNotModified
+from ml.config import HIGH_PRIORITY_THRESHOLD, LOW_PRIORITY_THRESHOLD
+from Notifications.throttles import InteractionIngestThrottle, NotificationIngestThrottle
+from .analytics import analytics_snapshot, type_analytics
+from .blobs import blob_path, content_type as blob_content_type
+from .fastpath import state_rows
+from .changes import delete_states, horizon, tombstones_after
+from .counters import journal_totals
+from .pagination import (
+    decode_change_token,
+    decode_score_cursor,
+    decode_time_cursor,
+    encode_cursor,
+    seek_before,
+)
+from .ingestion import (
+    record_interaction,
+    record_interactions,
+    record_notification,
+    record_notifications,
+)
+from .rollups import response_time_percentiles
+from .search import search_event_ids, search_terms
+from .spool import IngestSpool, ingest_spool
+from .unread import unread_by_app, unread_by_type, unread_total
+from .versioning import versioned_response
 
 from .models import (
     NotificationEvent,
+    NotificationMessage,
     UserNotificationState,
     App,
     InteractionEvent,
@@ -18,6 +46,7 @@ from .models import (
 
 from .serializers import (
     UserNotificationStateSerializer,
+    UserNotificationStateCompactSerializer,
     NotificationEventSerializer,
     IngestNotificationSerializer,
     IngestInteractionSerializer,
@@ -26,37 +55,76 @@ from .serializers import (
     NotificationAnalyticsSerializer,
 )
 
+logger = logging.getLogger(__name__)
+
 
 # -------------------------
-# Helper function (internal)
+# Notification list representations (?view=, ?fields=)
 # -------------------------
-import hashlib
 
-def compute_hash(v):
-    parts = [
-        v.get("title", ""),
-        v.get("text", ""),
-        v.get("big_text", ""),
-        v.get("sub_text", ""),
-        v.get("summary_text", ""),
-    ]
-    s = "|".join(str(p) for p in parts)
-    return hashlib.sha256(s.encode()).hexdigest()
-
-def _get_or_create_app(user, package_name, app_label=""):
-    """Ensures an App entry exists for the user + package."""
-    app, created = App.objects.get_or_create(
-        user=user,
-        package_name=package_name,
-        defaults={"app_label": app_label or package_name}
-    )
+STATE_LIST_SERIALIZERS = {
+    "full": UserNotificationStateSerializer,
+    "compact": UserNotificationStateCompactSerializer,
+}
+
+# Columns read by SerializerMethodFields
+METHOD_FIELD_COLUMNS = {
+    "reaction_time": ("opened_at", "post_time"),
+    "reaction_time_seconds": ("opened_at", "post_time"),
+}
 
-    # Update readable label if provided and different
-    if app_label and app.app_label != app_label:
-        app.app_label = app_label
-        app.save(update_fields=["app_label"])
 
-    return app
+def state_list_serializer(request):
+    """
+    Returns (serializer_class, context) for ?view=full|compact and
+    ?fields=a,b,c, or None for an unknown view.
+    """
+    serializer_class = STATE_LIST_SERIALIZERS.get(request.GET.get("view", "full"))
+    if serializer_class is None:
+        return None
+    fields = {f.strip() for f in request.GET.get("fields", "").split(",") if f.strip()}
+    return serializer_class, {"fields": fields}
+
+
+def shape_state_list(qs, serializer_class, context, key=()):
+    """
+    Loads only the columns the serializer will render. NotificationEvent
+    and App are joined only for fields sourced from them, and the nested
+    `notification` (with its base64 images and `messages`, which are
+    prefetched) only when it is part of the output.
+    """
+    columns = {"id", "post_time", "ml_score", "notification_event", *key}  # ordering and cursors
+    for field in serializer_class(context=context).fields.values():
+        if isinstance(field, serializers.BaseSerializer):
+            return qs.select_related("notification_event", "notification_event__app")\
+                .prefetch_related(Prefetch(
+                    "notification_event__messages",
+                    queryset=NotificationMessage.objects.order_by("id"),
+                ))
+        if field.source == "*":
+            columns.update(METHOD_FIELD_COLUMNS.get(field.field_name, ()))
+        elif field.source != "notification_event_id":
+            columns.add(field.source.replace(".", "__"))
+
+    related = set()
+    if any(c.startswith("notification_event__") for c in columns):
+        related.add("notification_event")
+    if any(c.startswith("notification_event__app__") for c in columns):
+        related.add("notification_event__app")
+    return qs.select_related(*related).only(*columns, *related)
+
+
+def render_states(qs, serializer_class, context, key=("post_time", "notification_event_id")):
+    """
+    Renders a page of states as [(key values, row), ...]: from values()
+    rows (Notifications.fastpath) with FAST_LIST_RENDERING, else through the
+    serializer. Both produce the same JSON.
+    """
+    if settings.FAST_LIST_RENDERING:
+        return state_rows(qs, serializer_class, context, key)
+    states = list(shape_state_list(qs, serializer_class, context, key))
+    data = serializer_class(states, many=True, context=context).data
+    return [(tuple(getattr(s, k) for k in key), row) for s, row in zip(states, data)]
 
 
 # -------------------------
@@ -65,28 +133,281 @@ def _get_or_create_app(user, package_name, app_label=""):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@versioned_response("feed")
 def get_user_notifications(request):
+    """
+    The user's notifications, newest first.
+
+    Pages either by ?offset= (with a full `total`) or, when ?cursor= is
+    present (empty for the first page), by seeking past the cursor. Cursor
+    pages only count the total when asked with ?include_total=1. Both modes
+    return `next_cursor` (null on the last page).
+
+    ?view=compact renders the flat compact representation and ?fields=
+    limits either view to the listed fields.
+    """
     user = request.user
 
+    representation = state_list_serializer(request)
+    if representation is None:
+        return Response(
+            {"error": "view must be 'full' or 'compact'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    serializer_class, context = representation
+
     limit = int(request.GET.get("limit", 20))
     offset = int(request.GET.get("offset", 0))
+    cursor = request.GET.get("cursor")
 
     qs = UserNotificationState.objects.filter(user=user)\
-        .select_related("notification_event", "notification_event__app")\
-        .order_by("-notification_event__post_time")
+        .order_by("-post_time", "-notification_event_id")
 
-    total = qs.count()
-    states = qs[offset:offset + limit]
+    if cursor is None:
+        total = qs.count()
+        page = qs[offset:offset + limit + 1]
+    else:
+        total = qs.count() if request.GET.get("include_total") == "1" else None
+        if cursor:
+            try:
+                post_time, event_id = decode_time_cursor(cursor)
+            except ValueError:
+                return Response(
+                    {"error": "Invalid cursor"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            qs = qs.filter(seek_before(
+                "post_time", "notification_event_id", post_time, event_id
+            ))
+        page = qs[:limit + 1]
+
+    rows = render_states(page, serializer_class, context)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        post_time, event_id = rows[-1][0]
+        if post_time is None:
+            # Not backfilled (migration 0006); there is no key to seek past
+            logger.error("State of event %s has no post_time; run backfill_state_event_fields", event_id)
+        else:
+            next_cursor = encode_cursor(post_time, event_id)
+
+    data = [row for _, row in rows]
+
+    response = {
+        "total": total,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "results": data
+    }
+    if cursor is None:
+        response["offset"] = offset
+    return Response(response)
+
+# -------------------------
+# Priority inbox (unread, by cached ML score)
+# -------------------------
+
+# Score ranges of the PriorityService buckets
+PRIORITY_BUCKETS = {
+    "high": Q(ml_score__gt=HIGH_PRIORITY_THRESHOLD),
+    "normal": Q(ml_score__gte=LOW_PRIORITY_THRESHOLD, ml_score__lte=HIGH_PRIORITY_THRESHOLD),
+    "low": Q(ml_score__lt=LOW_PRIORITY_THRESHOLD),
+}
+
+PRIORITY_MAX_LIMIT = 100
 
-    data = UserNotificationStateSerializer(states, many=True).data
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def priority_inbox(request):
+    """
+    The user's unread notifications, highest ml_score first.
+    Query params: ?limit=20 (max 100), ?bucket=high|normal|low,
+    ?include_unscored=1, ?cursor=, plus ?view= and ?fields= like the feed.
+
+    Pages seek on (ml_score, id) along the (user, is_read, ml_score, id)
+    index, so a page never sorts the user's history. Unscored states are
+    left out unless ?include_unscored=1 (not combinable with a bucket); then
+    they follow the scored ones, newest first, in the same cursor sequence.
+    """
+    representation = state_list_serializer(request)
+    if representation is None:
+        return Response(
+            {"error": "view must be 'full' or 'compact'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    serializer_class, context = representation
+
+    limit = min(int(request.GET.get("limit", 20)), PRIORITY_MAX_LIMIT)
+    bucket = request.GET.get("bucket")
+    if bucket and bucket not in PRIORITY_BUCKETS:
+        return Response(
+            {"error": "bucket must be 'high', 'normal' or 'low'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    include_unscored = request.GET.get("include_unscored") == "1" and not bucket
+
+    cursor = request.GET.get("cursor")
+    score = last_id = None
+    if cursor:
+        try:
+            score, last_id = decode_score_cursor(cursor)
+        except ValueError:
+            return Response(
+                {"error": "Invalid cursor"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    # is_read=False compiles to "NOT is_read" on some backends, which can't
+    # use the index as an equality; IN (false) can.
+    unread = UserNotificationState.objects.filter(user=request.user, is_read__in=[False])
+    key = ("ml_score", "id")
+    rows = []
+
+    if last_id is None or score is not None:
+        scored = unread.filter(ml_score__isnull=False)
+        if bucket:
+            scored = scored.filter(PRIORITY_BUCKETS[bucket])
+        if last_id is not None:
+            scored = scored.filter(seek_before("ml_score", "id", score, last_id))
+        rows = render_states(scored.order_by("-ml_score", "-id")[:limit + 1], serializer_class, context, key)
+
+    if include_unscored and len(rows) <= limit:
+        unscored = unread.filter(ml_score__isnull=True)
+        if last_id is not None and score is None:
+            unscored = unscored.filter(id__lt=last_id)
+        rows += render_states(unscored.order_by("-id")[:limit + 1 - len(rows)], serializer_class, context, key)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1][0])
 
     return Response({
-        "total": total,
+        "limit": limit,
+        "bucket": bucket,
+        "next_cursor": next_cursor,
+        "results": [row for _, row in rows],
+    })
+
+
+# -------------------------
+# Full-text search
+# -------------------------
+
+SEARCH_MAX_LIMIT = 50
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_notifications(request):
+    """
+    The user's notifications matching ?q= in title, text, big_text or
+    conversation_title, best match first (Notifications.search).
+    Query params: ?q=, ?limit=20 (max 50), ?offset=0, plus ?view= and
+    ?fields= like the feed.
+    """
+    representation = state_list_serializer(request)
+    if representation is None:
+        return Response(
+            {"error": "view must be 'full' or 'compact'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    serializer_class, context = representation
+
+    query = request.GET.get("q", "")
+    if not search_terms(query):
+        return Response(
+            {"error": "q must contain at least one word"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = min(int(request.GET.get("limit", 20)), SEARCH_MAX_LIMIT)
+    offset = max(int(request.GET.get("offset", 0)), 0)
+
+    event_ids = search_event_ids(request.user.id, query, limit + 1, offset)
+    has_more = len(event_ids) > limit
+    event_ids = event_ids[:limit]
+
+    # Deleted states drop out here
+    qs = UserNotificationState.objects.filter(user=request.user, notification_event_id__in=event_ids)
+    rows = dict(render_states(qs, serializer_class, context, ("notification_event_id",)))
+    results = [rows[(pk,)] for pk in event_ids if (pk,) in rows]
+
+    return Response({
+        "q": query,
         "limit": limit,
         "offset": offset,
-        "results": data
+        "next_offset": offset + limit if has_more else None,
+        "results": results,
     })
 
+
+# -------------------------
+# Incremental change feed (client sync)
+# -------------------------
+
+CHANGES_MAX_LIMIT = 500
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def notification_changes(request):
+    """
+    States created or modified, and states deleted, since ?since=<token>.
+    Query params: ?since= (omit for a full sync), ?limit=100 (max 500).
+
+    Changed states come back in the compact representation, deletes as
+    {"id", "notification_event_id"} in `deleted`. Keep calling with
+    `next_token` while `has_more` is true. A 410 means the token predates
+    pruned tombstones and the client must resync without ?since=.
+    """
+    user_id = request.user.id
+    limit = min(int(request.GET.get("limit", 100)), CHANGES_MAX_LIMIT)
+
+    since = request.GET.get("since")
+    change_seq = last_id = 0
+    if since:
+        try:
+            change_seq, last_id = decode_change_token(since)
+        except ValueError:
+            return Response(
+                {"error": "Invalid token"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if change_seq < horizon(user_id):
+            return Response(
+                {"error": "Token expired, resync required"},
+                status=status.HTTP_410_GONE
+            )
+
+    changed = UserNotificationState.objects.filter(
+        Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, id__gt=last_id),
+        user_id=user_id,
+    ).order_by("change_seq", "id")[:limit + 1]
+
+    entries = [
+        (key, False, row)
+        for key, row in render_states(changed, UserNotificationStateCompactSerializer, {}, ("change_seq", "id"))
+    ]
+    if since:
+        # A full sync has nothing to delete
+        entries += [(key, True, row) for key, row in tombstones_after(user_id, change_seq, last_id, limit + 1)]
+    entries.sort(key=lambda entry: entry[0])
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_key = entries[-1][0] if entries else (change_seq, last_id)
+
+    return Response({
+        "results": [row for _, deleted, row in entries if not deleted],
+        "deleted": [row for _, deleted, row in entries if deleted],
+        "next_token": encode_cursor(*next_key),
+        "has_more": has_more,
+    })
+
+
 # -------------------------
 # Ingest posted notification
 # -------------------------
@@ -99,64 +420,95 @@ def ingest_notification(request):
     s.is_valid(raise_exception=True)
     v = s.validated_data
 
-    # Get or create app
-    app = _get_or_create_app(
-        request.user,
-        v["package_name"],
-        v.get("app_label", "")
-    )
+    if settings.INGEST_SPOOL_ENABLED:
+        ingest_spool.append(IngestSpool.NOTIFICATION, request.user.id, v)
+        return Response({"ok": True, "queued": True}, status=status.HTTP_202_ACCEPTED)
 
     # Dedupe using (app, notif_key)
-    notif_key = v.get("notif_key")
-    
-    if not notif_key:
-        # Generate unique key if not provided
-        notif_key = f"auto_{app.id}_{timezone.now().timestamp()}"
-
-    # Try to get existing notification event
-    notif_event, created = NotificationEvent.objects.get_or_create(
-        app=app,
-        notif_key=notif_key,
-        defaults={
-            "post_time": v.get("posted_at", timezone.now()),
-            "title": v.get("title", ""),
-            "text": v.get("text", ""),
-            "big_text": v.get("big_text", ""),
-            "sub_text": v.get("sub_text", ""),
-            "summary_text": v.get("summary_text", ""),
-            "info_text": v.get("info_text", ""),
-            "text_lines": v.get("text_lines", ""),
-            "channel_id": v.get("channel_id", ""),
-            "type": v.get("type", ""),
-            "conversation_title": v.get("conversation_title", ""),
-            "people": v.get("people"),
-            "large_icon_base64": v.get("large_icon_base64"),
-            "picture_base64": v.get("picture_base64"),
-            "content_hash": compute_hash(v),
-        }
-    )
-
-    state, _ = UserNotificationState.objects.get_or_create(
-        user=request.user,
-        notification_event=notif_event
-    )
+    result = record_notification(request.user, v)
+    created = result["created"]
 
     return Response(
         {
             "ok": True,
             "created": created,
-            "state_id": state.id
+            "state_id": result["state_id"]
         },
         status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
     )
 
 
+# -------------------------
+# Ingest a batch of posted notifications
+# -------------------------
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([NotificationIngestThrottle])
+def ingest_notifications_batch(request):
+    """
+    Android → Server
+    Ingests a burst of notifications (e.g. after the device reconnects).
+    Query count stays constant regardless of batch size.
+
+    Payload: [{...same fields as ingest/notification/...}, ...]
+
+    Response:
+    {
+        "ok": true,
+        "results": [
+            {"ok": true, "created": true, "state_id": 12},
+            {"ok": false, "errors": {"package_name": ["This field is required."]}}
+        ]
+    }
+    """
+    if not isinstance(request.data, list):
+        return Response(
+            {"error": "Expected a list of notifications"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    max_items = settings.NOTIFICATION_INGEST_BATCH_MAX
+    if len(request.data) > max_items:
+        return Response(
+            {"error": f"At most {max_items} notifications per batch"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Validate per item so one bad notification doesn't drop the whole burst
+    results = []
+    valid = []
+    for item in request.data:
+        s = IngestNotificationSerializer(data=item)
+        if s.is_valid():
+            results.append(None)
+            valid.append(s.validated_data)
+        else:
+            results.append({"ok": False, "errors": s.errors})
+
+    if settings.INGEST_SPOOL_ENABLED:
+        ingest_spool.append_many(IngestSpool.NOTIFICATION, request.user.id, valid)
+        results = [r or {"ok": True, "queued": True} for r in results]
+        return Response({"ok": True, "results": results}, status=status.HTTP_202_ACCEPTED)
+
+    ingested = iter(record_notifications(request.user, valid))
+    for i, result in enumerate(results):
+        if result is None:
+            results[i] = {"ok": True, **next(ingested)}
+
+    created = any(r.get("created") for r in results)
+    return Response(
+        {"ok": True, "results": results},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
+
+
 # -------------------------
 # Ingest interaction (click/swipe)
 # -------------------------
-REASON_CLICK = 1
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([InteractionIngestThrottle])
 def ingest_interaction(request):
     """
     Android → Server
@@ -176,84 +528,95 @@ def ingest_interaction(request):
     s.is_valid(raise_exception=True)
     v = s.validated_data
 
-    # Get or create app
-    app = _get_or_create_app(
-        request.user,
-        v["package_name"],
-        v.get("app_label", "")
-    )
-
     # Find the notification event
-    notif_key = v.get("notif_key")
-    if not notif_key:
+    if not v.get("notif_key"):
         return Response(
             {"error": "notif_key is required for interaction tracking"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    if settings.INGEST_SPOOL_ENABLED:
+        ingest_spool.append(IngestSpool.INTERACTION, request.user.id, v)
+        return Response({"ok": True, "queued": True}, status=status.HTTP_202_ACCEPTED)
+
     try:
-        notif_event = NotificationEvent.objects.get(
-            app=app,
-            notif_key=notif_key
-        )
+        logged = record_interaction(request.user, v)
     except NotificationEvent.DoesNotExist:
         return Response(
             {"error": "Notification not found. Ensure notification was ingested first."},
             status=status.HTTP_404_NOT_FOUND
         )
-        
-    state, _ = UserNotificationState.objects.get_or_create(
-        user=request.user,
-        notification_event=notif_event
-    )
-    
-    raw_reason = v.get("raw_reason")
-    dismissed_by = v.get("dismissed_by")
-    timestamp = v["removed_at"]
-
-    # -------------------------
-    # HANDLE CLICK
-    # -------------------------
-    if raw_reason == REASON_CLICK:
-        if not state.opened_at:
-            state.mark_opened(timestamp=timestamp)
-
-        # Log event (optional but useful)
-        InteractionEvent.objects.create(
-            user=request.user,
-            notification_event=notif_event,
-            interaction_type="CLICK",
-            timestamp=timestamp,
-            raw_reason=raw_reason,
-        )
 
+    if logged == InteractionEvent.CLICK:
         return Response({"ok": True})
+    return Response({"ok": True}, status=status.HTTP_201_CREATED)
 
-    # -------------------------
-    # HANDLE DISMISS
-    # -------------------------
-    if dismissed_by:
-        if not state.dismissed_at or dismissed_by == "user":
-            state.mark_dismissed(
-                dismissed_by=dismissed_by,
-                timestamp=timestamp
-            )
 
-            # user dismiss = mark read
-            if dismissed_by == "user" and not state.is_read:
-                state.mark_opened(timestamp=timestamp)
+# -------------------------
+# Ingest a batch of interactions
+# -------------------------
 
-        # Log event
-        InteractionEvent.objects.create(
-            user=request.user,
-            notification_event=notif_event,
-            interaction_type="DISMISS",
-            timestamp=timestamp,
-            raw_reason=raw_reason,
-            metadata={"dismissed_by": dismissed_by},
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([InteractionIngestThrottle])
+def ingest_interactions_batch(request):
+    """
+    Android → Server
+    Logs a list of interactions and updates their UserNotificationStates.
+    Query count stays constant regardless of batch size.
+
+    Payload: [{...same fields as ingest/interaction/...}, ...]
+
+    Response:
+    {
+        "ok": true,
+        "results": [
+            {"ok": true, "logged": "CLICK"},
+            {"ok": false, "error": "Notification not found"}
+        ]
+    }
+    """
+    if not isinstance(request.data, list):
+        return Response(
+            {"error": "Expected a list of interactions"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-    return Response({"ok": True}, status=status.HTTP_201_CREATED)
+    max_items = settings.NOTIFICATION_INGEST_BATCH_MAX
+    if len(request.data) > max_items:
+        return Response(
+            {"error": f"At most {max_items} interactions per batch"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    results = []
+    valid = []
+    for item in request.data:
+        s = IngestInteractionSerializer(data=item)
+        if s.is_valid():
+            results.append(None)
+            valid.append(s.validated_data)
+        else:
+            results.append({"ok": False, "errors": s.errors})
+
+    if settings.INGEST_SPOOL_ENABLED:
+        keyed = [v for v in valid if v.get("notif_key")]
+        ingest_spool.append_many(IngestSpool.INTERACTION, request.user.id, keyed)
+        recorded = iter(
+            {"ok": True, "queued": True} if v.get("notif_key")
+            else {"ok": False, "error": "notif_key is required for interaction tracking"}
+            for v in valid
+        )
+        status_code = status.HTTP_202_ACCEPTED
+    else:
+        recorded = iter(record_interactions(request.user, valid))
+        status_code = status.HTTP_201_CREATED
+
+    for i, result in enumerate(results):
+        if result is None:
+            results[i] = next(recorded)
+
+    return Response({"ok": True, "results": results}, status=status_code)
 
 
 # -------------------------
@@ -314,6 +677,7 @@ def mark_notification_dismissed(request, notification_id):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@versioned_response("apps")
 def apps_list(request):
     """
     Returns all apps that have sent notifications to this user.
@@ -329,18 +693,41 @@ def apps_list(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@versioned_response("stats_today", vary=lambda request: timezone.now().date().isoformat())
 def stats_today(request):
     """
-    Returns aggregated stats for today, per app.
+    Returns aggregated stats for today, per app, including counts still
+    in the aggregate journal.
     """
     today = timezone.now().date()
 
     qs = DailyAggregate.objects.filter(
         user=request.user,
         day=today
-    ).select_related("app").order_by("-posts")
+    ).select_related("app")
+
+    aggregates = {a.app_id: a for a in qs}
+    for r in journal_totals(request.user.id, today, today):
+        aggregate = aggregates.get(r["app_id"])
+        if aggregate is None:
+            # Not flushed yet at all
+            aggregate = aggregates[r["app_id"]] = DailyAggregate(
+                user_id=request.user.id,
+                app=App(
+                    id=r["app_id"],
+                    user_id=request.user.id,
+                    package_name=r["app__package_name"],
+                    app_label=r["app__app_label"],
+                ),
+                day=today,
+            )
+        aggregate.posts += r["posts"]
+        aggregate.clicks += r["clicks"]
+        aggregate.swipes += r["swipes"]
+        aggregate.open_rate = aggregate.clicks / aggregate.posts if aggregate.posts > 0 else None
 
-    serializer = DailyAggregateSerializer(qs, many=True)
+    aggregates = sorted(aggregates.values(), key=lambda a: a.posts, reverse=True)
+    serializer = DailyAggregateSerializer(aggregates, many=True)
     return Response(serializer.data)
 
 
@@ -352,7 +739,8 @@ def stats_today(request):
 @permission_classes([IsAuthenticated])
 def stats_range(request):
     """
-    Returns aggregated stats for the past N days (default 7).
+    Returns aggregated stats for the past N days (default 7), including
+    counts still in the aggregate journal.
     Query param: ?days=7
     """
     days = int(request.GET.get("days", 7))
@@ -373,7 +761,53 @@ def stats_range(request):
         .order_by("-posts")
     )
 
-    return Response(list(qs))
+    totals = {(r["app__package_name"], r["app__app_label"]): r for r in qs}
+    for r in journal_totals(request.user.id, start):
+        key = (r["app__package_name"], r["app__app_label"])
+        total = totals.setdefault(key, {
+            "app__package_name": key[0],
+            "app__app_label": key[1],
+            "posts": 0,
+            "clicks": 0,
+            "swipes": 0,
+        })
+        for field in ("posts", "clicks", "swipes"):
+            total[field] += r[field]
+
+    return Response(sorted(totals.values(), key=lambda r: r["posts"], reverse=True))
+
+
+# -------------------------
+# Reaction time percentiles
+# -------------------------
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@versioned_response("response_times", vary=lambda request: timezone.now().date().isoformat())
+def response_times(request):
+    """
+    p50/p90/p99 seconds from post to open of the notifications posted in
+    the past N days (?days=7) or ?since=YYYY-MM-DD&until=YYYY-MM-DD,
+    overall and per app, merged from the daily sketches.
+    """
+    until = timezone.now().date()
+    try:
+        if request.GET.get("since"):
+            since = date.fromisoformat(request.GET["since"])
+            until = date.fromisoformat(request.GET.get("until") or until.isoformat())
+        else:
+            since = until - timedelta(days=int(request.GET.get("days", 7)) - 1)
+    except ValueError:
+        return Response(
+            {"error": "since/until must be YYYY-MM-DD and days an integer"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        **response_time_percentiles(request.user.id, since, until),
+    })
 
 
 # -------------------------
@@ -397,11 +831,11 @@ def delete_notification(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Delete user state (will cascade delete if needed)
-    deleted_count, _ = UserNotificationState.objects.filter(
-        user=request.user,
-        notification_event_id=notification_id
-    ).delete()
+    # Delete user state, leaving a tombstone for the change feed
+    deleted_count = delete_states(
+        request.user.id,
+        UserNotificationState.objects.filter(notification_event_id=notification_id)
+    )
     
     if deleted_count > 0:
         return Response({"ok": True, "deleted": True})
@@ -418,16 +852,25 @@ def delete_notification(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@versioned_response("unread_count")
 def unread_count(request):
     """
-    Returns count of unread notifications.
+    Returns count of unread notifications, from the maintained counters.
+    ?by=app or ?by=type adds the per-app or per-type counts.
     """
-    count = UserNotificationState.objects.filter(
-        user=request.user,
-        is_read=False
-    ).count()
-    
-    return Response({"unread_count": count})
+    by = request.GET.get("by")
+    if by not in (None, "app", "type"):
+        return Response(
+            {"error": "by must be 'app' or 'type'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    response = {"unread_count": unread_total(request.user.id)}
+    if by == "app":
+        response["by_app"] = unread_by_app(request.user.id)
+    elif by == "type":
+        response["by_type"] = unread_by_type(request.user.id)
+    return Response(response)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -457,13 +900,20 @@ class NotificationAnalyticsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        """
+        ?type=<type> returns that type's analytics; ?all=1 returns
+        {"types": {type: analytics}} for every type posted this week.
+        Both are served from the user's cached analytics snapshot.
+        """
+        if request.query_params.get("all") in ("1", "true"):
+            return Response({"types": analytics_snapshot(request.user)})
 
         notif_type = request.query_params.get("type")
 
         if not notif_type:
             return Response({"error": "type required"}, status=400)
 
-        data = calculate_analytics(request.user, notif_type)
+        data = type_analytics(request.user, notif_type)
 
         return Response(data)
 
@@ -491,13 +941,66 @@ def toggle_bookmark(request):
     
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@versioned_response("bookmarks")
 def bookmarked_notifications(request):
+    """
+    The user's bookmarked notifications, newest first. Takes ?view= and
+    ?fields= like the feed.
+    """
+    representation = state_list_serializer(request)
+    if representation is None:
+        return Response(
+            {"error": "view must be 'full' or 'compact'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    serializer_class, context = representation
 
     qs = UserNotificationState.objects.filter(
         user=request.user,
         is_bookmarked=True
-    ).select_related("notification_event", "notification_event__app")
+    ).order_by("-post_time", "-notification_event_id")
+
+    rows = render_states(qs, serializer_class, context)
+
+    return Response([row for _, row in rows])
+
+# -------------------------
+# Notification images (blob store)
+# -------------------------
 
-    serializer = UserNotificationStateSerializer(qs, many=True)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def notification_blob(request, digest):
+    """
+    Serves an image moved to the blob store.
+    URL: GET /notifications/blobs/{sha256}/
 
-    return Response(serializer.data)
\ No newline at end of file
+    Blobs are immutable, so the digest is a strong ETag and clients may
+    cache the response indefinitely.
+    """
+    etag = f'"{digest}"'
+    cache_control = "private, max-age=31536000, immutable"
+
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+    owned = NotificationEvent.objects.filter(
+        Q(large_icon_ref=digest) | Q(picture_ref=digest),
+        app__user=request.user,
+    ).exists()
+    if not owned:
+        return Response({"error": "not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        with open(blob_path(digest), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return Response({"error": "not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    response = HttpResponse(data, content_type=blob_content_type(data))
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
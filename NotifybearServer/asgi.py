@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'NotifybearServer.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# The notification event stream is served outside Django's request cycle
+from Notifications.stream import stream_router  # noqa: E402
+
+application = stream_router(django_application)
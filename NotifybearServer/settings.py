@@ -66,7 +66,9 @@ REST_FRAMEWORK = {
         "user": "10000/day",
         "anon": "100/hour",
         "login": "25/minute",
+        # Per ingested item: a batch of N counts N
         "notif_ingest": "2000/hour",
+        "interaction_ingest": "2000/hour",
     }
 }
 from datetime import timedelta
@@ -209,4 +211,52 @@ MEDIA_URL = '/media/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_URL = '/static/'
 
-DATA_UPLOAD_MAX_NUMBER_FIELDS = None
\ No newline at end of file
+DATA_UPLOAD_MAX_NUMBER_FIELDS = None
+
+# Notification ingest
+NOTIFICATION_INGEST_BATCH_MAX = 500
+
+# Per-process (user, package_name) -> App cache used by the ingest paths;
+# entries expire after APP_CACHE_TTL seconds
+APP_CACHE_MAX_ENTRIES = 10000
+APP_CACHE_TTL = 300
+
+# Per-user Bloom filters letting ingest skip the notif_key existence lookup
+NOTIF_KEY_FILTER_ENABLED = True
+NOTIF_KEY_FILTER_DIR = os.path.join(BASE_DIR, 'var', 'notif_key_filters')
+NOTIF_KEY_FILTER_MAX_USERS = 1000
+NOTIF_KEY_FILTER_FP_RATE = 0.01
+
+# Durable local ingest spool (drained by `manage.py drain_ingest_spool`)
+INGEST_SPOOL_ENABLED = os.getenv('INGEST_SPOOL_ENABLED', '') == '1'
+INGEST_SPOOL_PATH = os.path.join(BASE_DIR, 'var', 'ingest_spool.sqlite3')
+INGEST_SPOOL_MAX_ATTEMPTS = 5
+
+# Content-addressed store for notification images (Notifications.blobs)
+BLOB_STORE_ROOT = os.path.join(BASE_DIR, 'var', 'blobs')
+
+# Journaled DailyAggregate counters (Notifications.counters): journal rows a
+# process writes before it flushes, and rows applied per flush transaction
+AGGREGATE_BUFFER_ENABLED = True
+AGGREGATE_BUFFER_MAX_KEYS = 1000
+AGGREGATE_BUFFER_FLUSH_INTERVAL = 5.0
+
+# Render the feed and bookmarks from values() rows instead of serializers
+FAST_LIST_RENDERING = True
+
+# Change feed tombstones older than this are pruned (`manage.py prune_tombstones`)
+CHANGE_FEED_TOMBSTONE_DAYS = 30
+
+# Responses of the polled read endpoints, cached per user data version
+VERSIONED_RESPONSE_CACHE_TIMEOUT = 300
+
+# Per-user all-types analytics snapshot (Notifications.analytics); a cold
+# snapshot is computed once while concurrent requests wait up to the lock time
+ANALYTICS_SNAPSHOT_TIMEOUT = 300
+ANALYTICS_SNAPSHOT_LOCK_SECONDS = 10
+
+# Server-sent notification stream (Notifications.stream, ASGI only)
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_SYNC_INTERVAL_SECONDS = 5
+STREAM_QUEUE_SIZE = 100
+STREAM_MAX_CONNECTIONS_PER_USER = 10
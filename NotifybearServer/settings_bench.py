@@ -0,0 +1,32 @@
+"""
+Settings for `manage.py bench_ingest`.
+
+Same as the main settings, but on a throwaway local SQLite database, with
+the per-user throttles lifted so a replay isn't cut off after 2000 posts.
+
+    python manage.py bench_ingest --settings=NotifybearServer.settings_bench
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "var", "bench.sqlite3"),
+        "TEST": {
+            "NAME": os.path.join(BASE_DIR, "var", "bench_test.sqlite3"),
+        },
+    }
+}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {
+        scope: "1000000000/second"
+        for scope in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+    },
+}
+
+NOTIF_KEY_FILTER_DIR = os.path.join(BASE_DIR, "var", "bench", "notif_key_filters")
+INGEST_SPOOL_ENABLED = False
+INGEST_SPOOL_PATH = os.path.join(BASE_DIR, "var", "bench", "ingest_spool.sqlite3")
+BLOB_STORE_ROOT = os.path.join(BASE_DIR, "var", "bench", "blobs")
@@ -21,4 +21,8 @@ FEATURE_NAMES = [
 # Bayesian Smoothing Constants
 # Used to mathematically stabilize CTR for brand new apps/channels
 GLOBAL_OPEN_RATE_PRIOR = 0.15
-SMOOTHING_WEIGHT = 10.0
\ No newline at end of file
+SMOOTHING_WEIGHT = 10.0
+
+# Priority buckets: score > HIGH is "high", score < LOW is "low"
+HIGH_PRIORITY_THRESHOLD = 0.8
+LOW_PRIORITY_THRESHOLD = 0.3
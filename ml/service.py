@@ -1,5 +1,6 @@
 from datetime import timedelta
 from django.utils import timezone
+from .config import HIGH_PRIORITY_THRESHOLD, LOW_PRIORITY_THRESHOLD
 from .features import FeatureEngineer
 from .model import NotificationClassifier
 import logging
@@ -25,8 +26,8 @@ class PriorityService:
 
         # 3. Bucketize (Business Rule applied post-inference)
         bucket = "normal"
-        if score > 0.8: bucket = "high"
-        elif score < 0.3: bucket = "low"
+        if score > HIGH_PRIORITY_THRESHOLD: bucket = "high"
+        elif score < LOW_PRIORITY_THRESHOLD: bucket = "low"
 
         return {
             "score": score,